@@ -0,0 +1,64 @@
+import pytest
+
+from vps_core.addrset import AddressSet
+from vps_core.firewall import FirewallManager
+
+def test_siblings_collapse_into_their_parent():
+    addresses = AddressSet(["10.0.0.0", "10.0.0.1", "10.0.0.2", "10.0.0.3"])
+    assert addresses.cidrs() == ["10.0.0.0/30"]
+    assert len(addresses) == 1
+
+def test_covered_entries_are_absorbed():
+    addresses = AddressSet(["192.0.2.7", "2001:db8::1"])
+    assert addresses.add("192.0.2.0/24")
+    assert not addresses.add("192.0.2.9")
+    assert addresses.cidrs() == ["192.0.2.0/24", "2001:db8::1/128"]
+
+def test_threshold_widens_to_the_aggregate_prefix():
+    addresses = AddressSet([f"198.51.100.{i * 2}" for i in range(3)], threshold=4)
+    assert len(addresses) == 3
+    addresses.add("198.51.100.200")
+    assert addresses.cidrs() == ["198.51.100.0/24"]
+    assert AddressSet([f"198.51.100.{i * 2}" for i in range(4)]).cidrs(4) != ["198.51.100.0/24"]
+
+def test_discard_splits_the_containing_network():
+    addresses = AddressSet(["10.0.0.0/30"])
+    assert addresses.discard("10.0.0.1")
+    assert "10.0.0.1" not in addresses
+    assert addresses.cidrs() == ["10.0.0.0/32", "10.0.0.2/31"]
+    assert not addresses.discard("10.9.9.9")
+
+@pytest.fixture
+def nft(monkeypatch):
+    scripts = []
+    monkeypatch.setattr(FirewallManager, "_sets_ready", staticmethod(lambda: True))
+    monkeypatch.setattr(FirewallManager, "_nft_load", staticmethod(lambda script: (scripts.append(script), (0, ""))[1]))
+    return scripts
+
+def test_load_sets_leaves_the_allow_sets_alone_unless_given(nft):
+    assert FirewallManager.load_sets(AddressSet(["192.0.2.1"]))
+    assert "allow" not in nft[0]
+    assert "add element inet vps_manager block4 { 192.0.2.1/32 }" in nft[0]
+    # An empty family is flushed, never loaded with an empty element list
+    assert "flush set inet vps_manager block6" in nft[0] and "block6 {" not in nft[0]
+
+    assert FirewallManager.load_sets(AddressSet(), allowed=AddressSet(["203.0.113.0/24"]))
+    assert "add element inet vps_manager allow4 { 203.0.113.0/24 }" in nft[1]
+
+def test_load_sets_creates_the_table_on_first_use(nft, monkeypatch):
+    monkeypatch.setattr(FirewallManager, "_sets_ready", staticmethod(lambda: False))
+    FirewallManager.load_sets(AddressSet())
+    assert nft[0].startswith("add table inet vps_manager\ndelete table")
+
+def test_covering_returns_the_stored_network():
+    addresses = AddressSet(["192.0.2.0/24", "198.51.100.1"])
+    assert str(addresses.covering("192.0.2.77")) == "192.0.2.0/24"
+    assert addresses.covering("203.0.113.1") is None
+
+def test_block_elements_time_out_with_their_longest_ban(nft, monkeypatch):
+    monkeypatch.setattr("vps_core.firewall.time.time", lambda: 1000)
+    expiries = {"192.0.2.1": 1600, "192.0.2.2": 1300, "198.51.100.1": -1, "203.0.113.5": 1100}
+    blocked = AddressSet(["192.0.2.0/24", "198.51.100.1", "203.0.113.5"])
+    FirewallManager.load_sets(blocked, expiries=expiries)
+    assert ("add element inet vps_manager block4 { 192.0.2.0/24 timeout 600s, "
+            "198.51.100.1/32, 203.0.113.5/32 timeout 100s }") in nft[0]
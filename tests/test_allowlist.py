@@ -0,0 +1,36 @@
+import hashlib
+
+from vps_core.allowlist import HashAllowlist
+
+def test_lookup_is_exact_over_the_sorted_digests(tmp_path, monkeypatch):
+    monkeypatch.setattr(HashAllowlist, "DPKG_MD5SUMS", str(tmp_path / "info" / "*.md5sums"))
+    monkeypatch.setattr(HashAllowlist, "SOURCES_FILE", str(tmp_path / "sources.json"))
+    (tmp_path / "info").mkdir()
+    packaged = [f"binary {i}".encode() for i in range(50)]
+    (tmp_path / "info" / "coreutils.md5sums").write_text(
+        "".join(f"{hashlib.md5(data).hexdigest()}  usr/bin/tool{i}\n" for i, data in enumerate(packaged))
+        + "not-a-digest  usr/share/doc\n")
+    (tmp_path / "release").mkdir()
+    (tmp_path / "release" / "app.tar").write_bytes(b"our release")
+
+    path = str(tmp_path / "allowlist.md5")
+    assert HashAllowlist.build([str(tmp_path / "release")], path=path) == 51
+    allowlist = HashAllowlist(path)
+    assert len(allowlist) == 51
+    assert all(hashlib.md5(data).digest() in allowlist for data in packaged)
+    assert hashlib.md5(b"our release").digest() in allowlist
+    assert hashlib.md5(b"webshell").digest() not in allowlist
+
+    sample = tmp_path / "tool"
+    sample.write_bytes(packaged[7])
+    assert allowlist.is_known(str(sample))
+    sample.write_bytes(packaged[7] + b"patched")
+    assert not allowlist.is_known(str(sample))
+    # The artifact dir is remembered for later rebuilds
+    assert HashAllowlist.artifact_dirs() == [str(tmp_path / "release")]
+    allowlist.close()
+
+def test_missing_list_knows_nothing(tmp_path):
+    allowlist = HashAllowlist(str(tmp_path / "absent.md5"))
+    assert len(allowlist) == 0
+    assert hashlib.md5(b"").digest() not in allowlist
@@ -0,0 +1,41 @@
+import socket
+import threading
+
+from vps_core.benchmark import HostBenchmark
+from vps_core.firewall import FirewallManager
+
+def serve(replies):
+    """A listener answering its n-th connection with replies[n] (None: close at once)"""
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(len(replies))
+    conns = []
+
+    def run():
+        for reply in replies:
+            conn, _ = server.accept()
+            if reply is None:
+                conn.close()
+            else:
+                conn.sendall(reply)
+                conns.append(conn)
+
+    threading.Thread(target=run, daemon=True).start()
+    return server, conns
+
+def test_only_connections_with_an_ssh_banner_count_as_accepted():
+    replies = [b"SSH-2.0-OpenSSH_9.2\r\n", b"Exceeded MaxStartups\r\n", None, b"SSH-2.0-OpenSSH_9.2\r\n", b""]
+    server, conns = serve(replies)
+    socks = [socket.create_connection(server.getsockname()) for _ in replies]
+    try:
+        # The last connection never gets anything and counts once the wait is over
+        assert HostBenchmark._banners(socks, 0.5) == 2
+    finally:
+        for sock in socks + conns:
+            sock.close()
+        server.close()
+
+def test_rate_limit_exempts_loopback():
+    script = FirewallManager.rate_limit_script([22], 10, 20)
+    rules = script[script.index("chain input"):].splitlines()
+    assert rules[2].strip() == 'iifname "lo" return'
@@ -0,0 +1,33 @@
+from vps_core.clamd import ClamdTuner
+
+def test_render_replaces_managed_keys_once_and_appends_missing():
+    current = ("# Comment mentioning MaxThreads 4\n"
+               "LocalSocket /run/clamav/clamd.ctl\n"
+               "MaxThreads 12\n"
+               "MaxThreads 20\n"
+               "MaxScanSize 100M\n")
+    rendered = ClamdTuner.render(current, {"MaxThreads": "4", "MaxScanSize": "50M", "AlertExceedsMax": "yes"})
+    assert rendered == ("# Comment mentioning MaxThreads 4\n"
+                        "LocalSocket /run/clamav/clamd.ctl\n"
+                        "MaxThreads 4\n"
+                        "MaxScanSize 50M\n"
+                        "AlertExceedsMax yes\n")
+    assert ClamdTuner.render(rendered, {"MaxThreads": "4", "MaxScanSize": "50M", "AlertExceedsMax": "yes"}) == rendered
+
+def test_configured_reads_the_current_value(tmp_path, monkeypatch):
+    conf = tmp_path / "clamd.conf"
+    conf.write_text("#MaxFileSize 1M\nMaxFileSize 25M\n")
+    monkeypatch.setattr(ClamdTuner, "CONF", str(conf))
+    assert ClamdTuner.configured("MaxFileSize") == "25M"
+    assert ClamdTuner.configured("MaxScanSize") is None
+    monkeypatch.setattr(ClamdTuner, "CONF", str(tmp_path / "absent.conf"))
+    assert ClamdTuner.configured("MaxFileSize") is None
+
+def test_signature_rss_prefers_the_measurement(tmp_path, monkeypatch):
+    monkeypatch.setattr(ClamdTuner, "MEASUREMENT_FILE", str(tmp_path / "clamd_reload.json"))
+    monkeypatch.setattr(ClamdTuner, "DATABASE_DIR", str(tmp_path))
+    assert ClamdTuner.signature_rss() == ClamdTuner.DEFAULT_SIGNATURE_RSS
+    (tmp_path / "main.cvd").write_bytes(b"\0" * 1000)
+    assert ClamdTuner.signature_rss() == int(1000 * ClamdTuner.SIGNATURE_RSS_FACTOR)
+    (tmp_path / "clamd_reload.json").write_text('{"baseline_rss": 123456}')
+    assert ClamdTuner.signature_rss() == 123456
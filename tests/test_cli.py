@@ -0,0 +1,50 @@
+import json
+
+from vps_core import cli
+from vps_core.common import print_colored
+
+def test_reclaim_json_keeps_progress_off_stdout(monkeypatch, capsys):
+    from vps_core.reclaim import MB, DiskReclaimer
+
+    def reclaim(self, categories=None, dry_run=False):
+        print_colored("  journal  1.0 MB  journalctl --vacuum-size=200M")
+        return {"journal": {"bytes": MB, "items": 1, "action": "journalctl --vacuum-size=200M"}}
+    monkeypatch.setattr(DiskReclaimer, "reclaim", reclaim)
+
+    assert cli.run_reclaim(cli.parse_args(["reclaim", "--dry-run", "--json"])) == 0
+    out, err = capsys.readouterr()
+    assert json.loads(out)["journal"]["bytes"] == MB
+    assert "journalctl" in err
+
+def test_scan_json_keeps_progress_off_stdout(monkeypatch, capsys):
+    from vps_core.malware import MalwareScanner
+
+    def scan(roots=None, use_allowlist=True, engines=None, quarantine=False, limits=None):
+        print_colored(f"Scanning {', '.join(roots)}...")
+        return {"hits": [], "skipped": [], "stats": {"files": 1}}
+    monkeypatch.setattr(MalwareScanner, "scan", staticmethod(scan))
+    monkeypatch.setattr(cli, "require_root", lambda: None)
+
+    assert cli.run_scan(cli.parse_args(["scan", "/srv", "--json"])) == 0
+    out, err = capsys.readouterr()
+    assert json.loads(out)["stats"]["files"] == 1
+    assert "Scanning /srv" in err
+
+def test_integrity_baseline_json_is_the_only_stdout(tmp_path, monkeypatch, capsys):
+    from vps_core.integrity import IntegrityMonitor
+    from vps_core.profiler import StepProfiler
+
+    monkeypatch.setattr(IntegrityMonitor, "DB_PATH", str(tmp_path / "integrity.sqlite3"))
+    monkeypatch.setattr(StepProfiler, "_steps", [])
+    monkeypatch.setattr(StepProfiler, "_stack", [])
+    monkeypatch.setattr(cli, "require_root", lambda: None)
+    (tmp_path / "etc").mkdir()
+    (tmp_path / "etc" / "hosts").write_text("127.0.0.1 localhost\n")
+
+    args = cli.parse_args(["integrity", "baseline", "--root", str(tmp_path / "etc"), "--json"])
+    assert cli.run_integrity(args) == 0
+    # What main() registers to run at exit
+    StepProfiler.write_profile(str(tmp_path / "run.json"))
+    out, err = capsys.readouterr()
+    assert json.loads(out)["stats"]["files"] == 1
+    assert "IntegrityMonitor.baseline" in err
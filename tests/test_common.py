@@ -0,0 +1,21 @@
+import time
+
+from vps_core.common import run_command
+
+def test_run_command_returns_output_and_exit_code():
+    assert run_command("echo hello") == (0, "hello\n", "")
+    assert run_command("exit 3", shell=True)[0] == 3
+
+def test_timeout_kills_the_shell_and_its_children():
+    start = time.perf_counter()
+    # The backgrounded sleep keeps stdout open after the shell itself is killed
+    code, _, _ = run_command("sleep 30 & sleep 30; wait", shell=True, timeout=0.5)
+    assert code == 124
+    assert time.perf_counter() - start < 5
+
+def test_fast_command_is_not_reported_as_timed_out():
+    assert run_command("true", timeout=5)[0] == 0
+
+def test_missing_command_is_an_error_not_an_exception():
+    code, _, err = run_command("definitely-not-a-command-vps")
+    assert code == 1 and err
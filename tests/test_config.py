@@ -0,0 +1,62 @@
+import vps_core.config
+from vps_core.config import ConfigManager
+
+def fake_systemctl(monkeypatch, active=True, validate_code=0):
+    commands = []
+    def run_command(cmd, *args, **kwargs):
+        commands.append(cmd)
+        if cmd.startswith("systemctl is-active"):
+            return (0 if active else 3), "", ""
+        if not cmd.startswith("systemctl"):
+            return validate_code, "", "bad config line 3"
+        return 0, "", ""
+    monkeypatch.setattr(vps_core.config, "run_command", run_command)
+    return commands
+
+def test_write_only_when_the_content_hash_differs(tmp_path):
+    path = str(tmp_path / "jail.local")
+    assert ConfigManager.write(path, "[sshd]\nenabled = true\n")
+    assert not ConfigManager.write(path, "[sshd]\nenabled = true\n")
+    assert not ConfigManager.write(path, b"[sshd]\nenabled = true\n")
+    assert ConfigManager.write(path, "[sshd]\nenabled = false\n")
+
+def test_render_leaves_non_template_placeholders():
+    assert ConfigManager.render("port = $port\naction = %(action_)s\n", port="22") == "port = 22\naction = %(action_)s\n"
+
+def test_apply_picks_the_cheapest_action(tmp_path, monkeypatch):
+    path = str(tmp_path / "jail.local")
+    commands = fake_systemctl(monkeypatch)
+    assert ConfigManager.apply("fail2ban", {path: "a\n"}) == "reload"
+    assert commands[-1] == "systemctl reload fail2ban"
+    assert ConfigManager.apply("fail2ban", {path: "a\n"}) == "none"
+    assert ConfigManager.apply("clamav-daemon", {path: "b\n"}) == "restart"
+    # Files read fresh by their users need no service action at all
+    assert ConfigManager.apply("unattended-upgrades", {path: "c\n"}) == "none"
+
+    commands = fake_systemctl(monkeypatch, active=False)
+    assert ConfigManager.apply("fail2ban", {path: "c\n"}) == "start"
+    assert commands[-1] == "systemctl start fail2ban"
+
+def test_apply_rolls_back_when_validation_fails(tmp_path, monkeypatch):
+    existing = tmp_path / "sshd_config"
+    existing.write_bytes(b"Port 22\n")
+    new = tmp_path / "sshd_config.d" / "hardening.conf"
+    new.parent.mkdir()
+    commands = fake_systemctl(monkeypatch, validate_code=255)
+
+    files = {str(existing): "Port 2222\n", str(new): "PermitRootLogin no\n"}
+    assert ConfigManager.apply("ssh", files, validate="sshd -t") is None
+    assert existing.read_bytes() == b"Port 22\n"
+    assert not new.exists()
+    assert not any(cmd.startswith("systemctl") for cmd in commands)
+
+    commands = fake_systemctl(monkeypatch)
+    assert ConfigManager.apply("ssh", files, validate="sshd -t") == "reload"
+    assert existing.read_text() == "Port 2222\n"
+
+def test_unchanged_content_still_gets_its_mode(tmp_path):
+    path = tmp_path / "jail.local"
+    assert ConfigManager.write(str(path), "[sshd]\n", 0o600)
+    path.chmod(0o644)
+    assert not ConfigManager.write(str(path), "[sshd]\n", 0o600)
+    assert path.stat().st_mode & 0o777 == 0o600
@@ -0,0 +1,47 @@
+import os
+import stat
+import configparser
+import subprocess
+
+import pytest
+
+from vps_core.fail2ban import Fail2BanManager
+
+def action(name, **tags):
+    parser = configparser.RawConfigParser()
+    parser.read_string(Fail2BanManager.action_config())
+    command = parser.get("Definition", name)
+    tags = dict(tags, actioncheck=parser.get("Definition", "actioncheck"), blockset=parser.get("Init", "blockset"))
+    for tag, value in tags.items():
+        command = command.replace(f"<{tag}>", str(value))
+    return command
+
+@pytest.fixture
+def nft(tmp_path):
+    """A fake nft on PATH: `list tables` reports the table unless it's gone, `add` fails with ERROR"""
+    script = tmp_path / "nft"
+    script.write_text('#!/bin/sh\necho "$@" >> "$LOG"\n'
+                      'case "$1" in list) [ -z "$GONE" ] && echo "table inet vps_manager";;\n'
+                      '*) [ -n "$ERROR" ] && { echo "$ERROR" >&2; exit 1; };; esac\nexit 0\n')
+    script.chmod(script.stat().st_mode | stat.S_IXUSR)
+    def run(command, **env):
+        env = dict(os.environ, PATH=f"{tmp_path}:{os.environ['PATH']}", LOG=str(tmp_path / "log"), **env)
+        return subprocess.run(["sh", "-c", command], env=env, capture_output=True, text=True).returncode
+    return run
+
+def test_ban_adds_with_the_ban_time(nft, tmp_path):
+    assert nft(action("actionban", ip="203.0.113.7", bantime=3600)) == 0
+    assert (tmp_path / "log").read_text() == "add element inet vps_manager block4 { 203.0.113.7 timeout 3600s }\n"
+
+def test_ban_inside_an_aggregated_prefix_is_not_an_error(nft):
+    assert nft(action("actionban", ip="203.0.113.7", bantime=-1),
+               ERROR="Error: interval overlaps with an existing one") == 0
+
+def test_ban_without_the_table_fails(nft):
+    assert nft(action("actionban", ip="203.0.113.7", bantime=600),
+               ERROR="Error: Could not process rule: No such file or directory") != 0
+    assert nft(action("actionunban", ip="203.0.113.7"), GONE="1") != 0
+
+def test_unban_of_an_address_already_gone_is_not_an_error(nft):
+    assert nft(action("actionunban", ip="203.0.113.7"),
+               ERROR="Error: Could not process rule: No such file or directory") == 0
@@ -0,0 +1,45 @@
+import json
+
+import pytest
+
+from vps_core.fleet import FleetSchedule
+
+@pytest.fixture
+def host(tmp_path, monkeypatch):
+    monkeypatch.setattr(FleetSchedule, "CONFIG_FILE", str(tmp_path / "fleet" / "fleet.json"))
+    monkeypatch.setattr(FleetSchedule, "MACHINE_ID", str(tmp_path / "machine-id"))
+    def make(machine_id):
+        (tmp_path / "machine-id").write_text(machine_id + "\n")
+    return make
+
+def test_offset_without_a_group_is_stable_per_host(host):
+    host("a" * 32)
+    first, warning = FleetSchedule.offset("malware-scan", 240, 30)
+    assert warning is None
+    assert 0 <= first < 240
+    assert FleetSchedule.offset("malware-scan", 240, 30)[0] == first
+    offsets = set()
+    for i in range(20):
+        host(f"{i:032x}")
+        offsets.add(FleetSchedule.offset("malware-scan", 240, 30)[0])
+    assert len(offsets) > 1
+
+def test_host_index_caps_concurrency_per_slot(host):
+    host("b" * 32)
+    slots = {}
+    for index in range(12):
+        FleetSchedule.configure("rack1", group_size=12, max_concurrent=3, host_index=index)
+        offset, warning = FleetSchedule.offset("malware-scan", 240, 60)
+        assert warning is None
+        assert offset % 60 == 0
+        slots[offset] = slots.get(offset, 0) + 1
+    assert sorted(slots) == [0, 60, 120, 180]
+    assert max(slots.values()) == 3
+
+def test_warns_when_the_cap_does_not_fit_the_span(host, tmp_path):
+    host("c" * 32)
+    FleetSchedule.configure("rack1", group_size=20, max_concurrent=2)
+    assert json.loads((tmp_path / "fleet" / "fleet.json").read_text())["storage_group"] == "rack1"
+    offset, warning = FleetSchedule.offset("malware-scan", 240, 60)
+    assert offset in (0, 60, 120, 180)
+    assert "need 10 slots" in warning and "up to 5 at once" in warning
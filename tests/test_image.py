@@ -0,0 +1,107 @@
+import io
+import json
+import tarfile
+import hashlib
+
+import pytest
+
+from vps_core.image import GoldenImage
+
+def digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+def bundle(tmp_path, files, packages=None, units=None, schedules=None, extra=None, manifest_extra=None):
+    """Build a bundle the way export does, from {path: bytes}"""
+    objects = {digest(data): data for data in files.values()}
+    content = {
+        "files": {path: {"sha256": digest(data), "mode": 0o644} for path, data in files.items()},
+        "packages": packages or {},
+        "units": units or [],
+        "schedules": schedules or [],
+    }
+    manifest = {"id": GoldenImage._content_id(content), "created": "2026-01-01T00:00:00",
+                "host": "test", "content": content}
+    manifest.update(manifest_extra or {})
+    path = tmp_path / "bundle.tar.gz"
+    with tarfile.open(path, "w:gz") as tar:
+        members = [("manifest.json", json.dumps(manifest).encode())]
+        members += [(f"objects/{name}", data) for name, data in objects.items()]
+        members += list((extra or {}).items())
+        for name, data in members:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return str(path)
+
+def test_round_trip_keeps_binary_content(tmp_path):
+    compiled = b"YARA\x00\xff\xfe compiled rules"
+    path = bundle(tmp_path, {"/etc/fail2ban/jail.local": b"[sshd]\n",
+                             "/etc/vps_manager/yara/compiled.yarc": compiled},
+                  packages={"fail2ban": "1.0"}, units=["fail2ban.service"], schedules=["scan"])
+    manifest, objects = GoldenImage.read(path)
+    entry = manifest["content"]["files"]["/etc/vps_manager/yara/compiled.yarc"]
+    assert objects[entry["sha256"]] == compiled
+
+@pytest.mark.parametrize("target", [
+    "/etc/cron.d/backdoor",
+    "/etc/fail2ban/../cron.d/backdoor",
+    "/etc/vps_manager/yara/../../cron.d/backdoor",
+    "etc/fail2ban/jail.local",
+])
+def test_rejects_paths_outside_managed_files(tmp_path, target):
+    with pytest.raises(ValueError):
+        GoldenImage.read(bundle(tmp_path, {target: b"* * * * * root sh\n"}))
+
+@pytest.mark.parametrize("field, value", [
+    ("packages", {"netcat": "1.0"}),
+    ("units", ["backdoor.service"]),
+    ("schedules", ["mine"]),
+])
+def test_rejects_unmanaged_packages_units_and_schedules(tmp_path, field, value):
+    with pytest.raises(ValueError, match="unmanaged"):
+        GoldenImage.read(bundle(tmp_path, {}, **{field: value}))
+
+def test_rejects_extra_manifest_keys(tmp_path):
+    with pytest.raises(ValueError, match="manifest keys"):
+        GoldenImage.read(bundle(tmp_path, {}, manifest_extra={"hooks": ["rm -rf /"]}))
+
+def test_rejects_unlisted_objects_and_entries(tmp_path):
+    data = b"stray"
+    with pytest.raises(ValueError, match="not listed"):
+        GoldenImage.read(bundle(tmp_path, {}, extra={f"objects/{digest(data)}": data}))
+    with pytest.raises(ValueError, match="unexpected bundle entry"):
+        GoldenImage.read(bundle(tmp_path, {}, extra={"postinst.sh": b"#!/bin/sh\n"}))
+
+def test_rejects_tampered_content(tmp_path):
+    path = bundle(tmp_path, {"/etc/fail2ban/jail.local": b"[sshd]\n"},
+                  manifest_extra={"id": "0" * 64})
+    with pytest.raises(ValueError, match="id"):
+        GoldenImage.read(path)
+
+def test_symlinked_parent_counts_as_redirected(tmp_path):
+    tmp_path = tmp_path.resolve()
+    real = tmp_path / "real"
+    real.mkdir()
+    (tmp_path / "link").symlink_to(real)
+    assert GoldenImage._redirected(str(tmp_path / "link" / "jail.local"))
+    assert not GoldenImage._redirected(str(real / "jail.local"))
+
+def test_import_sizes_clamd_for_this_host_and_applies_it_once(tmp_path, monkeypatch):
+    from vps_core import image
+    from vps_core.clamd import ClamdTuner
+
+    source = b"LocalSocket /run/clamav/clamd.ctl\nMaxThreads 32\nConcurrentDatabaseReload yes\n"
+    path = bundle(tmp_path, {ClamdTuner.CONF: source})
+    applied = []
+    monkeypatch.setattr(image.AptIndex, "install", staticmethod(lambda packages: (0, "")))
+    monkeypatch.setattr(image.os, "makedirs", lambda *args, **kwargs: None)
+    monkeypatch.setattr(ClamdTuner, "profile", staticmethod(lambda: {"MaxThreads": "2",
+                                                                     "ConcurrentDatabaseReload": "no"}))
+    monkeypatch.setattr(ClamdTuner, "apply", staticmethod(lambda: pytest.fail("clamd applied twice")))
+    monkeypatch.setattr(image.ConfigManager, "apply",
+                        staticmethod(lambda service, files, mode, validate=None: applied.append((service, files))
+                                     or "restart"))
+
+    assert GoldenImage.import_bundle(path)
+    assert applied == [("clamav-daemon", {ClamdTuner.CONF: b"LocalSocket /run/clamav/clamd.ctl\nMaxThreads 2\n"
+                                                          b"ConcurrentDatabaseReload no\n"})]
@@ -0,0 +1,57 @@
+import os
+import shutil
+
+import pytest
+
+from vps_core.integrity import IntegrityMonitor
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / "etc"
+    (root / "app" / "conf.d").mkdir(parents=True)
+    (root / "app" / "conf.d" / "a.conf").write_text("a = 1\n")
+    (root / "app" / "main.conf").write_text("main\n")
+    (root / "hosts").write_text("127.0.0.1 localhost\n")
+    return root
+
+def monitor(tree, tmp_path, quick=False):
+    return IntegrityMonitor([str(tree)], db_path=str(tmp_path / "index.sqlite3"), quick=quick)
+
+def test_unchanged_tree_reports_nothing_and_keeps_its_digest(tree, tmp_path):
+    first = monitor(tree, tmp_path)
+    digest = first.baseline()["roots"][str(tree)]
+    first.close()
+
+    quick = monitor(tree, tmp_path, quick=True)
+    before = quick.db.total_changes
+    report = quick.check(update=True)
+    assert report["roots"][str(tree)] == digest
+    assert not any(report["changes"].values())
+    assert report["stats"]["hashed"] == 0
+    assert quick.db.total_changes == before
+    quick.close()
+
+def test_changes_are_reported_by_kind(tree, tmp_path):
+    monitor(tree, tmp_path).baseline()
+    (tree / "hosts").write_text("0.0.0.0 evil\n")
+    (tree / "app" / "conf.d" / "b.conf").write_text("b = 2\n")
+    os.remove(tree / "app" / "main.conf")
+
+    changes = monitor(tree, tmp_path).check()["changes"]
+    assert changes["modified"] == [(str(tree / "hosts"), ["content"])]
+    assert changes["added"] == [(str(tree / "app" / "conf.d" / "b.conf"), [])]
+    assert changes["removed"] == [(str(tree / "app" / "main.conf"), [])]
+
+def test_directory_replaced_by_a_file_drops_its_subtree(tree, tmp_path):
+    monitor(tree, tmp_path).baseline()
+    shutil.rmtree(tree / "app")
+    (tree / "app").write_text("not a directory any more\n")
+
+    checker = monitor(tree, tmp_path)
+    changes = checker.check(update=True)["changes"]
+    assert changes["modified"] == [(str(tree / "app"), ["type"])]
+    assert sorted(path for path, _ in changes["removed"]) == [str(tree / "app" / "conf.d" / "a.conf"),
+                                                              str(tree / "app" / "main.conf")]
+    rows = [os.fsdecode(path) for (path,) in checker.db.execute("SELECT path FROM dirs")]
+    assert rows == [str(tree)]
+    checker.close()
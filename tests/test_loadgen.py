@@ -0,0 +1,29 @@
+import socket
+import resource
+
+import pytest
+
+from vps_core.loadgen import flood
+
+def test_counts_completed_connections_past_fd_setsize():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard != resource.RLIM_INFINITY and hard < 1300:
+        pytest.skip("needs more than 1024 descriptors")
+    limit = 4096 if hard == resource.RLIM_INFINITY else min(4096, hard)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (max(soft, limit), hard))
+    try:
+        with socket.socket() as server:
+            server.bind(("127.0.0.1", 0))
+            server.listen(2048)
+            result = flood("127.0.0.1", server.getsockname()[1], 1100, 50000, settle=0.2)
+    finally:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
+    assert result["attempts"] == 1100
+    assert result["connected"] == 1100 and result["dropped"] == 0
+
+def test_refused_attempts_are_not_connected():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    result = flood("127.0.0.1", port, 5, 1000, settle=0.2)
+    assert result["connected"] == 0 and result["dropped"] == 5
@@ -0,0 +1,62 @@
+from vps_core.packages import PackageState
+
+STATUS = """Package: openssh-server
+Status: install ok installed
+Priority: optional
+Architecture: amd64
+Version: 1:9.6p1-3ubuntu13
+Description: secure shell (SSH) server
+ Provides: a description line starting with P
+
+Package: linux-image-6.8.0-40-generic
+Status: hold ok installed
+Architecture: amd64
+Version: 6.8.0-40.40
+
+Package: libc6
+Status: install ok installed
+Architecture: i386
+Version: 2.39-0ubuntu8
+
+Package: libc6
+Status: install ok installed
+Architecture: amd64
+Version: 2.39-0ubuntu8
+
+Package: clamav
+Status: deinstall ok config-files
+Architecture: amd64
+Version: 1.0.5
+
+Package: fail2ban
+Status: install ok not-installed
+"""
+
+def test_parse_reads_want_state_version_and_arch():
+    index = PackageState._parse(STATUS)
+    assert index["openssh-server"] == {"want": "install", "state": "installed",
+                                       "version": "1:9.6p1-3ubuntu13", "arch": "amd64"}
+    assert index["linux-image-6.8.0-40-generic"]["want"] == "hold"
+    assert index["clamav"]["state"] == "config-files"
+    assert index["fail2ban"] == {"want": "install", "state": "not-installed", "version": "", "arch": ""}
+    # Multi-arch packages are indexed per architecture and by bare name
+    assert index["libc6:i386"]["arch"] == "i386"
+    assert index["libc6:amd64"]["arch"] == "amd64"
+    assert "libc6" in index
+
+def test_queries_follow_the_status_file(tmp_path, monkeypatch):
+    status = tmp_path / "status"
+    status.write_text(STATUS)
+    monkeypatch.setattr(PackageState, "STATUS_FILE", str(status))
+    monkeypatch.setattr(PackageState, "_stamp", None)
+
+    assert PackageState.version("openssh-server") == "1:9.6p1-3ubuntu13"
+    assert PackageState.version("clamav") is None
+    assert PackageState.is_held("linux-image-6.8.0-40-generic")
+    assert not PackageState.is_held("openssh-server")
+    assert PackageState.installed_matching("lib") == ["libc6"]
+    assert PackageState.missing(["openssh-server", "clamav", "fail2ban", "rkhunter"]) == ["clamav", "fail2ban", "rkhunter"]
+
+    # A changed file is re-read
+    status.write_text(STATUS + "\nPackage: rkhunter\nStatus: install ok installed\nVersion: 1.4.6\n")
+    assert PackageState.is_installed("rkhunter")
@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+import vps_core.planner
+from vps_core.planner import OperationPlanner
+from vps_core.profiler import StepProfiler
+
+HERE = {"hostname": "web1", "kernel": "6.8.0", "cpus": 2, "memory_gb": 3.8}
+
+def node(name, kind="step", wall_s=0.0, bytes_written=0, net_bytes=0, exit_code=0, children=()):
+    return dict(StepProfiler._new_node(name, kind), wall_s=wall_s, bytes_written=bytes_written,
+                net_bytes=net_bytes, exit_code=exit_code, children=list(children))
+
+def write_run(directory, index, host, steps):
+    path = directory / f"run-20261001-{index:06d}.json"
+    path.write_text(json.dumps({"host": host, "steps": steps}))
+
+@pytest.fixture
+def planner(tmp_path, monkeypatch):
+    monkeypatch.setattr(StepProfiler, "host_class", staticmethod(lambda: HERE))
+    monkeypatch.setattr(vps_core.planner.ProvisioningJournal, "PATH", str(tmp_path / "journal.json"))
+    def make():
+        return OperationPlanner(profile_dir=str(tmp_path))
+    return make
+
+def test_estimate_takes_medians_and_counts_restart_downtime(tmp_path, planner):
+    for i, wall in enumerate([10.0, 30.0, 20.0]):
+        write_run(tmp_path, i, HERE, [node("Fail2BanManager.install_fail2ban", wall_s=wall,
+                                           bytes_written=1000 * (i + 1), net_bytes=500, children=[
+            node("apt-get install -y fail2ban", "command", wall_s=wall - 2),
+            node("systemctl reload fail2ban", "command", wall_s=0.3),
+            node("systemctl restart ssh.service", "command", wall_s=1.0 + i),
+            node("systemctl start clamav-daemon", "command", wall_s=4.0),
+        ])])
+    estimate = planner().estimate("Fail2BanManager.install_fail2ban")
+    assert estimate["runs"] == 3
+    assert estimate["duration_s"] == 20.0
+    assert estimate["duration_max_s"] == 30.0
+    assert estimate["bytes_written"] == 2000
+    assert estimate["net_bytes"] == 500
+    services = estimate["services"]
+    assert services["fail2ban"] == {"action": "reload", "runs": 3, "downtime_s": 0.0}
+    assert services["ssh"] == {"action": "restart", "runs": 3, "downtime_s": 2.0}
+    assert services["clamav-daemon"]["downtime_s"] == 0.0
+    assert estimate["downtime_s"] == 2.0
+
+def test_same_host_class_wins_and_failures_only_fill_gaps(tmp_path, planner):
+    other = dict(HERE, cpus=16, memory_gb=62.8)
+    write_run(tmp_path, 0, other, [node("SwapManager.create_swap", wall_s=1.0),
+                                   node("SystemUpdater.update_system", wall_s=100.0)])
+    write_run(tmp_path, 1, HERE, [node("SwapManager.create_swap", wall_s=8.0)])
+    write_run(tmp_path, 2, HERE, [node("SwapManager.create_swap", wall_s=90.0, exit_code=1)])
+    plan = planner()
+    assert plan.estimate("SwapManager.create_swap")["duration_s"] == 8.0
+    # A host of another class is better than no history at all
+    assert plan.estimate("SystemUpdater.update_system")["duration_s"] == 100.0
+
+def test_plan_totals_known_steps_and_falls_back_to_the_journal(tmp_path, planner):
+    write_run(tmp_path, 0, HERE, [node("SwapManager.create_swap", wall_s=8.0, bytes_written=4096, children=[
+        node("shutdown -r +1", "command", wall_s=0.1)])])
+    (tmp_path / "journal.json").write_text(json.dumps({"steps": {"setup-ufw": {"duration_s": 3.0}}}))
+    plan = planner().plan(["SwapManager.create_swap", "FirewallManager.setup_ufw", "MalwareScanner.scan"])
+    total = plan["total"]
+    assert total["duration_s"] == 11.0
+    assert total["bytes_written"] == 4096
+    assert total["downtime_s"] == OperationPlanner.REBOOT_S
+    assert total["unknown_steps"] == ["MalwareScanner.scan"]
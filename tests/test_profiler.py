@@ -0,0 +1,70 @@
+import os
+
+from vps_core.profiler import StepProfiler
+
+def run_one_step(monkeypatch):
+    monkeypatch.setattr(StepProfiler, "_steps", [])
+    monkeypatch.setattr(StepProfiler, "_stack", [])
+    monkeypatch.setattr(StepProfiler, "host_class", staticmethod(lambda: {"cpus": 1, "memory_gb": 1.0}))
+
+    @StepProfiler.step
+    def work():
+        return True
+
+    work()
+
+def test_unwritable_profile_dir_is_a_warning_not_a_traceback(tmp_path, monkeypatch, caplog):
+    run_one_step(monkeypatch)
+    blocker = tmp_path / "not-a-dir"
+    blocker.write_text("")
+    monkeypatch.setattr(StepProfiler, "PROFILE_DIR", str(blocker / "profiles"))
+    assert StepProfiler.write_profile() is None
+    assert "Could not save the run profile" in caplog.text
+
+def test_old_profiles_are_pruned(tmp_path, monkeypatch):
+    run_one_step(monkeypatch)
+    monkeypatch.setattr(StepProfiler, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(StepProfiler, "KEEP_PROFILES", 3)
+    for day in range(1, 6):
+        for suffix in (".json", ".folded"):
+            (tmp_path / f"run-2026010{day}-000000{suffix}").write_text("{}")
+    (tmp_path / "notes.txt").write_text("")
+
+    path = StepProfiler.write_profile()
+    runs = sorted(name for name in os.listdir(tmp_path) if name.endswith(".json"))
+    assert runs == ["run-20260104-000000.json", "run-20260105-000000.json", os.path.basename(path)]
+    assert not (tmp_path / "run-20260101-000000.folded").exists()
+    assert (tmp_path / "notes.txt").exists()
+
+def test_commands_from_pool_threads_are_charged_to_the_running_step(monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+    from types import SimpleNamespace
+
+    monkeypatch.setattr(StepProfiler, "_steps", [])
+    monkeypatch.setattr(StepProfiler, "_stack", [])
+    usage = SimpleNamespace(ru_utime=0.001, ru_stime=0.0, ru_maxrss=100, ru_oublock=1)
+
+    @StepProfiler.step
+    def nested():
+        StepProfiler.record_command("inner", 0.0, usage, 0)
+
+    @StepProfiler.step
+    def scan():
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(lambda i: StepProfiler.record_command(f"batch {i}", 0.0, usage, 0), range(2000)))
+            pool.submit(nested).result()
+
+    scan()
+    (step,) = StepProfiler._steps
+    commands = [child for child in step["children"] if child["kind"] == "command"]
+    (inner,) = [child for child in step["children"] if child["kind"] == "step"]
+    assert len(commands) == 2000
+    assert inner["children"][0]["name"] == "inner"
+    assert step["bytes_written"] == 2001 * 512
+
+def test_summary_stays_off_stdout(tmp_path, monkeypatch, capsys):
+    run_one_step(monkeypatch)
+    path = StepProfiler.write_profile(str(tmp_path / "run.json"))
+    out, err = capsys.readouterr()
+    assert out == ""
+    assert "Run profile (wall time share)" in err and f"Run profile saved to {path}" in err
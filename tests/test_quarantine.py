@@ -0,0 +1,56 @@
+import json
+import os
+
+import pytest
+
+from vps_core.quarantine import QuarantineVault
+
+@pytest.fixture
+def vault(tmp_path):
+    return QuarantineVault(str(tmp_path / "vault"))
+
+@pytest.fixture
+def infected(tmp_path):
+    path = tmp_path / "www" / "shell.php"
+    path.parent.mkdir()
+    path.write_bytes(b"<?php eval($_POST['x']); ?>")
+    os.chmod(path, 0o640)
+    return str(path)
+
+def test_quarantine_and_restore_round_trip(vault, infected):
+    item_id = vault.quarantine(infected, [("clamav", "Php.Webshell")])
+    assert not os.path.exists(infected)
+    record = vault.get(item_id)
+    assert record["status"] == "quarantined" and record["sha256"]
+
+    assert vault.restore(item_id)
+    assert open(infected, "rb").read() == b"<?php eval($_POST['x']); ?>"
+    assert os.stat(infected).st_mode & 0o777 == 0o640
+    assert vault.items() == []
+
+def test_record_is_written_before_the_move(vault, infected, monkeypatch):
+    seen = []
+
+    def move(source, target, device):
+        seen.extend(vault.items())
+        raise OSError("disk full")
+
+    monkeypatch.setattr(vault, "_move", move)
+    with pytest.raises(OSError):
+        vault.quarantine(infected, [("yara", "webshell")])
+    assert [record["status"] for record in seen] == ["pending"]
+    # A failed move leaves neither a record nor the file's absence behind
+    assert vault.items() == [] and os.path.exists(infected)
+
+def test_interrupted_move_restores_to_nothing_lost(vault, infected):
+    # As if the process died after the record was written and a partial copy started
+    item_id = "1-interrupted"
+    record = {"id": item_id, "path": infected, "status": "pending", "sha256": None,
+              "detections": [], "quarantined_at": "2026-01-01T00:00:00"}
+    with open(os.path.join(vault.vault_dir, f"{item_id}.json"), "w") as f:
+        json.dump(record, f)
+    open(os.path.join(vault.vault_dir, f"{item_id}.bin"), "wb").write(b"<?php")
+
+    assert vault.restore(item_id)
+    assert os.listdir(vault.vault_dir) == []
+    assert open(infected, "rb").read().startswith(b"<?php eval")
@@ -0,0 +1,40 @@
+import os
+import time
+
+import pytest
+
+from vps_core.reclaim import MB, DiskReclaimer
+
+@pytest.mark.parametrize("path, expected", [
+    ("/var/log/journal/abc/system@0001-0002.journal", ("journal", "archived")),
+    ("/var/log/journal/abc/system.journal", ("journal", "active")),
+    ("/var/log/syslog.1", None),            # left for delaycompress
+    ("/var/log/syslog.2", ("rotated_logs", "")),
+    ("/var/log/syslog.2.gz", None),
+    ("/var/log/auth.log-20260101", ("rotated_logs", "")),
+    ("/var/crash/_usr_bin_foo.0.crash", ("core_dumps", "")),
+    ("/boot/vmlinuz-6.1.0-9-amd64", ("kernels", "6.1.0-9-amd64")),
+    ("/boot/grub/grub.cfg", None),
+    ("/lib/modules/6.1.0-9-amd64/modules.dep", ("kernels", "6.1.0-9-amd64")),
+    ("/var/cache/apt/archives/curl_8.0_amd64.deb", ("apt_cache", "")),
+    ("/var/cache/apt/archives/lock", None),
+])
+def test_classify(path, expected):
+    assert DiskReclaimer._classify(path, os.path.basename(path)) == expected
+
+def test_plan_keeps_running_and_newest_kernels_and_young_files(monkeypatch):
+    monkeypatch.setattr(os, "uname", lambda: os.uname_result(("Linux", "h", "6.1.0-9-amd64", "", "x86_64")))
+    reclaimer = DiskReclaimer({"journal_keep_mb": 100})
+    old, new = time.time() - 10 * 86400, time.time()
+    reclaimer.index["kernels"] = [(f"/boot/vmlinuz-{release}", 10 * MB, old, release)
+                                  for release in ("6.1.0-7-amd64", "6.1.0-9-amd64", "6.1.0-10-amd64")]
+    reclaimer.index["journal"] = [(f"/var/log/journal/x/system@{i}.journal", 64 * MB, old + i, "archived")
+                                  for i in range(4)]
+    reclaimer.journal_bytes = 4 * 64 * MB + 8 * MB
+    reclaimer.index["core_dumps"] = [("/var/crash/old.crash", MB, old, ""), ("/var/crash/new.crash", MB, new, "")]
+
+    plan = reclaimer.plan()
+    assert plan["kernels"]["releases"] == ["6.1.0-7-amd64"]
+    # 264 MB down to 100 MB takes the three oldest 64 MB archives
+    assert plan["journal"]["items"] == 3
+    assert plan["core_dumps"]["paths"] == ["/var/crash/old.crash"]
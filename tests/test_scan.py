@@ -0,0 +1,117 @@
+import os
+
+import pytest
+
+from vps_core import scan
+from vps_core.clamd import ClamdTuner
+from vps_core.scan import ClamAVEngine, ScanPipeline
+
+CLAMD_OUTPUT = """/srv/a.php: Php.Webshell-1 FOUND
+/srv/big.tar: Heuristics.Limits.Exceeded.MaxScanSize FOUND
+/srv/old.zip: Heuristics.Limits.Exceeded FOUND
+"""
+
+@pytest.fixture
+def clamd(monkeypatch):
+    """A ClamAVEngine that believes clamd is running and returns CLAMD_OUTPUT"""
+    monkeypatch.setattr(scan, "run_command", lambda command, **kwargs: (1, CLAMD_OUTPUT, "")
+                        if command.startswith("clamdscan") else (0, "", ""))
+    settings = {"AlertExceedsMax": "yes", "MaxScanTime": "120000"}
+    monkeypatch.setattr(ClamdTuner, "configured", staticmethod(settings.get))
+    return settings
+
+def test_limit_alerts_are_skips_not_hits(clamd, tmp_path):
+    engine = ClamAVEngine(workers=1)
+    hits, skipped = engine._scan(str(tmp_path / "list"))
+    assert hits == [("/srv/a.php", "clamav", "Php.Webshell-1")]
+    assert skipped == [("/srv/big.tar", "clamav", "MaxScanSize"), ("/srv/old.zip", "clamav", "limit")]
+    engine.pool.shutdown()
+
+def test_per_file_errors_keep_the_batch_results(clamd, tmp_path, monkeypatch):
+    engine = ClamAVEngine(workers=1)
+    output = CLAMD_OUTPUT + "/srv/tmp/sess_1: lstat() failed: No such file or directory. ERROR\n"
+    monkeypatch.setattr(scan, "run_command", lambda command, **kwargs: (2, output, ""))
+    hits, skipped = engine._scan(str(tmp_path / "list"))
+    assert hits == [("/srv/a.php", "clamav", "Php.Webshell-1")]
+    assert ("/srv/tmp/sess_1", "clamav", "error") in skipped
+
+    warning = "WARNING: /srv/gone.php: Can't access file\n"
+    monkeypatch.setattr(scan, "run_command", lambda command, **kwargs: (2, "", warning))
+    assert engine._scan(str(tmp_path / "list")) == ([], [("/srv/gone.php", "clamav", "error")])
+
+    # An error without a single per-file result is the scanner itself failing
+    monkeypatch.setattr(scan, "run_command", lambda command, **kwargs: (2, "", "ERROR: Can't connect to clamd"))
+    with pytest.raises(RuntimeError):
+        engine._scan(str(tmp_path / "list"))
+    engine.pool.shutdown()
+
+def test_limits_clamd_ignores_are_reported(clamd, capsys):
+    ClamAVEngine(workers=1, limits={"MaxScanTime": 5, "MaxFileSize": 1}).pool.shutdown()
+    out = capsys.readouterr().out
+    assert "MaxScanTime 120000" in out and "only apply to YARA" in out
+    assert "AlertExceedsMax" not in out
+
+def test_untuned_clamd_is_reported(clamd, capsys):
+    clamd["AlertExceedsMax"] = None
+    ClamAVEngine(workers=1).pool.shutdown()
+    assert "clamd apply" in capsys.readouterr().out
+
+class RecordingEngine:
+    name = "fake"
+
+    def __init__(self):
+        self.paths, self.skipped = [], []
+
+    def add(self, paths):
+        self.paths.extend(paths)
+
+    def collect(self):
+        return []
+
+    def finish(self):
+        return [(path, self.name, "Test.Sig") for path in self.paths if path.endswith("bad")]
+
+def test_pipeline_skips_oversized_files_before_the_engines(tmp_path, monkeypatch):
+    monkeypatch.setattr(ScanPipeline, "LOG_FILE", str(tmp_path / "scan.log"))
+    (tmp_path / "root").mkdir()
+    (tmp_path / "root" / "bad").write_bytes(b"x")
+    (tmp_path / "root" / "huge").write_bytes(b"x" * 2048)
+    engine = RecordingEngine()
+    report = ScanPipeline([engine], limits={"MaxFileSize": 1024}).run([str(tmp_path / "root")])
+    assert engine.paths == [str(tmp_path / "root" / "bad")]
+    assert report["hits"] == [(str(tmp_path / "root" / "bad"), "fake", "Test.Sig")]
+    assert report["skipped"] == [(str(tmp_path / "root" / "huge"), "pipeline", "MaxFileSize")]
+
+def test_scan_log_drops_the_oldest_runs_past_its_cap(tmp_path, monkeypatch):
+    from vps_core.malware import MalwareScanner
+
+    log = tmp_path / "scan.log"
+    monkeypatch.setattr(ScanPipeline, "LOG_FILE", str(log))
+    monkeypatch.setattr(ScanPipeline, "LOG_MAX_BYTES", 4096)
+    monkeypatch.setattr(MalwareScanner, "SCAN_LOGS", [str(log)])
+    (tmp_path / "root").mkdir()
+    for i in range(40):
+        (tmp_path / "root" / f"file{i}").write_bytes(b"x")
+        ScanPipeline([RecordingEngine()]).run([str(tmp_path / "root")])
+        assert log.stat().st_size <= 4096 + 1024
+
+    text = log.read_text()
+    # Whole runs only: the log starts with a run's first line, not mid-summary
+    assert text.startswith("\n----------- SCAN SUMMARY")
+    assert MalwareScanner.last_scan_summary()["files"] == 40
+
+def test_walk_never_enters_the_quarantine_vault(tmp_path):
+    from vps_core.quarantine import QuarantineVault
+
+    root = tmp_path / "root"
+    (root / "srv").mkdir(parents=True)
+    (root / "srv" / "index.php").write_bytes(b"x")
+    vault = QuarantineVault(str(root / "vault"))
+    os.makedirs(vault.vault_dir, exist_ok=True)
+    (root / "vault" / "0001.bin").write_bytes(b"webshell")
+
+    walked = [path for path, _ in ScanPipeline([RecordingEngine()], vault=vault).walk([str(root)])]
+    assert walked == [str(root / "srv" / "index.php")]
+    # Nor when the vault itself is the root asked for
+    assert list(ScanPipeline([RecordingEngine()], vault=vault).walk([str(root / "vault")])) == []
+    assert QuarantineVault.VAULT_DIR in ScanPipeline.EXCLUDE
@@ -0,0 +1,28 @@
+import os
+
+import pytest
+
+from vps_core.update_pipeline import UpdatePipeline
+
+@pytest.fixture
+def kernels(monkeypatch):
+    def set_kernels(running, newest):
+        uname = os.uname()
+        monkeypatch.setattr(os, "uname", lambda: os.uname_result(uname[:2] + (running,) + uname[3:]))
+        monkeypatch.setattr(UpdatePipeline, "newest_kernel", staticmethod(lambda: newest))
+    return set_kernels
+
+def test_reboot_only_for_a_newer_installed_kernel(kernels):
+    kernels("6.1.0-9-amd64", "6.1.0-21-amd64")
+    assert UpdatePipeline.reboot_required()
+    kernels("6.1.0-21-amd64", "6.1.0-21-amd64")
+    assert not UpdatePipeline.reboot_required()
+    # A provider or custom kernel newer than anything in /boot
+    kernels("6.8.12-custom", "6.1.0-21-amd64")
+    assert not UpdatePipeline.reboot_required()
+    kernels("6.1.0-21-amd64", None)
+    assert not UpdatePipeline.reboot_required()
+
+def test_releases_order_numerically():
+    assert UpdatePipeline._version_key("6.1.0-21-amd64") > UpdatePipeline._version_key("6.1.0-9-amd64")
+    assert UpdatePipeline._version_key("6.10.0-1-amd64") > UpdatePipeline._version_key("6.9.0-1-amd64")
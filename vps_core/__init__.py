@@ -0,0 +1,50 @@
+"""Shared core for the VPS management and hardening scripts
+
+Subsystems are loaded lazily: `from vps_core import SwapManager` only
+imports vps_core.swap, so small entry points stay cheap to start.
+"""
+
+import importlib
+
+_LAZY = {
+    "SystemUpdater": "updates",
+    "SystemCleaner": "cleaner",
+    "UserManager": "users",
+    "FirewallManager": "firewall",
+    "Fail2BanManager": "fail2ban",
+    "SwapManager": "swap",
+    "MalwareScanner": "malware",
+    "HostBenchmark": "benchmark",
+    "MetricsExporter": "metrics",
+    "StepProfiler": "profiler",
+    "HardeningAuditor": "audit",
+    "ConfigManager": "config",
+    "ProvisioningJournal": "journal",
+    "PackageState": "packages",
+    "AptIndex": "apt",
+    "UpdatePipeline": "update_pipeline",
+    "AddressSet": "addrset",
+    "SshAuthLog": "authlog",
+    "SshdConfig": "sshd",
+    "IntegrityMonitor": "integrity",
+    "HashAllowlist": "allowlist",
+    "ScanPipeline": "scan",
+    "QuarantineVault": "quarantine",
+    "ClamdTuner": "clamd",
+    "FleetSchedule": "fleet",
+    "DiskReclaimer": "reclaim",
+    "GoldenImage": "image",
+    "OperationPlanner": "planner",
+}
+
+__all__ = sorted(_LAZY)
+
+def __getattr__(name: str):
+    if name in _LAZY:
+        value = getattr(importlib.import_module(f"{__name__}.{_LAZY[name]}"), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,154 @@
+"""CIDR-aggregating address sets for ban and allow lists
+
+Keeps a minimal set of non-overlapping networks per address family,
+updated incrementally: adding an address merges it with its sibling
+network whenever both halves of a prefix are present, and an optional
+threshold widens to the enclosing /24 (/64 for IPv6) once enough
+addresses inside it have been added.
+"""
+
+import ipaddress
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Union
+
+Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+class AddressSet:
+    """A set of IPv4/IPv6 addresses and prefixes stored as collapsed CIDRs"""
+
+    BITS = {4: 32, 6: 128}
+    AGGREGATE_PREFIX = {4: 24, 6: 64}
+
+    def __init__(self, addresses: Iterable[str] = (), threshold: Optional[int] = None,
+                 aggregate_prefix: Optional[Dict[int, int]] = None):
+        """
+        `threshold` is how many distinct entries inside one aggregate prefix
+        widen the set to that whole prefix; None keeps the set exact.
+        """
+        self.threshold = threshold
+        self.aggregate_prefix = dict(aggregate_prefix or AddressSet.AGGREGATE_PREFIX)
+        # family -> prefix length -> network addresses as integers
+        self._nets: Dict[int, Dict[int, Set[int]]] = {4: {}, 6: {}}
+        # family -> aggregate network -> entries added inside it
+        self._counts: Dict[int, Dict[int, int]] = {4: {}, 6: {}}
+        self.update(addresses)
+
+    @staticmethod
+    def _parse(address: Union[str, Network]) -> Network:
+        return ipaddress.ip_network(address, strict=False)
+
+    def _covering(self, family: int, value: int, prefixlen: int) -> Optional[int]:
+        """Prefix length of the stored network containing value/prefixlen, if any"""
+        bits = AddressSet.BITS[family]
+        for length, nets in self._nets[family].items():
+            if length <= prefixlen and (value >> (bits - length)) << (bits - length) in nets:
+                return length
+        return None
+
+    def _insert(self, family: int, value: int, prefixlen: int) -> bool:
+        if self._covering(family, value, prefixlen) is not None:
+            return False
+        bits = AddressSet.BITS[family]
+        nets = self._nets[family]
+
+        # Drop anything the new network covers
+        end = value + (1 << (bits - prefixlen))
+        for length in [length for length in nets if length > prefixlen]:
+            inside = {net for net in nets[length] if value <= net < end}
+            nets[length] -= inside
+            if not nets[length]:
+                del nets[length]
+
+        # Merge with the sibling half for as long as it is present
+        while prefixlen > 0:
+            sibling = value ^ (1 << (bits - prefixlen))
+            if sibling not in nets.get(prefixlen, ()):
+                break
+            nets[prefixlen].discard(sibling)
+            if not nets[prefixlen]:
+                del nets[prefixlen]
+            prefixlen -= 1
+            value &= ~(1 << (bits - prefixlen - 1))
+        nets.setdefault(prefixlen, set()).add(value)
+        return True
+
+    def add(self, address: Union[str, Network]) -> bool:
+        """Add an address or prefix; return False if it was already covered"""
+        network = self._parse(address)
+        family = network.version
+        value, prefixlen = int(network.network_address), network.prefixlen
+        if not self._insert(family, value, prefixlen):
+            return False
+
+        aggregate = self.aggregate_prefix[family]
+        if self.threshold and prefixlen > aggregate:
+            shift = AddressSet.BITS[family] - aggregate
+            key = (value >> shift) << shift
+            counts = self._counts[family]
+            counts[key] = counts.get(key, 0) + 1
+            if counts[key] >= self.threshold:
+                self._insert(family, key, aggregate)
+        return True
+
+    def update(self, addresses: Iterable[Union[str, Network]]) -> int:
+        """Add many addresses; return how many changed the set"""
+        return sum(self.add(address) for address in addresses)
+
+    def discard(self, address: Union[str, Network]) -> bool:
+        """Remove an address or prefix, splitting any stored network around it"""
+        network = self._parse(address)
+        family = network.version
+        bits = AddressSet.BITS[family]
+        value, prefixlen = int(network.network_address), network.prefixlen
+
+        length = self._covering(family, value, prefixlen)
+        if length is None:
+            return False
+        nets = self._nets[family]
+        container = (value >> (bits - length)) << (bits - length)
+        nets[length].discard(container)
+        if not nets[length]:
+            del nets[length]
+        for remainder in ipaddress.ip_network((container, length)).address_exclude(network):
+            nets.setdefault(remainder.prefixlen, set()).add(int(remainder.network_address))
+
+        if self.threshold and prefixlen > self.aggregate_prefix[family]:
+            shift = bits - self.aggregate_prefix[family]
+            key = (value >> shift) << shift
+            if self._counts[family].get(key):
+                self._counts[family][key] -= 1
+        return True
+
+    def covering(self, address: Union[str, Network]) -> Optional[Network]:
+        """The stored network an address or prefix falls in, if any"""
+        network = self._parse(address)
+        bits = AddressSet.BITS[network.version]
+        length = self._covering(network.version, int(network.network_address), network.prefixlen)
+        if length is None:
+            return None
+        value = (int(network.network_address) >> (bits - length)) << (bits - length)
+        return ipaddress.ip_network((value, length))
+
+    def __contains__(self, address: Union[str, Network]) -> bool:
+        network = self._parse(address)
+        return self._covering(network.version, int(network.network_address), network.prefixlen) is not None
+
+    def __len__(self) -> int:
+        """Number of CIDRs, i.e. the number of firewall set elements"""
+        return sum(len(nets) for family in self._nets.values() for nets in family.values())
+
+    def __iter__(self) -> Iterator[Network]:
+        for family in (4, 6):
+            for network in self.networks(family):
+                yield network
+
+    def networks(self, family: int) -> List[Network]:
+        """The stored networks of one family, in address order"""
+        return sorted(
+            (ipaddress.ip_network((value, length)) for length, nets in self._nets[family].items() for value in nets),
+            key=lambda network: int(network.network_address),
+        )
+
+    def cidrs(self, family: Optional[int] = None) -> List[str]:
+        """The set as CIDR strings, optionally limited to one family"""
+        families = (family,) if family else (4, 6)
+        return [str(network) for version in families for network in self.networks(version)]
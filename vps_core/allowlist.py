@@ -0,0 +1,143 @@
+"""Known-good content hashes that let the scanner skip files
+
+Built from the md5sums dpkg ships for every installed package plus any
+release-artifact directories we register, and stored as a sorted array
+of 16-byte MD5 digests. Lookups binary-search the mmap'ed file, so
+checking a file costs one hash of its contents instead of a signature
+scan, and loading the list costs nothing up front.
+
+A sorted array rather than a Bloom filter: a false positive here would
+mean skipping an unscanned file, so membership has to be exact.
+"""
+
+import os
+import glob
+import json
+import mmap
+import hashlib
+from typing import Iterable, List, Optional, Set
+
+from .common import STATE_DIR, Colors, atomic_write, print_colored
+from .packages import PackageState
+
+class HashAllowlist:
+    """Sorted, mmap'ed set of known-good MD5 digests"""
+
+    PATH = os.path.join(STATE_DIR, "allowlist.md5")
+    SOURCES_FILE = os.path.join(STATE_DIR, "allowlist_sources.json")
+    DPKG_MD5SUMS = "/var/lib/dpkg/info/*.md5sums"
+    DIGEST_SIZE = 16
+    CHUNK = 1024 * 1024
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or HashAllowlist.PATH
+        self._map: Optional[mmap.mmap] = None
+        self._count = 0
+        try:
+            with open(self.path, "rb") as f:
+                if os.fstat(f.fileno()).st_size:
+                    self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    self._count = len(self._map) // HashAllowlist.DIGEST_SIZE
+        except FileNotFoundError:
+            pass
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, digest: bytes) -> bool:
+        size = HashAllowlist.DIGEST_SIZE
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            candidate = self._map[middle * size:(middle + 1) * size]
+            if candidate < digest:
+                low = middle + 1
+            elif candidate > digest:
+                high = middle
+            else:
+                return True
+        return False
+
+    @staticmethod
+    def file_digest(path: str) -> bytes:
+        digest = hashlib.md5()
+        with open(path, "rb", buffering=0) as f:
+            while True:
+                chunk = f.read(HashAllowlist.CHUNK)
+                if not chunk:
+                    break
+                digest.update(chunk)
+        return digest.digest()
+
+    def is_known(self, path: str) -> bool:
+        """Whether a file's content matches a known-good digest"""
+        return self._count > 0 and HashAllowlist.file_digest(path) in self
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+            self._count = 0
+
+    @staticmethod
+    def _dpkg_digests() -> Set[bytes]:
+        digests = set()
+        for path in glob.glob(HashAllowlist.DPKG_MD5SUMS):
+            with open(path, "rb") as f:
+                for line in f:
+                    # "<32 hex digits>  <path relative to />"
+                    try:
+                        digests.add(bytes.fromhex(line[:32].decode("ascii")))
+                    except ValueError:
+                        continue
+        return digests
+
+    @staticmethod
+    def _artifact_digests(directories: Iterable[str]) -> Set[bytes]:
+        digests = set()
+        for directory in directories:
+            for root, _, files in os.walk(directory):
+                for name in files:
+                    path = os.path.join(root, name)
+                    if os.path.isfile(path) and not os.path.islink(path):
+                        digests.add(HashAllowlist.file_digest(path))
+        return digests
+
+    @staticmethod
+    def artifact_dirs() -> List[str]:
+        try:
+            with open(HashAllowlist.SOURCES_FILE) as f:
+                return json.load(f)["artifact_dirs"]
+        except (OSError, ValueError, KeyError):
+            return []
+
+    @staticmethod
+    def build(artifact_dirs: Optional[List[str]] = None, path: Optional[str] = None) -> int:
+        """
+        Rebuild the allowlist from dpkg and the artifact directories
+
+        Newly given directories are remembered, so later rebuilds (e.g.
+        after an apt upgrade) keep including them. Returns the digest count.
+        """
+        dirs = sorted(set(HashAllowlist.artifact_dirs()) | {os.path.abspath(d) for d in artifact_dirs or []})
+        digests = HashAllowlist._dpkg_digests() | HashAllowlist._artifact_digests(dirs)
+        atomic_write(path or HashAllowlist.PATH, b"".join(sorted(digests)), durable=False)
+        atomic_write(HashAllowlist.SOURCES_FILE, json.dumps({"artifact_dirs": dirs}), durable=False)
+        print_colored(f"Allowlist built: {len(digests)} digests from dpkg and {len(dirs)} artifact dir(s)", Colors.GREEN)
+        return len(digests)
+
+    @staticmethod
+    def is_stale(path: Optional[str] = None) -> bool:
+        """True when packages were installed or upgraded after the list was built"""
+        try:
+            built = os.path.getmtime(path or HashAllowlist.PATH)
+        except OSError:
+            return True
+        return os.path.getmtime(PackageState.STATUS_FILE) > built
+
+    @staticmethod
+    def load(refresh: bool = True) -> "HashAllowlist":
+        """Open the allowlist, rebuilding it first if dpkg changed since it was built"""
+        if refresh and HashAllowlist.is_stale():
+            HashAllowlist.build()
+        return HashAllowlist()
@@ -0,0 +1,117 @@
+"""apt index freshness tracking
+
+Records when the package lists were last refreshed and against which
+sources, so repeated steps in one provisioning session don't each pay for
+a full `apt update`.
+"""
+
+import os
+import glob
+import json
+import time
+import hashlib
+from typing import Iterable, List, Optional, Tuple
+
+from .common import STATE_DIR, Colors, atomic_write, print_colored, run_command
+from .packages import PackageState
+
+class AptIndex:
+    """Skip `apt update` while the lists are fresh and the sources unchanged"""
+
+    STATE_FILE = os.path.join(STATE_DIR, "apt_index.json")
+    # apt's own periodic job touches this after every successful update
+    UPDATE_STAMP = "/var/lib/apt/periodic/update-success-stamp"
+    SOURCES = ["/etc/apt/sources.list", "/etc/apt/sources.list.d/*.list", "/etc/apt/sources.list.d/*.sources"]
+    TTL = int(os.environ.get("VPS_MANAGER_APT_TTL", 1800))
+
+    # Fetch index diffs and by-hash files rather than whole Packages files
+    UPDATE_COMMAND = "apt-get update -o Acquire::PDiffs=true -o Acquire::By-Hash=yes"
+
+    @staticmethod
+    def _source_files() -> List[str]:
+        return sorted(path for pattern in AptIndex.SOURCES for path in glob.glob(pattern))
+
+    @staticmethod
+    def sources_hash() -> str:
+        """Hash of every configured apt source"""
+        digest = hashlib.sha256()
+        for path in AptIndex._source_files():
+            digest.update(path.encode())
+            with open(path, "rb") as f:
+                digest.update(f.read())
+        return digest.hexdigest()
+
+    @staticmethod
+    def _load_state() -> dict:
+        try:
+            with open(AptIndex.STATE_FILE) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def last_refresh() -> Optional[float]:
+        """When the lists were last refreshed from the current sources, if known"""
+        state = AptIndex._load_state()
+        current = AptIndex.sources_hash()
+        candidates = []
+        if state.get("sources_hash") == current:
+            candidates.append(state["refreshed_at"])
+
+        # An update by apt's timer or by hand also counts, as long as the
+        # sources haven't been edited since it ran
+        try:
+            stamp = os.path.getmtime(AptIndex.UPDATE_STAMP)
+        except OSError:
+            stamp = None
+        if stamp is not None:
+            newest_source = max((os.path.getmtime(path) for path in AptIndex._source_files()), default=0)
+            if newest_source < stamp and state.get("sources_hash") in (None, current):
+                candidates.append(stamp)
+
+        return max(candidates) if candidates else None
+
+    @staticmethod
+    def is_fresh(ttl: Optional[int] = None) -> bool:
+        refreshed = AptIndex.last_refresh()
+        ttl = AptIndex.TTL if ttl is None else ttl
+        return refreshed is not None and time.time() - refreshed < ttl
+
+    @staticmethod
+    def refresh() -> Tuple[int, str]:
+        """Run apt update and record the refresh"""
+        code, _, err = run_command(AptIndex.UPDATE_COMMAND)
+        if code == 0:
+            state = {"refreshed_at": time.time(), "sources_hash": AptIndex.sources_hash()}
+            atomic_write(AptIndex.STATE_FILE, json.dumps(state), durable=False)
+        return code, err
+
+    @staticmethod
+    def ensure_fresh(ttl: Optional[int] = None, force: bool = False) -> Tuple[int, str]:
+        """Refresh the package lists unless they are inside the TTL"""
+        if not force and AptIndex.is_fresh(ttl):
+            print_colored("Package lists are fresh, skipping apt update", Colors.BLUE)
+            return 0, ""
+        return AptIndex.refresh()
+
+    @staticmethod
+    def install(packages: Iterable[str]) -> Tuple[int, str]:
+        """Install whichever of the packages are missing, refreshing lists only if needed"""
+        missing = PackageState.missing(packages)
+        if not missing:
+            return 0, ""
+
+        refreshed = not AptIndex.is_fresh()
+        code, err = AptIndex.ensure_fresh()
+        if code != 0:
+            return code, err
+
+        command = f"apt-get install -y {' '.join(missing)}"
+        code, _, err = run_command(command)
+        if code != 0 and not refreshed:
+            # Cached lists can point at package versions the mirror has since
+            # dropped; refresh once and retry before giving up
+            code, err = AptIndex.refresh()
+            if code == 0:
+                code, _, err = run_command(command)
+        return code, err
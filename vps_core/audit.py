@@ -0,0 +1,153 @@
+"""Read-only post-hardening verification"""
+
+import time
+import socket
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .common import Colors, print_colored, run_command
+from .fail2ban import Fail2BanManager
+from .firewall import FirewallManager
+from .malware import MalwareScanner
+from .swap import SwapManager
+
+CheckResult = Tuple[bool, str]
+
+class HardeningAuditor:
+    """Verify that the hardening steps actually took effect"""
+
+    DEFAULT_TIMEOUT = 2.0
+    MAX_SIGNATURE_AGE = 2 * 24 * 3600
+
+    @staticmethod
+    def _service_active(service: str, timeout: float) -> CheckResult:
+        code, out, _ = run_command(f"systemctl is-active {service}", timeout=timeout)
+        state = out.strip() or f"exit {code}"
+        return code == 0, f"{service} is {state}"
+
+    @staticmethod
+    def check_ufw_enabled(timeout: float) -> CheckResult:
+        stats = FirewallManager.rule_stats()
+        rules = sum(stats["rules"].values())
+        return stats["enabled"], f"{'enabled' if stats['enabled'] else 'disabled'}, {rules} user rules"
+
+    @staticmethod
+    def check_ufw_default_deny(timeout: float) -> CheckResult:
+        with open("/etc/default/ufw") as f:
+            for line in f:
+                if line.startswith("DEFAULT_INPUT_POLICY="):
+                    policy = line.split("=", 1)[1].strip().strip('"')
+                    return policy in ("DROP", "REJECT"), f"default input policy {policy}"
+        return False, "DEFAULT_INPUT_POLICY not set"
+
+    @staticmethod
+    def check_fail2ban_running(timeout: float) -> CheckResult:
+        return HardeningAuditor._service_active("fail2ban", timeout)
+
+    @staticmethod
+    def check_fail2ban_sshd_jail(timeout: float) -> CheckResult:
+        code, out, err = run_command("fail2ban-client status sshd", timeout=timeout)
+        if code != 0:
+            return False, (err or out).strip() or f"fail2ban-client exited with {code}"
+        banned = next((line.split(":", 1)[1].strip() for line in out.splitlines()
+                       if "Currently banned" in line), "?")
+        return True, f"sshd jail running, {banned} currently banned"
+
+    @staticmethod
+    def check_swap_active(timeout: float) -> CheckResult:
+        total = SwapManager.swap_stats()["total_bytes"]
+        return total > 0, f"{total // (1024 ** 2)} MB swap active"
+
+    @staticmethod
+    def check_swap_persistent(timeout: float) -> CheckResult:
+        with open("/etc/fstab") as f:
+            entries = [line.split()[0] for line in f
+                       if len(line.split()) > 2 and not line.startswith("#") and line.split()[2] == "swap"]
+        return bool(entries), f"fstab swap entries: {', '.join(entries) or 'none'}"
+
+    @staticmethod
+    def check_freshclam_current(timeout: float) -> CheckResult:
+        info = MalwareScanner.signature_info()
+        if info is None:
+            return False, f"no daily signature database in {MalwareScanner.DATABASE_DIR}"
+        age = time.time() - info["build_time"]
+        return age <= HardeningAuditor.MAX_SIGNATURE_AGE, f"daily.{int(info['version'])} is {age / 3600:.1f}h old"
+
+    @staticmethod
+    def check_freshclam_running(timeout: float) -> CheckResult:
+        return HardeningAuditor._service_active("clamav-freshclam", timeout)
+
+    @staticmethod
+    def check_clamd_running(timeout: float) -> CheckResult:
+        return HardeningAuditor._service_active("clamav-daemon", timeout)
+
+    @staticmethod
+    def check_fail2ban_db_readable(timeout: float) -> CheckResult:
+        jails = Fail2BanManager.ban_stats()
+        return True, f"{len(jails)} jails with recorded bans"
+
+    @staticmethod
+    def checks() -> Dict[str, Callable[[float], CheckResult]]:
+        """All checks by name; each takes its timeout and returns (passed, detail)"""
+        return {
+            name[len("check_"):]: getattr(HardeningAuditor, name)
+            for name in sorted(vars(HardeningAuditor))
+            if name.startswith("check_")
+        }
+
+    @staticmethod
+    def run(timeout: float = DEFAULT_TIMEOUT, only: Optional[List[str]] = None) -> Dict:
+        """Run the checks concurrently and return a machine-readable report"""
+        checks = HardeningAuditor.checks()
+        if only:
+            checks = {name: check for name, check in checks.items() if name in only}
+
+        start = time.perf_counter()
+        results = []
+        # One worker per check: every check is IO-bound, so the audit takes
+        # as long as the slowest check rather than the sum of all of them
+        pool = ThreadPoolExecutor(max_workers=max(1, len(checks)), thread_name_prefix="audit")
+
+        def timed(check: Callable[[float], CheckResult]) -> Tuple[bool, str, float]:
+            began = time.perf_counter()
+            passed, detail = check(timeout)
+            return passed, detail, time.perf_counter() - began
+
+        try:
+            futures = {name: pool.submit(timed, check) for name, check in checks.items()}
+            for name, future in futures.items():
+                remaining = max(0.0, start + timeout - time.perf_counter())
+                try:
+                    passed, detail, duration = future.result(timeout=remaining)
+                    status = "pass" if passed else "fail"
+                except FutureTimeout:
+                    status, detail, duration = "timeout", f"no result within {timeout}s", timeout
+                except FileNotFoundError as e:
+                    status, detail, duration = "fail", f"{e.filename} not found", 0.0
+                except Exception as e:
+                    status, detail, duration = "error", str(e), 0.0
+                results.append({"name": name, "status": status, "detail": detail,
+                                "duration_s": round(duration, 3)})
+        finally:
+            # Don't let a wedged check hold the report back
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        return {
+            "host": socket.gethostname(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "duration_s": round(time.perf_counter() - start, 3),
+            "passed": all(result["status"] == "pass" for result in results),
+            "checks": results,
+        }
+
+    @staticmethod
+    def print_report(report: Dict) -> None:
+        """Print a human-readable pass/fail table"""
+        colors = {"pass": Colors.GREEN, "fail": Colors.FAIL, "error": Colors.FAIL, "timeout": Colors.WARNING}
+        for result in report["checks"]:
+            print_colored(f"[{result['status'].upper():^7}] {result['name']:<22} {result['detail']}",
+                          colors[result["status"]])
+        summary = "PASSED" if report["passed"] else "FAILED"
+        print_colored(f"\nAudit {summary} in {report['duration_s']:.2f}s",
+                      Colors.GREEN if report["passed"] else Colors.FAIL, bold=True)
@@ -0,0 +1,194 @@
+"""clamd resource profile sized to the host
+
+clamd keeps the whole signature set in memory (around 1 GB with the
+official databases) and, with ConcurrentDatabaseReload, loads a second
+copy beside it on every freshclam update. That is harmless on a 16 GB
+host and an OOM kill on a 1 GB one. The profile derives the thread,
+queue, size-limit and reload settings from the host's RAM and cores,
+and a reload benchmark measures the real peak to feed back into it.
+"""
+
+import os
+import re
+import json
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+from .common import STATE_DIR, Colors, atomic_write, print_colored, run_command
+from .config import ConfigManager
+from .profiler import StepProfiler
+
+MB = 1024 ** 2
+
+class ClamdTuner:
+    """Derive clamd.conf resource settings from the machine and verify them"""
+
+    CONF = "/etc/clamav/clamd.conf"
+    MEASUREMENT_FILE = os.path.join(STATE_DIR, "clamd_reload.json")
+    DATABASE_DIR = "/var/lib/clamav"
+    # Resident size per byte of on-disk signature DB, when nothing was measured yet
+    SIGNATURE_RSS_FACTOR = 3.5
+    DEFAULT_SIGNATURE_RSS = 1200 * MB
+    # Memory kept free for everything else on the host
+    RESERVE = 384 * MB
+
+    @staticmethod
+    def signature_rss() -> int:
+        """Memory one loaded copy of the signatures takes: measured, else estimated from the DB files"""
+        try:
+            with open(ClamdTuner.MEASUREMENT_FILE) as f:
+                return int(json.load(f)["baseline_rss"])
+        except (OSError, ValueError, KeyError):
+            pass
+        try:
+            on_disk = sum(entry.stat().st_size for entry in os.scandir(ClamdTuner.DATABASE_DIR)
+                          if entry.name.endswith((".cvd", ".cld", ".cud")))
+        except OSError:
+            on_disk = 0
+        return int(on_disk * ClamdTuner.SIGNATURE_RSS_FACTOR) or ClamdTuner.DEFAULT_SIGNATURE_RSS
+
+    @staticmethod
+    def profile() -> Dict[str, str]:
+        """clamd.conf settings for this host"""
+        import psutil
+
+        total = psutil.virtual_memory().total
+        cores = os.cpu_count() or 1
+        signatures = ClamdTuner.signature_rss()
+        spare = total - signatures - ClamdTuner.RESERVE
+
+        # A second copy of the signatures during reload only if it fits with
+        # room to spare; otherwise scans pause while the DB reloads in place
+        concurrent_reload = spare > signatures * 1.5
+
+        # Each scanning thread can hold up to MaxScanSize of decompressed
+        # data, so scale the per-file limits with what is left after the
+        # signatures (and a reload copy, if enabled)
+        budget = max(spare - (signatures if concurrent_reload else 0), 256 * MB)
+        max_scan_mb = int(min(400, max(50, budget / MB / 8)))
+        threads = max(2, min(cores * 2, 32, int(budget // (max_scan_mb * MB))))
+
+        return {
+            "MaxThreads": str(threads),
+            "MaxQueue": str(threads * 8),
+            "MaxScanSize": f"{max_scan_mb}M",
+            "MaxFileSize": f"{max_scan_mb // 2}M",
+            "StreamMaxLength": f"{max_scan_mb // 2}M",
+            "MaxRecursion": "16",
+            "MaxFiles": "10000",
+            "MaxScanTime": "120000",
+            # Report files cut short by a limit instead of passing them as clean
+            "AlertExceedsMax": "yes",
+            "ConcurrentDatabaseReload": "yes" if concurrent_reload else "no",
+        }
+
+    @staticmethod
+    def render(current: str, settings: Dict[str, str]) -> str:
+        """Replace the managed keys in an existing clamd.conf, appending any that are missing"""
+        lines = []
+        seen = set()
+        for line in current.splitlines():
+            key = line.split(None, 1)[0] if line.strip() and not line.lstrip().startswith("#") else None
+            if key in settings:
+                if key not in seen:
+                    lines.append(f"{key} {settings[key]}")
+                    seen.add(key)
+                continue
+            lines.append(line)
+        lines += [f"{key} {value}" for key, value in settings.items() if key not in seen]
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    @StepProfiler.step
+    def apply() -> bool:
+        """Write the profile into clamd.conf, restarting clamd only if it changed"""
+        try:
+            with open(ClamdTuner.CONF) as f:
+                current = f.read()
+        except OSError as e:
+            print_colored(f"Error reading {ClamdTuner.CONF}: {e}", Colors.FAIL)
+            return False
+
+        settings = ClamdTuner.profile()
+        for key, value in settings.items():
+            print_colored(f"  {key:<26} {value}", Colors.BLUE)
+        action = ConfigManager.apply("clamav-daemon", {ClamdTuner.CONF: ClamdTuner.render(current, settings)})
+        return action is not None
+
+    @staticmethod
+    def _clamd_process():
+        import psutil
+
+        for process in psutil.process_iter(["name"]):
+            if process.info["name"] == "clamd":
+                return process
+        return None
+
+    @staticmethod
+    def benchmark_reload(timeout: float = 300, interval: float = 0.05) -> Optional[Dict]:
+        """
+        Trigger a signature reload and sample clamd's RSS until it settles
+
+        Records the baseline, the peak and how long the reload took, and
+        keeps the baseline as the measured signature size for profile().
+        """
+        import psutil
+
+        process = ClamdTuner._clamd_process()
+        if process is None:
+            print_colored("clamd is not running", Colors.FAIL)
+            return None
+
+        baseline = process.memory_info().rss
+        code, _, err = run_command("clamdscan --reload")
+        if code != 0:
+            print_colored(f"Error triggering reload: {err}", Colors.FAIL)
+            return None
+
+        start = time.perf_counter()
+        peak = baseline
+        last_change = start
+        previous = baseline
+        while time.perf_counter() - start < timeout:
+            time.sleep(interval)
+            try:
+                rss = process.memory_info().rss
+            except psutil.NoSuchProcess:
+                print_colored("clamd exited during the reload (OOM kill?)", Colors.FAIL)
+                return None
+            peak = max(peak, rss)
+            if abs(rss - previous) > previous * 0.02:
+                last_change = time.perf_counter()
+                previous = rss
+            # Settled: the reload moved memory and nothing has changed for 3s
+            if peak > baseline * 1.02 and time.perf_counter() - last_change > 3:
+                break
+
+        total = psutil.virtual_memory().total
+        result = {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "baseline_rss": baseline,
+            "peak_rss": peak,
+            "final_rss": process.memory_info().rss,
+            "reload_s": round(last_change - start, 2),
+            "memory_total": total,
+            "peak_pct_of_ram": round(100 * peak / total, 1),
+            "concurrent_reload": ClamdTuner.configured("ConcurrentDatabaseReload"),
+        }
+        atomic_write(ClamdTuner.MEASUREMENT_FILE, json.dumps(result, indent=2), durable=False)
+
+        color = Colors.GREEN if peak < total - ClamdTuner.RESERVE else Colors.FAIL
+        print_colored(f"clamd RSS {baseline / MB:.0f} MB -> peak {peak / MB:.0f} MB "
+                      f"({result['peak_pct_of_ram']}% of RAM) during a {result['reload_s']}s reload", color)
+        return result
+
+    @staticmethod
+    def configured(key: str) -> Optional[str]:
+        """A setting's current value in clamd.conf, or None when it isn't set"""
+        try:
+            with open(ClamdTuner.CONF) as f:
+                match = re.search(rf"^{key}\s+(\S+)", f.read(), re.MULTILINE)
+        except OSError:
+            return None
+        return match.group(1) if match else None
@@ -0,0 +1,28 @@
+"""System cleanup operations"""
+
+from .common import Colors, print_colored, run_command
+from .profiler import StepProfiler
+
+class SystemCleaner:
+    """Handle system cleanup operations"""
+    
+    @staticmethod
+    @StepProfiler.step
+    def cleanup_system() -> bool:
+        """Remove unused packages and clean up system files"""
+        print_colored("Cleaning up system...", Colors.BLUE)
+        
+        commands = [
+            "apt autoremove -y",
+            "apt autoclean",
+            "apt clean"
+        ]
+        
+        for cmd in commands:
+            code, out, err = run_command(cmd, shell=True)
+            if code != 0:
+                print_colored(f"Error during cleanup: {err}", Colors.FAIL)
+                return False
+        
+        print_colored("System cleanup completed successfully!", Colors.GREEN)
+        return True
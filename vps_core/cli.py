@@ -0,0 +1,537 @@
+"""Command line entry point
+
+Only argparse and vps_core.common are imported up front; every subsystem is
+imported by the handler that needs it so `--help` and single-step runs
+from cron or config-management hooks stay fast.
+"""
+
+import sys
+import atexit
+import argparse
+import importlib
+import contextlib
+from typing import Dict, List, Optional, Tuple
+
+from .common import LOG_DIR, STATE_DIR, Colors, print_colored, require_root, setup_logging
+
+# Non-interactive steps for `run`: name -> (module, class, method)
+STEPS: Dict[str, Tuple[str, str, str]] = {
+    "update-system": ("updates", "SystemUpdater", "update_system"),
+    "cleanup": ("cleaner", "SystemCleaner", "cleanup_system"),
+    "setup-ufw": ("firewall", "FirewallManager", "setup_ufw"),
+    "install-fail2ban": ("fail2ban", "Fail2BanManager", "install_fail2ban"),
+    "install-clamav": ("malware", "MalwareScanner", "install_clamav"),
+    "update-clamav": ("malware", "MalwareScanner", "update_clamav"),
+    "harden-sshd": ("sshd", "SshdConfig", "apply_profile"),
+}
+
+# Profiled steps behind the other commands, for --plan; "<command> <action>" where it matters
+COMMAND_STEPS: Dict[str, List[str]] = {
+    "updates prefetch": ["UpdatePipeline.prefetch"],
+    "updates install": ["UpdatePipeline.install"],
+    "sshd apply": ["SshdConfig.apply_profile"],
+    "scan": ["MalwareScanner.scan"],
+    "reclaim": ["DiskReclaimer.reclaim"],
+    "clamd apply": ["ClamdTuner.apply"],
+    "image export": ["GoldenImage.export"],
+    "image import": ["GoldenImage.import_bundle"],
+    "integrity baseline": ["IntegrityMonitor.baseline"],
+}
+
+def load(module: str, name: str):
+    """Import a vps_core subsystem on first use and return one of its attributes"""
+    return getattr(importlib.import_module(f"{__package__}.{module}"), name)
+
+def progress(args: argparse.Namespace):
+    """Where a handler's progress lines go: stderr with --json, so stdout is only the JSON"""
+    return contextlib.redirect_stdout(sys.stderr) if getattr(args, "json", False) else contextlib.nullcontext()
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command line arguments; no subcommand starts the interactive menu"""
+    parser = argparse.ArgumentParser(description="VPS Management and Security Tool")
+    parser.add_argument("--profile", metavar="PATH",
+                        help=f"Write the run profile here (default: {LOG_DIR}/profiles/run-<time>.json)")
+    parser.add_argument("--plan", action="store_true",
+                        help="List what the command would do with time, IO, network and downtime estimates "
+                             "from past runs, without running it")
+    parser.add_argument("--apt-ttl", type=int, metavar="SECONDS",
+                        help="Skip apt update if the package lists are younger than this (default: 1800)")
+    subparsers = parser.add_subparsers(dest="command")
+
+    run = subparsers.add_parser("run", help="Run a single non-interactive step")
+    run.add_argument("step", choices=sorted(STEPS), help="Step to run")
+
+    provision = subparsers.add_parser("provision", help="Run every unattended step, resuming after a failure")
+    provision.add_argument("--force", action="store_true", help="Ignore the journal and run every step")
+    provision.add_argument("--swap-gb", type=int, help="Swap size in GB (default: recommended size)")
+
+    journal = subparsers.add_parser("journal", help="Show or reset the provisioning journal")
+    journal.add_argument("action", choices=["show", "reset"])
+
+    bench = subparsers.add_parser("benchmark", help="Run or compare host benchmark suites")
+    bench_sub = bench.add_subparsers(dest="action", required=True)
+
+    bench_run = bench_sub.add_parser("run", help="Run the benchmark suite and store the results as JSON")
+    bench_run.add_argument("-o", "--output", help=f"Result file (default: {STATE_DIR}/benchmarks/benchmark-<time>.json)")
+    bench_run.add_argument("--work-dir", help="Directory on the disk under test (default: system temp dir)")
+    bench_run.add_argument("--skip-clamav", action="store_true", help="Skip the ClamAV scan throughput benchmark")
+
+    bench_diff = bench_sub.add_parser("diff", help="Compare two stored benchmark runs")
+    bench_diff.add_argument("before", help="Baseline result file")
+    bench_diff.add_argument("after", help="Result file to compare against the baseline")
+    bench_diff.add_argument("--threshold", type=float, default=5.0, help="Percent change treated as noise (default: 5)")
+
+    metrics = subparsers.add_parser("metrics", help="Export fail2ban, ClamAV, swap and UFW metrics for Prometheus")
+    metrics_mode = metrics.add_mutually_exclusive_group()
+    metrics_mode.add_argument("--textfile", nargs="?", const="", metavar="PATH",
+                              help="Write a textfile-collector file (default: node_exporter's textfile directory)")
+    metrics_mode.add_argument("--listen", nargs="?", const="", metavar="HOST:PORT",
+                              help="Serve /metrics over HTTP (default: 127.0.0.1:9120)")
+    metrics.add_argument("--interval", type=float, default=0,
+                         help="With --textfile, keep rewriting the file every N seconds")
+
+    updates = subparsers.add_parser("updates", help="Staged unattended upgrades (run by the update timers)")
+    updates.add_argument("action", choices=["prefetch", "install", "schedule", "status"])
+    updates.add_argument("--force", action="store_true", help="With install, ignore the maintenance window")
+    updates.add_argument("--max-load", type=float, help="With prefetch, per-CPU load above which to defer (default: 0.5)")
+
+    fleet = subparsers.add_parser("fleet", help="Show or set this host's shared-storage group for job staggering")
+    fleet.add_argument("action", choices=["show", "configure"])
+    fleet.add_argument("--group", help="Shared-storage group name (e.g. the hypervisor or storage pool)")
+    fleet.add_argument("--group-size", type=int, help="Number of hosts in the group")
+    fleet.add_argument("--max-concurrent", type=int, help="Hosts in the group allowed to run a job at once")
+    fleet.add_argument("--host-index", type=int,
+                       help="This host's position in the group (0-based); makes the cap exact instead of on average")
+
+    sshd = subparsers.add_parser("sshd", help="Apply or show the key-only, flood-resistant sshd profile")
+    sshd.add_argument("action", choices=["apply", "show"])
+    sshd.add_argument("--force", action="store_true", help="Apply even if no user has an authorized key")
+    sshd.add_argument("--benchmark", action="store_true", help="Benchmark SSH logins before and after applying")
+    sshd.add_argument("--max-startups", help="MaxStartups start:rate:full (default: 10:30:60)")
+    sshd.add_argument("--login-grace-time", type=int, help="LoginGraceTime in seconds (default: 20)")
+    sshd.add_argument("--max-auth-tries", type=int, help="MaxAuthTries (default: 3)")
+
+    ratelimit = subparsers.add_parser("ratelimit", help="Per-source SSH connection-rate limiting in the kernel")
+    ratelimit.add_argument("action", choices=["apply", "remove", "test"])
+    ratelimit.add_argument("--port", type=int, action="append", help="Port to limit (repeatable, default: 22)")
+    ratelimit.add_argument("--per-minute", type=int, help="New connections per source per minute (default: 10)")
+    ratelimit.add_argument("--burst", type=int, help="Connections allowed above the rate in a burst (default: 20)")
+    ratelimit.add_argument("--ufw", action="store_true", help="Use `ufw limit` (fixed 6 per 30s) instead of nftables")
+    ratelimit.add_argument("--attempts", type=int, default=200, help="With test, connection attempts to make (default: 200)")
+    ratelimit.add_argument("--offered-rate", type=float, default=100.0,
+                           help="With test, attempts per second from the load generator (default: 100)")
+
+    bans = subparsers.add_parser("bans", help="Manage the aggregated fail2ban block set")
+    bans.add_argument("action", choices=["sync", "show", "snapshot", "restore"])
+    bans.add_argument("--aggregate", type=int, default=16, metavar="N",
+                      help="Block a whole /24 (/64) once N addresses in it are banned; 0 keeps it exact (default: 16)")
+
+    scan = subparsers.add_parser("scan", help="Scan files for malware, skipping known-good content")
+    scan.add_argument("paths", nargs="*", metavar="PATH", help="Files or directories to scan (default: /)")
+    scan.add_argument("--no-allowlist", action="store_true", help="Scan every file, even known-good ones")
+    scan.add_argument("--engine", action="append", choices=["clamav", "yara"],
+                      help="Engine to run (repeatable, default: clamav, plus yara when rules are installed)")
+    scan.add_argument("--quarantine", action="store_true", help="Move detected files into the quarantine vault")
+    scan.add_argument("--max-file-size", type=int, metavar="MB", help="Skip files larger than this (default: 200)")
+    scan.add_argument("--max-scan-time", type=int, metavar="SECONDS", help="Time budget per file (default: 120)")
+    scan.add_argument("--max-recursion", type=int, metavar="DEPTH", help="Archive nesting depth (default: 16)")
+    scan.add_argument("--json", action="store_true", help="Print the report as JSON")
+
+    quarantine = subparsers.add_parser("quarantine", help="List, restore or purge quarantined files")
+    quarantine.add_argument("action", choices=["list", "restore", "purge"])
+    quarantine.add_argument("ids", nargs="*", metavar="ID", help="Vault item ids")
+    quarantine.add_argument("--older-than", type=float, metavar="DAYS", help="With purge, only items older than this")
+    quarantine.add_argument("--all", action="store_true", help="With purge and no ids, purge every item")
+    quarantine.add_argument("--force", action="store_true", help="With restore, overwrite a file at the original path")
+
+    image = subparsers.add_parser("image", help="Export or import the applied hardening as a golden-image bundle")
+    image.add_argument("action", choices=["export", "import", "verify"])
+    image.add_argument("bundle", nargs="?", help="Bundle to import or verify")
+    image.add_argument("--dir", default=".", help="With export, directory to write the bundle to (default: .)")
+
+    reclaim = subparsers.add_parser("reclaim", help="Report and reclaim disk used by journals, kernels, logs and dumps")
+    reclaim.add_argument("--dry-run", action="store_true", help="Only report what would be reclaimed")
+    reclaim.add_argument("--category", action="append",
+                         choices=["journal", "kernels", "rotated_logs", "core_dumps", "apt_cache", "containers"],
+                         help="Category to reclaim (repeatable, default: all)")
+    reclaim.add_argument("--journal-keep-mb", type=int, help="Journal size to vacuum down to (default: 200)")
+    reclaim.add_argument("--kernels-keep", type=int, help="Newest kernels to keep besides the running one (default: 1)")
+    reclaim.add_argument("--json", action="store_true", help="Print the plan as JSON")
+
+    clamd = subparsers.add_parser("clamd", help="Size clamd's threads, limits and reload strategy to this host")
+    clamd.add_argument("action", choices=["show", "apply", "benchmark"],
+                       help="benchmark triggers a signature reload and records clamd's peak memory")
+
+    allowlist = subparsers.add_parser("allowlist", help="Build or inspect the known-good hash allowlist")
+    allowlist.add_argument("action", choices=["build", "stats"])
+    allowlist.add_argument("--artifacts", action="append", metavar="DIR",
+                           help="Release-artifact directory to include (repeatable, remembered for rebuilds)")
+
+    integrity = subparsers.add_parser("integrity", help="File integrity baseline and change report")
+    integrity.add_argument("action", choices=["baseline", "check", "update"],
+                           help="update reports changes like check, then accepts them into the baseline")
+    integrity.add_argument("--root", action="append", metavar="DIR",
+                           help="Directory to monitor (repeatable, default: /etc, /usr/bin, /usr/sbin, /usr/local/bin, /var/www)")
+    integrity.add_argument("--quick", action="store_true",
+                           help="Skip files in directories whose mtime is unchanged (misses in-place edits)")
+    integrity.add_argument("--json", action="store_true", help="Print the report as JSON")
+
+    audit = subparsers.add_parser("audit", help="Verify that the hardening took effect (read-only)")
+    audit.add_argument("--json", action="store_true", help="Print the report as JSON")
+    audit.add_argument("--timeout", type=float, default=2.0, help="Per-check timeout in seconds (default: 2)")
+    audit.add_argument("--check", action="append", metavar="NAME", help="Only run this check (repeatable)")
+
+    return parser.parse_args(argv)
+
+def run_step(args: argparse.Namespace) -> int:
+    require_root()
+    module, cls, method = STEPS[args.step]
+    return 0 if getattr(load(module, cls), method)() else 1
+
+def run_provision(args: argparse.Namespace) -> int:
+    require_root()
+    journal = load("journal", "ProvisioningJournal")()
+    return 0 if load("journal", "provision")(journal, force=args.force, swap_gb=args.swap_gb) else 1
+
+def run_journal(args: argparse.Namespace) -> int:
+    journal = load("journal", "ProvisioningJournal")()
+    if args.action == "reset":
+        journal.reset()
+        print_colored("Provisioning journal cleared.", Colors.GREEN)
+    else:
+        journal.show()
+    return 0
+
+def run_benchmark(args: argparse.Namespace) -> int:
+    HostBenchmark = load("benchmark", "HostBenchmark")
+    if args.action == "run":
+        report = HostBenchmark.run_suite(args.work_dir, skip_clamav=args.skip_clamav)
+        HostBenchmark.save_results(report, args.output)
+    else:
+        HostBenchmark.diff_results(args.before, args.after, args.threshold)
+    return 0
+
+def run_metrics(args: argparse.Namespace) -> int:
+    import time
+
+    MetricsExporter = load("metrics", "MetricsExporter")
+    if args.listen is not None:
+        MetricsExporter.serve(args.listen or None)
+    elif args.textfile is not None:
+        while True:
+            MetricsExporter.write_textfile(args.textfile or None)
+            if args.interval <= 0:
+                break
+            time.sleep(args.interval)
+    else:
+        print(MetricsExporter.render(MetricsExporter.collect()), end="")
+    return 0
+
+def run_scan(args: argparse.Namespace) -> int:
+    import json
+
+    require_root()
+    limits = {}
+    if args.max_file_size is not None:
+        limits["MaxFileSize"] = args.max_file_size * 1024 ** 2
+    if args.max_scan_time is not None:
+        limits["MaxScanTime"] = args.max_scan_time
+    if args.max_recursion is not None:
+        limits["MaxRecursion"] = args.max_recursion
+    with progress(args):
+        report = load("malware", "MalwareScanner").scan(args.paths, use_allowlist=not args.no_allowlist,
+                                                        engines=args.engine, quarantine=args.quarantine,
+                                                        limits=limits)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    return 1 if report["hits"] else 0
+
+def run_quarantine(args: argparse.Namespace) -> int:
+    require_root()
+    vault = load("quarantine", "QuarantineVault")()
+    if args.action == "list":
+        for item in vault.items():
+            signatures = ", ".join(signature for _, signature in item["detections"])
+            pending = "  (move interrupted)" if item.get("status") == "pending" else ""
+            print(f"{item['id']}  {item['quarantined_at']}  {item['path']}  [{signatures}]{pending}")
+        return 0
+    if args.action == "restore":
+        if not args.ids:
+            print_colored("restore needs at least one id", Colors.FAIL)
+            return 1
+        return 0 if all([vault.restore(item_id, force=args.force) for item_id in args.ids]) else 1
+    if not args.ids and args.older_than is None and not args.all:
+        print_colored("purge needs ids, --older-than or --all", Colors.FAIL)
+        return 1
+    purged = vault.purge(args.ids or None, args.older_than)
+    print_colored(f"Purged {purged} item(s)", Colors.GREEN)
+    return 0
+
+def run_image(args: argparse.Namespace) -> int:
+    import tarfile
+
+    GoldenImage = load("image", "GoldenImage")
+    if args.action == "export":
+        return 0 if GoldenImage.export(args.dir) else 1
+    if not args.bundle:
+        print_colored(f"{args.action} needs a bundle path", Colors.FAIL)
+        return 1
+    if args.action == "verify":
+        try:
+            manifest, objects = GoldenImage.read(args.bundle)
+        except (OSError, ValueError, KeyError, tarfile.TarError) as e:
+            print_colored(f"{args.bundle}: {e}", Colors.FAIL)
+            return 1
+        print_colored(f"{manifest['id']}: {len(manifest['content']['files'])} files, {len(objects)} objects, "
+                      f"from {manifest['host']} at {manifest['created']}", Colors.GREEN)
+        return 0
+    require_root()
+    return 0 if GoldenImage.import_bundle(args.bundle) else 1
+
+def run_reclaim(args: argparse.Namespace) -> int:
+    import json
+
+    policy = {}
+    if args.journal_keep_mb is not None:
+        policy["journal_keep_mb"] = args.journal_keep_mb
+    if args.kernels_keep is not None:
+        policy["kernels_keep"] = args.kernels_keep
+    if not args.dry_run:
+        require_root()
+    with progress(args):
+        plan = load("reclaim", "DiskReclaimer")(policy).reclaim(args.category, dry_run=args.dry_run)
+    if args.json:
+        print(json.dumps(plan, indent=2))
+    return 0 if all(entry.get("ok", True) for entry in plan.values()) else 1
+
+def run_clamd(args: argparse.Namespace) -> int:
+    ClamdTuner = load("clamd", "ClamdTuner")
+    if args.action == "show":
+        for key, value in ClamdTuner.profile().items():
+            print(f"{key:<26} {value}")
+        return 0
+    require_root()
+    if args.action == "apply":
+        return 0 if ClamdTuner.apply() else 1
+    return 0 if ClamdTuner.benchmark_reload() else 1
+
+def run_allowlist(args: argparse.Namespace) -> int:
+    HashAllowlist = load("allowlist", "HashAllowlist")
+    if args.action == "build":
+        require_root()
+        HashAllowlist.build(args.artifacts)
+        return 0
+    allowlist = HashAllowlist()
+    state = "stale" if HashAllowlist.is_stale() else "current"
+    print_colored(f"{len(allowlist)} digests ({state}); artifact dirs: "
+                  f"{', '.join(HashAllowlist.artifact_dirs()) or 'none'}", Colors.BLUE)
+    return 0
+
+def run_integrity(args: argparse.Namespace) -> int:
+    import json
+
+    require_root()
+    IntegrityMonitor = load("integrity", "IntegrityMonitor")
+    monitor = IntegrityMonitor(args.root, quick=args.quick)
+    try:
+        with progress(args):
+            if args.action == "baseline":
+                report = monitor.baseline()
+            else:
+                report = monitor.check(update=args.action == "update")
+    finally:
+        monitor.close()
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        IntegrityMonitor.print_report(report)
+    return 1 if args.action == "check" and any(report["changes"].values()) else 0
+
+def run_audit(args: argparse.Namespace) -> int:
+    import json
+
+    HardeningAuditor = load("audit", "HardeningAuditor")
+    report = HardeningAuditor.run(args.timeout, only=args.check)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        HardeningAuditor.print_report(report)
+    return 0 if report["passed"] else 1
+
+def run_fleet(args: argparse.Namespace) -> int:
+    import os
+
+    FleetSchedule = load("fleet", "FleetSchedule")
+    UpdatePipeline = load("update_pipeline", "UpdatePipeline")
+    MalwareScanner = load("malware", "MalwareScanner")
+    if args.action == "configure":
+        require_root()
+        if not args.group or not args.group_size or not args.max_concurrent:
+            print_colored("configure needs --group, --group-size and --max-concurrent", Colors.FAIL)
+            return 1
+        FleetSchedule.configure(args.group, args.group_size, args.max_concurrent, args.host_index)
+        # Move timers that are already installed to their new slots
+        ok = True
+        if os.path.exists(os.path.join(FleetSchedule.UNIT_DIR, "vps-manager-install.timer")):
+            ok &= UpdatePipeline.schedule()
+        if os.path.exists(os.path.join(FleetSchedule.UNIT_DIR, "vps-manager-scan.timer")):
+            ok &= MalwareScanner.schedule_scan()
+        return 0 if ok else 1
+
+    settings = FleetSchedule.config()
+    if settings:
+        print_colored(f"Storage group {settings['storage_group']}: {settings['group_size']} hosts, "
+                      f"at most {settings['max_concurrent']} running a job at once", Colors.BLUE)
+    else:
+        print_colored("Not in a storage group; jobs are spread by machine-id only", Colors.BLUE)
+    jobs = {
+        "updates": (UpdatePipeline.WINDOW_EARLIEST, UpdatePipeline.WINDOW_SPREAD, UpdatePipeline.WINDOW_MINUTES),
+        "scan": (MalwareScanner.SCAN_EARLIEST, MalwareScanner.SCAN_SPREAD, MalwareScanner.scan_minutes()),
+    }
+    for job, (earliest, span, duration) in jobs.items():
+        _, warning = FleetSchedule.offset(job, span, duration)
+        start = FleetSchedule.start(job, earliest, span, duration)
+        print(f"{job:<8} {start:%H:%M} for {duration} min")
+        if warning:
+            print_colored(f"  {warning}", Colors.WARNING)
+    return 0
+
+def run_updates(args: argparse.Namespace) -> int:
+    UpdatePipeline = load("update_pipeline", "UpdatePipeline")
+    if args.action == "status":
+        UpdatePipeline.status()
+        return 0
+    require_root()
+    if args.action == "prefetch":
+        ok = UpdatePipeline.prefetch(args.max_load)
+    elif args.action == "install":
+        ok = UpdatePipeline.install(force=args.force)
+    else:
+        ok = UpdatePipeline.schedule()
+    return 0 if ok else 1
+
+def run_sshd(args: argparse.Namespace) -> int:
+    SshdConfig = load("sshd", "SshdConfig")
+    if args.action == "show":
+        SshdConfig.show()
+        return 0
+    require_root()
+    ok = SshdConfig.apply_profile(force=args.force, benchmark=args.benchmark, max_startups=args.max_startups,
+                                  login_grace_time=args.login_grace_time, max_auth_tries=args.max_auth_tries)
+    return 0 if ok else 1
+
+def run_ratelimit(args: argparse.Namespace) -> int:
+    import json
+
+    require_root()
+    FirewallManager = load("firewall", "FirewallManager")
+    if args.action == "apply":
+        ok = FirewallManager.rate_limit(args.port, args.per_minute, args.burst, backend="ufw" if args.ufw else "nft")
+    elif args.action == "remove":
+        ok = FirewallManager.remove_rate_limit()
+    else:
+        result = FirewallManager.test_rate_limit(args.per_minute, args.burst, args.attempts, args.offered_rate)
+        if result is not None:
+            print(json.dumps(result, indent=2))
+        ok = result is not None
+    return 0 if ok else 1
+
+def run_bans(args: argparse.Namespace) -> int:
+    Fail2BanManager = load("fail2ban", "Fail2BanManager")
+    threshold = args.aggregate or None
+    if args.action == "show":
+        bans = Fail2BanManager.ban_set(threshold)
+        print("\n".join(bans.cidrs()))
+        return 0
+    require_root()
+    if args.action == "snapshot":
+        print_colored(f"Saved {Fail2BanManager.snapshot()} active bans", Colors.GREEN)
+        return 0
+    if args.action == "restore":
+        return 0 if Fail2BanManager.restore(threshold) else 1
+    return 0 if Fail2BanManager.sync_firewall(threshold) else 1
+
+def run_menu(args: argparse.Namespace) -> int:
+    require_root()
+    load("menu", "main_menu")()
+    return 0
+
+def run_plan(args: argparse.Namespace) -> int:
+    import json
+
+    if args.command == "run":
+        _, cls, method = STEPS[args.step]
+        steps = [f"{cls}.{method}"]
+    elif args.command == "provision":
+        journal = load("journal", "ProvisioningJournal")()
+        pending = load("journal", "pending_steps")(journal, force=args.force, swap_gb=args.swap_gb)
+        steps = [f"{cls}.{method}" for name, _, cls, method in load("journal", "PROVISION_STEPS") if name in pending]
+    elif args.command is None:
+        # The menu can run any of the steps
+        steps = [f"{cls}.{method}" for _, cls, method in STEPS.values()]
+    else:
+        key = f"{args.command} {getattr(args, 'action', '')}".strip()
+        steps = COMMAND_STEPS.get(key) or COMMAND_STEPS.get(args.command)
+        if not steps:
+            print_colored(f"No plan for '{key}': it changes nothing worth estimating", Colors.BLUE)
+            return 0
+
+    OperationPlanner = load("planner", "OperationPlanner")
+    if not steps:
+        print_colored("Nothing to do: every step is complete and unchanged", Colors.GREEN)
+        return 0
+    plan = OperationPlanner().plan(steps)
+    if getattr(args, "json", False):
+        print(json.dumps(plan, indent=2))
+    else:
+        OperationPlanner.print_plan(plan)
+    return 0
+
+def write_profile(path: Optional[str]) -> None:
+    # The profiler is only loaded once a step or command has actually run
+    if f"{__package__}.profiler" in sys.modules:
+        load("profiler", "StepProfiler").write_profile(path)
+
+HANDLERS = {
+    "run": run_step,
+    "provision": run_provision,
+    "journal": run_journal,
+    "benchmark": run_benchmark,
+    "metrics": run_metrics,
+    "updates": run_updates,
+    "fleet": run_fleet,
+    "sshd": run_sshd,
+    "ratelimit": run_ratelimit,
+    "bans": run_bans,
+    "scan": run_scan,
+    "quarantine": run_quarantine,
+    "image": run_image,
+    "reclaim": run_reclaim,
+    "clamd": run_clamd,
+    "allowlist": run_allowlist,
+    "integrity": run_integrity,
+    "audit": run_audit,
+    None: run_menu,
+}
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    setup_logging()
+    if args.apt_ttl is not None:
+        load("apt", "AptIndex").TTL = args.apt_ttl
+
+    atexit.register(write_profile, args.profile)
+
+    try:
+        if args.plan:
+            return run_plan(args)
+        return HANDLERS[args.command](args)
+    except KeyboardInterrupt:
+        print_colored("\nExiting...", Colors.BLUE)
+        return 0
+    except Exception as e:
+        import logging
+
+        print_colored(f"\nAn error occurred: {e}", Colors.FAIL)
+        logging.error(f"Unhandled exception: {e}")
+        return 1
@@ -0,0 +1,166 @@
+"""Helpers shared by every vps_core subsystem and the legacy menu scripts"""
+
+import os
+import sys
+import time
+import signal
+import subprocess
+import threading
+from typing import Optional, Tuple, Union
+
+LOG_FILE = "/var/log/vps_manager.log"
+LOG_DIR = "/var/log/vps_manager"
+STATE_DIR = "/var/lib/vps_manager"
+# The CLI script, for systemd units that call back into vps_manager
+ENTRY_POINT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "vps_manager.py")
+
+# ANSI color codes for terminal output
+class Colors:
+    HEADER = '\033[95m'
+    BLUE = '\033[94m'
+    GREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    END = '\033[0m'
+    BOLD = '\033[1m'
+
+VPS_MANAGER_ART = """
+    ██╗   ██╗██████╗ ███████╗    ███╗   ███╗ █████╗ ███╗   ██╗ █████╗  ██████╗ ███████╗██████╗
+    ██║   ██║██╔══██╗██╔════╝    ████╗ ████║██╔══██╗████╗  ██║██╔══██╗██╔════╝ ██╔════╝██╔══██╗
+    ██║   ██║██████╔╝███████╗    ██╔████╔██║███████║██╔██╗ ██║███████║██║  ███╗█████╗  ██████╔╝
+    ╚██╗ ██╔╝██╔═══╝ ╚════██║    ██║╚██╔╝██║██╔══██║██║╚██╗██║██╔══██║██║   ██║██╔══╝  ██╔══██╗
+     ╚████╔╝ ██║     ███████║    ██║ ╚═╝ ██║██║  ██║██║ ╚████║██║  ██║╚██████╔╝███████╗██║  ██║
+      ╚═══╝  ╚═╝     ╚══════╝    ╚═╝     ╚═╝╚═╝  ╚═╝╚═╝  ╚═══╝╚═╝  ╚═╝ ╚═════╝ ╚══════╝╚═╝  ╚═╝
+    """
+
+def setup_logging(filename: str = LOG_FILE) -> None:
+    """Configure file logging; called by entry points, never at import time"""
+    import logging
+
+    try:
+        logging.basicConfig(
+            filename=filename,
+            level=logging.INFO,
+            format='%(asctime)s - %(levelname)s - %(message)s'
+        )
+    except OSError:
+        # Unprivileged invocations (e.g. --help, benchmark) fall back to stderr
+        logging.basicConfig(level=logging.WARNING, format='%(levelname)s - %(message)s')
+
+def run_command(command: str, shell: bool = False, capture: bool = True,
+                timeout: Optional[float] = None) -> Tuple[int, str, str]:
+    """
+    Execute a shell command and return its exit code, stdout, and stderr
+
+    With capture=False the command inherits the terminal and empty output
+    strings are returned. A command still running after `timeout` seconds
+    is killed and reported with exit code 124, like timeout(1).
+    """
+    from .profiler import StepProfiler
+
+    start = time.perf_counter()
+    pipe = subprocess.PIPE if capture else None
+    # A command with a timeout gets its own process group, so the kill also
+    # reaches whatever a shell started; those would otherwise hold stdout
+    # open and keep the read below blocked past the timeout
+    session = timeout is not None
+    try:
+        if shell:
+            process = subprocess.Popen(command, shell=True, stdout=pipe, stderr=pipe, start_new_session=session)
+        else:
+            process = subprocess.Popen(command.split(), stdout=pipe, stderr=pipe, start_new_session=session)
+
+        timed_out = threading.Event()
+        killer = None
+        if timeout is not None:
+            def kill() -> None:
+                timed_out.set()
+                try:
+                    os.killpg(process.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+            killer = threading.Timer(timeout, kill)
+            killer.start()
+
+        # Drain stderr on a thread and reap the child ourselves with wait4()
+        # so its CPU time, peak RSS and block writes can be accounted for
+        stdout = b""
+        stderr_chunks = []
+        if capture:
+            reader = threading.Thread(target=lambda: stderr_chunks.append(process.stderr.read()))
+            reader.start()
+            stdout = process.stdout.read()
+            reader.join()
+            process.stdout.close()
+            process.stderr.close()
+
+        if killer is not None:
+            # Wait for the exit without reaping, and stop the killer before
+            # wait4() frees the pid (and group id) for reuse
+            os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)
+            killer.cancel()
+            killer.join()
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        if timed_out.is_set():
+            process.returncode = 124
+        StepProfiler.record_command(command, time.perf_counter() - start, usage, process.returncode)
+        return process.returncode, stdout.decode(), b"".join(stderr_chunks).decode()
+    except Exception as e:
+        StepProfiler.record_command(command, time.perf_counter() - start, None, 1)
+        return 1, '', str(e)
+
+def atomic_write(path: str, content: Union[str, bytes], mode: int = 0o644, durable: bool = True) -> None:
+    """Replace a file in one rename so readers never see a partial write"""
+    import tempfile
+
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", dir=directory)
+    try:
+        with os.fdopen(fd, "wb" if isinstance(content, bytes) else "w") as f:
+            f.write(content)
+            if durable:
+                f.flush()
+                os.fsync(f.fileno())
+        os.chmod(tmp_path, mode)
+        if os.path.exists(path):
+            # Keep the ownership of the file being replaced (e.g. clamav:clamav)
+            st = os.stat(path)
+            os.chown(tmp_path, st.st_uid, st.st_gid)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    if durable:
+        dir_fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+def print_colored(message: str, color: str = Colors.BLUE, bold: bool = False) -> None:
+    """Print colored text to terminal"""
+    if bold:
+        print(f"{Colors.BOLD}{color}{message}{Colors.END}")
+    else:
+        print(f"{color}{message}{Colors.END}")
+
+def print_banner(art: str = VPS_MANAGER_ART, title: Optional[str] = "VPS Management and Security Tool") -> None:
+    """Display a program banner"""
+    print_colored(art, Colors.BLUE, bold=True)
+    if title:
+        print_colored(title, Colors.GREEN, bold=True)
+        print_colored("=" * 80 + "\n", Colors.BLUE)
+
+def clear_screen() -> None:
+    """Clear the terminal screen"""
+    os.system('clear')
+
+def require_root() -> None:
+    """Exit unless running as root"""
+    if os.geteuid() != 0:
+        print_colored("This script must be run as root!", Colors.FAIL)
+        sys.exit(1)
@@ -0,0 +1,107 @@
+"""Config rendering with content hashing and reload-vs-restart minimization"""
+
+import os
+import stat
+import hashlib
+from string import Template
+from typing import Dict, Optional, Union
+
+from .common import Colors, atomic_write, print_colored, run_command
+
+class ConfigManager:
+    """Render config files, write them only when their content changes, and
+    apply the cheapest service action that picks the change up"""
+
+    # How each service picks up config changes: "reload" when it can re-read
+    # its config in place, "restart" when it has to be bounced, None when
+    # the file is read fresh by whatever uses it (apt timers, cron)
+    SERVICE_ACTIONS: Dict[str, Optional[str]] = {
+        "fail2ban": "reload",
+        # clamd's RELOAD only re-reads signatures, not clamd.conf
+        "clamav-daemon": "restart",
+        "clamav-freshclam": "restart",
+        "ssh": "reload",
+        "unattended-upgrades": None,
+    }
+
+    @staticmethod
+    def render(template: str, **values: str) -> str:
+        """Fill $placeholders; anything else (e.g. fail2ban's %(action)s) is left alone"""
+        return Template(template).substitute(values)
+
+    @staticmethod
+    def content_hash(content: Union[str, bytes]) -> str:
+        return hashlib.sha256(content if isinstance(content, bytes) else content.encode()).hexdigest()
+
+    @staticmethod
+    def file_hash(path: str) -> Optional[str]:
+        try:
+            with open(path, "rb") as f:
+                return hashlib.sha256(f.read()).hexdigest()
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def write(path: str, content: Union[str, bytes], mode: int = 0o644) -> bool:
+        """Atomically write a file if its content hash differs; return whether it changed"""
+        if ConfigManager.file_hash(path) == ConfigManager.content_hash(content):
+            # Same content is no reason to reload, but a wrong mode is still fixed
+            if stat.S_IMODE(os.stat(path).st_mode) != mode:
+                os.chmod(path, mode)
+            return False
+        atomic_write(path, content, mode)
+        return True
+
+    @staticmethod
+    def _read(path: str) -> Optional[bytes]:
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def apply(service: str, files: Dict[str, Union[str, bytes]], mode: int = 0o644,
+              validate: Optional[str] = None) -> Optional[str]:
+        """
+        Write a service's config files and pick it up with the cheapest action
+
+        `validate` is a command (e.g. `sshd -t`) run after writing changed
+        files; if it fails the previous files are put back untouched.
+        Returns the action taken ("none", "reload", "restart" or "start"), or
+        None when validation or the action failed.
+        """
+        previous = {path: ConfigManager._read(path) for path in files} if validate else {}
+        changed = [path for path, content in files.items() if ConfigManager.write(path, content, mode)]
+        if validate and changed:
+            code, out, err = run_command(validate)
+            if code != 0:
+                for path in changed:
+                    if previous[path] is None:
+                        os.remove(path)
+                    else:
+                        atomic_write(path, previous[path], mode)
+                detail = (err or out).strip() or f"exit status {code}"
+                print_colored(f"{service} config rejected by `{validate}`, rolled back: {detail}", Colors.FAIL)
+                return None
+        strategy = ConfigManager.SERVICE_ACTIONS.get(service, "restart")
+        if strategy is None:
+            return "none"
+
+        running = run_command(f"systemctl is-active --quiet {service}")[0] == 0
+        if not running:
+            action = "start"
+        elif not changed:
+            action = "none"
+        else:
+            action = strategy
+
+        if action != "none":
+            code, _, err = run_command(f"systemctl {action} {service}")
+            if code != 0:
+                print_colored(f"Error running systemctl {action} {service}: {err}", Colors.FAIL)
+                return None
+
+        detail = f"{len(changed)} file(s) changed" if changed else "config unchanged"
+        print_colored(f"{service}: {detail}, action: {action}", Colors.BLUE)
+        return action
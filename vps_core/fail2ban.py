@@ -0,0 +1,227 @@
+"""Fail2Ban installation, configuration and ban statistics"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+from typing import Dict, Optional
+
+from .addrset import AddressSet
+from .apt import AptIndex
+from .authlog import SshAuthLog
+from .common import ENTRY_POINT, STATE_DIR, Colors, atomic_write, print_colored
+from .config import ConfigManager
+from .firewall import FirewallManager
+from .fleet import FleetSchedule
+from .profiler import StepProfiler
+
+class Fail2BanManager:
+    """Handle Fail2Ban installation and configuration"""
+    
+    @staticmethod
+    @StepProfiler.step
+    def install_fail2ban() -> bool:
+        """Install and configure Fail2Ban"""
+        print_colored("Installing Fail2Ban...", Colors.BLUE)
+        
+        # Install Fail2Ban
+        code, err = AptIndex.install(["fail2ban", "nftables"])
+        if code != 0:
+            print_colored(f"Error installing Fail2Ban: {err}", Colors.FAIL)
+            return False
+        
+        # Configure jail.local
+        jail_config = """
+[DEFAULT]
+bantime = 1h
+findtime = 10m
+maxretry = 5
+destemail = root@localhost
+sender = root@localhost
+banaction = $banaction
+banaction_allports = $banaction
+action = %(action_mwl)s
+
+[sshd]
+enabled = true
+port = ssh
+filter = sshd
+backend = systemd
+journalmatch = $journalmatch
+maxretry = 3
+"""
+        jail_config = ConfigManager.render(jail_config, journalmatch=SshAuthLog.journal_match(),
+                                           banaction=Fail2BanManager.ACTION_NAME)
+        
+        # apt already started fail2ban, so the apply below only reloads it and
+        # the drop-in's restore never runs; the sets have to exist first
+        if not Fail2BanManager.install_ban_persistence():
+            return False
+        
+        # Only reload when jail.local actually changed; a restart would drop
+        # the in-memory ban state and re-read every log from scratch
+        try:
+            files = {'/etc/fail2ban/jail.local': jail_config, Fail2BanManager.ACTION_PATH: Fail2BanManager.action_config()}
+            if ConfigManager.apply("fail2ban", files) is None:
+                return False
+        except Exception as e:
+            print_colored(f"Error configuring Fail2Ban: {e}", Colors.FAIL)
+            return False
+        
+        print_colored("Fail2Ban installed and configured successfully!", Colors.GREEN)
+        return True
+
+    # Bans go straight into the firewall's aggregated block set rather than
+    # one rule per address, timing out with the ban. An address that is
+    # already inside an aggregated prefix is blocked anyway, so an add the
+    # set rejects as overlapping is not an error (any other failure, such as
+    # a missing table, is); one unbanned from inside a prefix, or whose
+    # element already timed out, has nothing to delete and stays blocked
+    # until the next `bans sync` (see SYNC_TIMER) re-aggregates the set
+    ACTION_NAME = "vps-manager-nftset"
+    ACTION_PATH = f"/etc/fail2ban/action.d/{ACTION_NAME}.conf"
+    ACTION_TEMPLATE = """[Definition]
+actionstart =
+actionstop =
+actioncheck = nft list tables inet | grep -qx "table inet $table"
+actionban = t=<bantime>; out=$$(nft add element inet $table <blockset> { <ip> $$([ "$$t" -gt 0 ] && echo "timeout $${t}s") } 2>&1) ||
+            { echo "$$out" | grep -qE "interval overlaps|conflicting intervals|File exists" || { echo "$$out" >&2; exit 1; }; }
+actionunban = <actioncheck> && { nft delete element inet $table <blockset> { <ip> } 2>/dev/null || true; }
+
+[Init]
+blockset = block4
+
+[Init?family=inet6]
+blockset = block6
+"""
+
+    @staticmethod
+    def action_config() -> str:
+        return ConfigManager.render(Fail2BanManager.ACTION_TEMPLATE, table=FirewallManager.NFT_TABLE)
+
+    DB_PATH = "/var/lib/fail2ban/fail2ban.sqlite3"
+    # Widen to the whole /24 (/64) once this many addresses in it are banned
+    AGGREGATE_THRESHOLD = 16
+
+    @staticmethod
+    def _connect() -> sqlite3.Connection:
+        # Read-only URI so we never contend with fail2ban for a write lock
+        return sqlite3.connect(f"file:{Fail2BanManager.DB_PATH}?mode=ro", uri=True, timeout=1)
+
+    @staticmethod
+    def _current_table(conn: sqlite3.Connection) -> str:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        # fail2ban >= 0.11 keeps the current ban per address in "bips"
+        return "bips" if "bips" in tables else "bans"
+
+    @staticmethod
+    def active_bans() -> Dict[str, int]:
+        """Currently banned addresses mapped to their expiry time (-1 for permanent)"""
+        now = int(time.time())
+        conn = Fail2BanManager._connect()
+        try:
+            rows = conn.execute(
+                "SELECT ip, MAX(CASE WHEN bantime < 0 THEN -1 ELSE timeofban + bantime END), MIN(bantime) "
+                f"FROM {Fail2BanManager._current_table(conn)} "
+                "WHERE bantime < 0 OR timeofban + bantime > ? GROUP BY ip", (now,)
+            ).fetchall()
+        finally:
+            conn.close()
+        return {ip: -1 if min_bantime < 0 else expiry for ip, expiry, min_bantime in rows}
+
+    @staticmethod
+    def ban_set(threshold: Optional[int] = AGGREGATE_THRESHOLD) -> AddressSet:
+        """Active bans as an aggregated address set"""
+        return AddressSet(Fail2BanManager.active_bans(), threshold=threshold)
+
+    @staticmethod
+    def sync_firewall(threshold: Optional[int] = AGGREGATE_THRESHOLD) -> bool:
+        """Load the active bans into the firewall's block set and snapshot them"""
+        bans = Fail2BanManager.active_bans()
+        if not FirewallManager.load_sets(AddressSet(bans, threshold=threshold), expiries=bans):
+            return False
+        Fail2BanManager._write_snapshot(bans)
+        return True
+
+    SNAPSHOT_PATH = os.path.join(STATE_DIR, "ban_snapshot.json")
+    # Restore before fail2ban starts, snapshot after it stops: the block set
+    # is back as soon as the unit starts instead of after fail2ban has
+    # replayed its database one action call per address
+    DROPIN_PATH = "/etc/systemd/system/fail2ban.service.d/vps-manager-bans.conf"
+    DROPIN_TEMPLATE = """[Service]
+ExecStartPre=-$python $entry_point bans restore
+ExecStopPost=-$python $entry_point bans snapshot
+"""
+
+    @staticmethod
+    def _write_snapshot(bans: Dict[str, int]) -> None:
+        snapshot = {"version": 1, "taken_at": int(time.time()), "bans": sorted(bans.items())}
+        atomic_write(Fail2BanManager.SNAPSHOT_PATH, json.dumps(snapshot, separators=(",", ":")), 0o600)
+
+    @staticmethod
+    def snapshot() -> int:
+        """Save the active bans (address, expiry); return how many were saved"""
+        bans = Fail2BanManager.active_bans()
+        Fail2BanManager._write_snapshot(bans)
+        return len(bans)
+
+    @staticmethod
+    def restore(threshold: Optional[int] = AGGREGATE_THRESHOLD) -> bool:
+        """Load the unexpired bans from the snapshot into the block set in one transaction"""
+        try:
+            with open(Fail2BanManager.SNAPSHOT_PATH) as f:
+                entries = json.load(f)["bans"]
+        except (OSError, ValueError, KeyError):
+            # Still create the (empty) sets: the jail's banaction adds to them
+            print_colored("No ban snapshot to restore", Colors.WARNING)
+            entries = []
+        
+        now = int(time.time())
+        expiries = {ip: expiry for ip, expiry in entries if expiry < 0 or expiry > now}
+        return FirewallManager.load_sets(AddressSet(expiries, threshold=threshold), expiries=expiries)
+
+    # Periodic re-aggregation: widens prefixes as bans accumulate and drops
+    # addresses fail2ban has unbanned from inside an aggregated prefix
+    SYNC_TIMER = "vps-manager-bansync"
+    SYNC_CALENDAR = "*:0/15"
+
+    @staticmethod
+    def install_ban_persistence() -> bool:
+        """Create the block sets, hook snapshot/restore into the fail2ban unit and schedule the periodic sync"""
+        if not Fail2BanManager.restore():
+            return False
+        dropin = ConfigManager.render(Fail2BanManager.DROPIN_TEMPLATE, python=sys.executable, entry_point=ENTRY_POINT)
+        try:
+            changed = ConfigManager.write(Fail2BanManager.DROPIN_PATH, dropin)
+            changed |= FleetSchedule.write_timer(Fail2BanManager.SYNC_TIMER, "fail2ban block set sync", "bans sync",
+                                                 Fail2BanManager.SYNC_CALENDAR, nice="10")
+        except OSError as e:
+            print_colored(f"Error writing fail2ban units: {e}", Colors.FAIL)
+            return False
+        return FleetSchedule.enable([Fail2BanManager.SYNC_TIMER], changed)
+
+    @staticmethod
+    def ban_stats(window: int = 300) -> Dict[str, Dict[str, float]]:
+        """Per-jail active bans, total bans and recent ban rate from the fail2ban DB"""
+        now = int(time.time())
+        stats: Dict[str, Dict[str, float]] = {}
+        
+        conn = Fail2BanManager._connect()
+        try:
+            current = Fail2BanManager._current_table(conn)
+            
+            for jail, total, recent in conn.execute(
+                "SELECT jail, COUNT(*), SUM(timeofban >= ?) FROM bans GROUP BY jail", (now - window,)
+            ):
+                stats[jail] = {"active": 0, "total": total, "rate": (recent or 0) / window}
+            
+            for jail, active in conn.execute(
+                f"SELECT jail, COUNT(DISTINCT ip) FROM {current} "
+                "WHERE bantime < 0 OR timeofban + bantime > ? GROUP BY jail", (now,)
+            ):
+                stats.setdefault(jail, {"active": 0, "total": 0, "rate": 0.0})["active"] = active
+        finally:
+            conn.close()
+        
+        return stats
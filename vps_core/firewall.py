@@ -0,0 +1,380 @@
+"""UFW firewall configuration"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+from typing import Any, Dict, List, Optional, Tuple
+
+from .addrset import AddressSet
+from .apt import AptIndex
+from .common import Colors, print_colored, run_command
+from .config import ConfigManager
+from .profiler import StepProfiler
+
+class FirewallManager:
+    """Handle UFW firewall configuration"""
+    
+    @staticmethod
+    @StepProfiler.step
+    def setup_ufw() -> bool:
+        """Install and configure UFW"""
+        print_colored("Setting up UFW firewall...", Colors.BLUE)
+        
+        # Install UFW if not present
+        code, err = AptIndex.install(["ufw"])
+        if code != 0:
+            print_colored(f"Error installing UFW: {err}", Colors.FAIL)
+            return False
+        
+        # Configure default policies
+        commands = [
+            "ufw default deny incoming",
+            "ufw default allow outgoing",
+            "ufw allow ssh",  # Always allow SSH
+            "ufw --force enable"
+        ]
+        
+        for cmd in commands:
+            code, _, err = run_command(cmd)
+            if code != 0:
+                print_colored(f"Error configuring UFW: {err}", Colors.FAIL)
+                return False
+        
+        print_colored("UFW configured successfully!", Colors.GREEN)
+        return True
+
+    @staticmethod
+    def allowed_rules() -> List[Tuple[str, str]]:
+        """Return (rule number, port) for every ALLOW rule in `ufw status numbered`"""
+        _, out, _ = run_command("ufw status numbered")
+        rules = []
+        for line in out.splitlines():
+            if "ALLOW" in line:
+                parts = line.split()
+                if parts[0].startswith("[") and parts[0].endswith("]"):
+                    rule_number = parts[0].strip("[]")
+                    port = parts[1].split('/')[0]
+                    rules.append((rule_number, port))
+        return rules
+
+    @staticmethod
+    @StepProfiler.step
+    def manage_port(port: int, protocol: str = "tcp", allow: bool = True) -> bool:
+        """Allow or deny a specific port"""
+        action = "allow" if allow else "deny"
+        cmd = f"ufw {action} {port}/{protocol}"
+        
+        code, _, err = run_command(cmd)
+        if code != 0:
+            print_colored(f"Error managing port: {err}", Colors.FAIL)
+            return False
+            
+        print_colored(f"Port {port}/{protocol} {action}ed successfully!", Colors.GREEN)
+        return True
+
+    UFW_CONF = "/etc/ufw/ufw.conf"
+    UFW_RULE_FILES = {"ipv4": "/etc/ufw/user.rules", "ipv6": "/etc/ufw/user6.rules"}
+
+    @staticmethod
+    def rule_stats() -> Dict[str, Any]:
+        """Read UFW state and rule counts from its files without spawning ufw"""
+        stats = {"enabled": False, "rules": {}}
+        
+        try:
+            with open(FirewallManager.UFW_CONF) as f:
+                stats["enabled"] = any(line.strip().lower() == "enabled=yes" for line in f)
+        except OSError:
+            pass
+        
+        for family, path in FirewallManager.UFW_RULE_FILES.items():
+            try:
+                with open(path) as f:
+                    # ufw writes one "### tuple ###" marker per user rule
+                    stats["rules"][family] = sum(1 for line in f if line.startswith("### tuple ###"))
+            except OSError:
+                continue
+        
+        return stats
+
+    # Address sets live in their own nftables table next to ufw's chains, so
+    # thousands of bans are a single set lookup instead of one rule each.
+    # The table is created once; later loads only refill the sets. Block
+    # set elements carry the ban's remaining time, so the kernel lifts an
+    # expired ban without waiting for the next sync
+    NFT_TABLE = "vps_manager"
+    NFT_TEMPLATE = """add table inet {table}
+delete table inet {table}
+table inet {table} {{
+    set allow4 {{ type ipv4_addr; flags interval; }}
+    set allow6 {{ type ipv6_addr; flags interval; }}
+    set block4 {{ type ipv4_addr; flags interval,timeout; }}
+    set block6 {{ type ipv6_addr; flags interval,timeout; }}
+    chain input {{
+        type filter hook input priority -10; policy accept;
+        ip saddr @allow4 return
+        ip6 saddr @allow6 return
+        ip saddr @block4 drop
+        ip6 saddr @block6 drop
+    }}
+}}
+"""
+
+    @staticmethod
+    def _nft_load(script: str) -> Tuple[int, str]:
+        """Apply an nft script; nft -f runs the whole file as one transaction"""
+        fd, path = tempfile.mkstemp(prefix="vps_manager-", suffix=".nft")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(script)
+            code, _, err = run_command(f"nft -f {path}")
+        finally:
+            os.unlink(path)
+        return code, err
+
+    @staticmethod
+    def _sets_ready() -> bool:
+        """Whether the address-set table exists in its current layout"""
+        code, out, _ = run_command(f"nft list set inet {FirewallManager.NFT_TABLE} block4")
+        # Tables from before per-ban timeouts are recreated once
+        return code == 0 and "timeout" in out
+
+    @staticmethod
+    def _timeouts(addresses: AddressSet, expiries: Dict[str, int]) -> Dict[str, int]:
+        """
+        Seconds left for each CIDR, from the expiry (-1 for permanent) of
+        the addresses inside it; an aggregated prefix lasts as long as its
+        longest ban, and CIDRs holding a permanent ban are left out
+        """
+        now = int(time.time())
+        latest: Dict[str, int] = {}
+        for address, expiry in expiries.items():
+            network = addresses.covering(address)
+            if network is None:
+                continue
+            cidr = str(network)
+            if expiry < 0 or latest.get(cidr, 0) < 0:
+                latest[cidr] = -1
+            else:
+                latest[cidr] = max(latest.get(cidr, 0), expiry)
+        return {cidr: max(1, expiry - now) for cidr, expiry in latest.items() if expiry >= 0}
+
+    @staticmethod
+    def _refill(name: str, addresses: AddressSet, family: int, timeouts: Optional[Dict[str, int]] = None) -> str:
+        """nft commands replacing one set's elements"""
+        table = FirewallManager.NFT_TABLE
+        script = f"flush set inet {table} {name}{family}\n"
+        timeouts = timeouts or {}
+        elements = [f"{cidr} timeout {timeouts[cidr]}s" if cidr in timeouts else cidr
+                    for cidr in addresses.cidrs(family)]
+        if elements:
+            script += f"add element inet {table} {name}{family} {{ {', '.join(elements)} }}\n"
+        return script
+
+    @staticmethod
+    def load_sets(blocked: AddressSet, allowed: Optional[AddressSet] = None,
+                  expiries: Optional[Dict[str, int]] = None) -> bool:
+        """
+        Replace the block set, and the allow set when one is given, in one
+        nftables transaction; the allow set is left as it is otherwise
+
+        `expiries` maps blocked addresses to their ban's expiry time (-1 for
+        permanent); blocked CIDRs with no entry there never time out.
+        """
+        script = "" if FirewallManager._sets_ready() else FirewallManager.NFT_TEMPLATE.format(
+            table=FirewallManager.NFT_TABLE)
+        timeouts = FirewallManager._timeouts(blocked, expiries) if expiries else None
+        for family in (4, 6):
+            script += FirewallManager._refill("block", blocked, family, timeouts)
+            if allowed is not None:
+                script += FirewallManager._refill("allow", allowed, family)
+        
+        code, err = FirewallManager._nft_load(script)
+        if code != 0:
+            print_colored(f"Error loading address sets: {err}", Colors.FAIL)
+            return False
+        
+        detail = f" and {len(allowed)} allowed" if allowed is not None else ""
+        print_colored(f"Loaded {len(blocked)} blocked{detail} CIDRs", Colors.GREEN)
+        return True
+
+    # Per-source new-connection meter, dropped in the kernel before sshd
+    # spends a key exchange on the attempt. Sources are forgotten once idle
+    # for a minute, so the meter sets stay bounded under a spread-out flood.
+    # Loopback is exempt: local tools and the sshd storm benchmark connect there
+    RATE_LIMIT_TABLE = "vps_manager_ratelimit"
+    RATE_LIMIT_PORTS = [22]
+    RATE_LIMIT_PER_MINUTE = 10
+    RATE_LIMIT_BURST = 20
+    RATE_LIMIT_TEMPLATE = """add table inet $table
+delete table inet $table
+table inet $table {
+    set meter4 { type ipv4_addr; flags dynamic; timeout 1m; size 65536; }
+    set meter6 { type ipv6_addr; flags dynamic; timeout 1m; size 65536; }
+    chain input {
+        type filter hook input priority -5; policy accept;
+        iifname "lo" return
+        tcp dport { $ports } ct state new update @meter4 { ip saddr limit rate over $rate/minute burst $burst packets } drop
+        tcp dport { $ports } ct state new update @meter6 { ip6 saddr limit rate over $rate/minute burst $burst packets } drop
+    }
+}
+"""
+    RATE_LIMIT_FILE = "/etc/vps_manager/ratelimit.nft"
+    RATE_LIMIT_UNIT = "/etc/systemd/system/vps-manager-ratelimit.service"
+    RATE_LIMIT_UNIT_TEMPLATE = """[Unit]
+Description=vps-manager SSH connection-rate limits
+Wants=network-pre.target
+Before=network-pre.target
+
+[Service]
+Type=oneshot
+RemainAfterExit=yes
+ExecStart=/usr/sbin/nft -f $path
+ExecStop=/usr/sbin/nft delete table inet $table
+
+[Install]
+WantedBy=multi-user.target
+"""
+
+    @staticmethod
+    def rate_limit_script(ports: List[int], per_minute: int, burst: int, table: Optional[str] = None) -> str:
+        return ConfigManager.render(
+            FirewallManager.RATE_LIMIT_TEMPLATE, table=table or FirewallManager.RATE_LIMIT_TABLE,
+            ports=", ".join(str(port) for port in ports), rate=str(per_minute), burst=str(burst),
+        )
+
+    @staticmethod
+    @StepProfiler.step
+    def rate_limit(ports: Optional[List[int]] = None, per_minute: Optional[int] = None,
+                   burst: Optional[int] = None, backend: str = "nft") -> bool:
+        """
+        Limit new connections per source address on the given ports
+
+        The nft backend meters each source at `per_minute` with a `burst`
+        allowance and persists the table across reboots. The ufw backend
+        uses `ufw limit`, whose threshold is fixed at 6 connections in 30s.
+        """
+        ports = ports or FirewallManager.RATE_LIMIT_PORTS
+        if backend == "ufw":
+            for port in ports:
+                code, _, err = run_command(f"ufw limit {port}/tcp")
+                if code != 0:
+                    print_colored(f"Error limiting port {port}: {err}", Colors.FAIL)
+                    return False
+            print_colored(f"ufw limit enabled on {', '.join(map(str, ports))}", Colors.GREEN)
+            return True
+        
+        per_minute = per_minute or FirewallManager.RATE_LIMIT_PER_MINUTE
+        burst = burst or FirewallManager.RATE_LIMIT_BURST
+        script = FirewallManager.rate_limit_script(ports, per_minute, burst)
+        code, err = FirewallManager._nft_load(script)
+        if code != 0:
+            print_colored(f"Error loading rate limits: {err}", Colors.FAIL)
+            return False
+        
+        unit = ConfigManager.render(FirewallManager.RATE_LIMIT_UNIT_TEMPLATE, path=FirewallManager.RATE_LIMIT_FILE,
+                                    table=FirewallManager.RATE_LIMIT_TABLE)
+        ConfigManager.write(FirewallManager.RATE_LIMIT_FILE, script)
+        if ConfigManager.write(FirewallManager.RATE_LIMIT_UNIT, unit):
+            run_command("systemctl daemon-reload")
+        run_command("systemctl enable vps-manager-ratelimit.service")
+        
+        print_colored(f"Rate limit {per_minute}/min (burst {burst}) on ports {', '.join(map(str, ports))}", Colors.GREEN)
+        return True
+
+    @staticmethod
+    def remove_rate_limit() -> bool:
+        run_command("systemctl disable vps-manager-ratelimit.service")
+        for path in (FirewallManager.RATE_LIMIT_UNIT, FirewallManager.RATE_LIMIT_FILE):
+            if os.path.exists(path):
+                os.remove(path)
+        code, _, err = run_command(f"nft delete table inet {FirewallManager.RATE_LIMIT_TABLE}")
+        if code != 0 and "No such file" not in err:
+            print_colored(f"Error removing rate limits: {err}", Colors.FAIL)
+            return False
+        return True
+
+    LOADGEN_NAMESPACE = "vpsm-loadgen"
+    LOADGEN_HOST, LOADGEN_PEER = "10.203.0.1", "10.203.0.2"
+    LOADGEN_PORT = 2222
+
+    @staticmethod
+    def test_rate_limit(per_minute: Optional[int] = None, burst: Optional[int] = None,
+                        attempts: int = 200, offered_rate: float = 100.0) -> Optional[Dict[str, Any]]:
+        """
+        Flood a scratch listener from a network namespace through the rate limit
+
+        Loads the same ruleset as rate_limit() into a separate table that
+        only covers a test port, so the live SSH limits are untouched.
+        Returns the generator's counts next to the number of connections
+        the meter should have let through.
+        """
+        import socket
+        import threading
+
+        per_minute = per_minute or FirewallManager.RATE_LIMIT_PER_MINUTE
+        burst = burst or FirewallManager.RATE_LIMIT_BURST
+        ns, host, peer = FirewallManager.LOADGEN_NAMESPACE, FirewallManager.LOADGEN_HOST, FirewallManager.LOADGEN_PEER
+        table = f"{FirewallManager.RATE_LIMIT_TABLE}_test"
+        setup = [
+            f"ip netns add {ns}",
+            "ip link add vpsm-lg0 type veth peer name vpsm-lg1",
+            f"ip link set vpsm-lg1 netns {ns}",
+            f"ip addr add {host}/30 dev vpsm-lg0",
+            "ip link set vpsm-lg0 up",
+            f"ip netns exec {ns} ip addr add {peer}/30 dev vpsm-lg1",
+            f"ip netns exec {ns} ip link set vpsm-lg1 up",
+            f"ip netns exec {ns} ip link set lo up",
+        ]
+        teardown = [f"nft delete table inet {table}", "ip link delete vpsm-lg0", f"ip netns delete {ns}"]
+        
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        stop = threading.Event()
+        try:
+            for cmd in setup:
+                code, _, err = run_command(cmd)
+                if code != 0:
+                    print_colored(f"Error executing {cmd}: {err}", Colors.FAIL)
+                    return None
+            code, err = FirewallManager._nft_load(
+                FirewallManager.rate_limit_script([FirewallManager.LOADGEN_PORT], per_minute, burst, table))
+            if code != 0:
+                print_colored(f"Error loading test rate limit: {err}", Colors.FAIL)
+                return None
+            
+            server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            server.bind((host, FirewallManager.LOADGEN_PORT))
+            server.listen(1024)
+            server.settimeout(0.2)
+            
+            def accept_loop() -> None:
+                while not stop.is_set():
+                    try:
+                        server.accept()[0].close()
+                    except socket.timeout:
+                        continue
+                    except OSError:
+                        break
+            
+            threading.Thread(target=accept_loop, daemon=True).start()
+            
+            package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            code, out, err = run_command(
+                f"ip netns exec {ns} env PYTHONPATH={package_root} {sys.executable} -m {__package__}.loadgen "
+                f"{host} {FirewallManager.LOADGEN_PORT} {attempts} {offered_rate}"
+            )
+            if code != 0:
+                print_colored(f"Load generator failed: {err}", Colors.FAIL)
+                return None
+            result = json.loads(out)
+        finally:
+            stop.set()
+            server.close()
+            for cmd in teardown:
+                run_command(cmd)
+        
+        # The meter admits the burst, then refills at per_minute while the flood runs
+        result["expected"] = min(attempts, burst + int(per_minute * result["duration_s"] / 60))
+        result.update({"per_minute": per_minute, "burst": burst, "offered_rate": offered_rate})
+        return result
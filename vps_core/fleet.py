@@ -0,0 +1,164 @@
+"""Per-host staggering of scheduled jobs across a fleet
+
+Guests on one hypervisor share its disks, so jobs that every host starts
+at the same minute (a nightly scan, the update window) add up to one IO
+spike. Each job here starts at a deterministic per-host offset hashed
+from /etc/machine-id, and, when the host belongs to a shared-storage
+group, in a slot sized so that only a bounded number of the group's
+hosts run the job at once.
+
+The cap needs no coordinator: the job's span is cut into slots one job
+long and hosts are spread over them. With an operator-assigned
+`host_index` the spread is exact, so each slot holds at most
+`max_concurrent` hosts; without one, hosts are placed by hash and the
+cap holds on average.
+"""
+
+import os
+import sys
+import json
+import math
+import hashlib
+import tempfile
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from .common import ENTRY_POINT, Colors, atomic_write, print_colored, run_command
+from .config import ConfigManager
+
+class FleetSchedule:
+    """Place this host's scheduled jobs in the fleet and install their timers"""
+
+    MACHINE_ID = "/etc/machine-id"
+    CONFIG_FILE = "/etc/vps_manager/fleet.json"
+    UNIT_DIR = "/etc/systemd/system"
+    SERVICE_TEMPLATE = """[Unit]
+Description=vps-manager: $description
+After=network-online.target
+Wants=network-online.target
+
+[Service]
+Type=oneshot
+ExecStart=$python $entry_point $arguments
+Nice=$nice
+IOSchedulingClass=$io_class
+"""
+    # No Persistent=: after a hypervisor reboot every guest would catch up at once
+    TIMER_TEMPLATE = """[Unit]
+Description=vps-manager: $description timer
+
+[Timer]
+OnCalendar=$calendar
+AccuracySec=1min
+
+[Install]
+WantedBy=timers.target
+"""
+
+    @staticmethod
+    def machine_key() -> str:
+        try:
+            with open(FleetSchedule.MACHINE_ID) as f:
+                return f.read().strip()
+        except OSError:
+            return os.uname().nodename
+
+    @staticmethod
+    def _hash(*parts: str) -> int:
+        return int(hashlib.sha256(":".join(parts).encode()).hexdigest(), 16)
+
+    @staticmethod
+    def config() -> Dict:
+        """The storage group settings, or {} when this host isn't in a group"""
+        try:
+            with open(FleetSchedule.CONFIG_FILE) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def configure(group: str, group_size: int, max_concurrent: int, host_index: Optional[int] = None) -> None:
+        """Record which shared-storage group this host is in and the group's concurrency cap"""
+        settings = {"storage_group": group, "group_size": group_size, "max_concurrent": max_concurrent}
+        if host_index is not None:
+            settings["host_index"] = host_index
+        os.makedirs(os.path.dirname(FleetSchedule.CONFIG_FILE), exist_ok=True)
+        atomic_write(FleetSchedule.CONFIG_FILE, json.dumps(settings, indent=2) + "\n")
+
+    @staticmethod
+    def offset(job: str, span: int, duration: int) -> Tuple[int, Optional[str]]:
+        """
+        Minutes after the start of the job's span at which this host runs it
+
+        Returns the offset and, when the group's cap can't be met within the
+        span, a warning saying what concurrency to expect instead.
+        """
+        key = FleetSchedule.machine_key()
+        settings = FleetSchedule.config()
+        if not settings:
+            return FleetSchedule._hash(job, key) % span, None
+
+        group = settings["storage_group"]
+        slots = max(1, span // duration)
+        needed = math.ceil(settings["group_size"] / settings["max_concurrent"])
+        warning = None
+        if needed > slots:
+            warning = (f"{job}: {settings['group_size']} hosts in {group} need {needed} slots of {duration} min "
+                       f"to keep {settings['max_concurrent']} concurrent, but only {slots} fit in {span} min; "
+                       f"expect up to {math.ceil(settings['group_size'] / slots)} at once")
+        if "host_index" in settings:
+            slot = settings["host_index"] % slots
+        else:
+            slot = FleetSchedule._hash(group, job, key) % slots
+        return slot * duration, warning
+
+    @staticmethod
+    def start(job: str, earliest: Tuple[int, int], span: int, duration: int) -> datetime:
+        """Today's start time for a job whose hosts spread over [earliest, +span minutes)"""
+        minutes, _ = FleetSchedule.offset(job, span, duration)
+        hour, minute = earliest
+        midnight = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        return midnight + timedelta(hours=hour, minutes=minute + minutes)
+
+    @staticmethod
+    def write_timer(name: str, description: str, arguments: str, calendar: str,
+                    nice: str = "0", io_class: str = "best-effort") -> bool:
+        """Write a oneshot service running vps_manager.py and its timer; return whether either changed"""
+        unit = os.path.join(FleetSchedule.UNIT_DIR, name)
+        service = ConfigManager.render(FleetSchedule.SERVICE_TEMPLATE, description=description, python=sys.executable,
+                                       entry_point=ENTRY_POINT, arguments=arguments, nice=nice, io_class=io_class)
+        timer = ConfigManager.render(FleetSchedule.TIMER_TEMPLATE, description=description, calendar=calendar)
+        changed = ConfigManager.write(f"{unit}.service", service)
+        changed |= ConfigManager.write(f"{unit}.timer", timer)
+        return changed
+
+    @staticmethod
+    def enable(timers: List[str], changed: bool) -> bool:
+        commands = ["systemctl daemon-reload"] if changed else []
+        commands.append(f"systemctl enable --now {' '.join(f'{timer}.timer' for timer in timers)}")
+        for cmd in commands:
+            code, _, err = run_command(cmd)
+            if code != 0:
+                print_colored(f"Error executing {cmd}: {err}", Colors.FAIL)
+                return False
+        return True
+
+    @staticmethod
+    def remove_cron(pattern: str) -> bool:
+        """Drop root crontab lines containing `pattern`, left behind by older setups"""
+        code, out, _ = run_command("crontab -l")
+        if code != 0:
+            return True
+        lines = out.splitlines()
+        kept = [line for line in lines if pattern not in line]
+        if len(kept) == len(lines):
+            return True
+        with tempfile.NamedTemporaryFile("w", prefix="vps_crontab-") as f:
+            f.write("".join(f"{line}\n" for line in kept))
+            f.flush()
+            code, _, err = run_command(f"crontab {f.name}")
+        if code != 0:
+            print_colored(f"Error updating crontab: {err}", Colors.FAIL)
+            return False
+        print_colored(f"Removed {len(lines) - len(kept)} cron job(s) replaced by timers", Colors.BLUE)
+        return True
@@ -0,0 +1,307 @@
+"""Golden-image export and import of the applied hardening
+
+A host that has been through provisioning differs from a fresh one by a
+known set of config files, packages and enabled units. Export captures
+exactly that delta as a content-addressed bundle: a tar holding a
+manifest and one object per distinct file content, named by its SHA-256,
+with the bundle itself named after the hash of its manifest. Import
+accepts only the paths, packages and units this tool manages, verifies
+every object before writing anything, places only the files whose
+content differs, installs missing packages in one apt run and
+reloads each affected service once.
+
+Per-host state is deliberately not copied: timer schedules are
+re-derived for the importing host (see FleetSchedule), clamd is re-sized
+to its RAM, and fleet.json, bans and scan state stay behind.
+"""
+
+import io
+import os
+import re
+import glob
+import json
+import fnmatch
+import socket
+import tarfile
+import hashlib
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from .apt import AptIndex
+from .clamd import ClamdTuner
+from .common import Colors, print_colored, run_command
+from .config import ConfigManager
+from .fail2ban import Fail2BanManager
+from .firewall import FirewallManager
+from .fleet import FleetSchedule
+from .malware import MalwareScanner
+from .packages import PackageState
+from .profiler import StepProfiler
+from .scan import YaraEngine
+from .sshd import SshdConfig
+from .update_pipeline import UpdatePipeline
+from .updates import SystemUpdater
+
+class GoldenImage:
+    """Capture the hardening delta of this host as a bundle and apply one to a fresh host"""
+
+    # Captured paths (globs allowed) and the service that picks each up;
+    # None for files read fresh by whatever uses them
+    FILES: Dict[str, Optional[str]] = {
+        SshdConfig.DROPIN: SshdConfig.SERVICE,
+        "/etc/fail2ban/jail.local": "fail2ban",
+        Fail2BanManager.DROPIN_PATH: None,
+        Fail2BanManager.ACTION_PATH: "fail2ban",
+        FirewallManager.UFW_CONF: "ufw",
+        FirewallManager.UFW_RULE_FILES["ipv4"]: "ufw",
+        FirewallManager.UFW_RULE_FILES["ipv6"]: "ufw",
+        FirewallManager.RATE_LIMIT_FILE: "vps-manager-ratelimit",
+        FirewallManager.RATE_LIMIT_UNIT: None,
+        SystemUpdater.UNATTENDED_CONF: "unattended-upgrades",
+        ClamdTuner.CONF: "clamav-daemon",
+        "/etc/clamav/freshclam.conf": "clamav-freshclam",
+        os.path.join(YaraEngine.RULES_DIR, "**", "*"): None,
+    }
+    # Commands that must accept a service's new config before it is kept
+    VALIDATE = {SshdConfig.SERVICE: "sshd -t"}
+    PACKAGES = ["ufw", "fail2ban", "nftables", "unattended-upgrades", "clamav", "clamav-daemon", "clamav-freshclam"]
+    UNITS = ["ufw.service", "fail2ban.service", "clamav-daemon.service", "clamav-freshclam.service",
+             "vps-manager-ratelimit.service"]
+    # Timers whose schedule is per host, regenerated on import rather than copied
+    SCHEDULES = {"updates": "vps-manager-install.timer", "scan": "vps-manager-scan.timer"}
+    DIGEST = re.compile(r"[0-9a-f]{64}")
+    MANIFEST_KEYS = {"id", "created", "host", "content"}
+    CONTENT_KEYS = {"files", "packages", "units", "schedules"}
+
+    @staticmethod
+    def _files() -> List[str]:
+        paths = set()
+        for pattern in GoldenImage.FILES:
+            paths.update(path for path in glob.glob(pattern, recursive=True) if os.path.isfile(path))
+        return sorted(paths)
+
+    @staticmethod
+    def _pattern(path: str) -> Optional[str]:
+        """The FILES pattern a path falls under, or None"""
+        for pattern in GoldenImage.FILES:
+            # fnmatch has no "**", so also try the pattern with it matching nothing
+            if fnmatch.fnmatch(path, pattern) or fnmatch.fnmatch(path, pattern.replace("**/", "")):
+                return pattern
+        return None
+
+    @staticmethod
+    def _service(path: str) -> Optional[str]:
+        pattern = GoldenImage._pattern(path)
+        return GoldenImage.FILES[pattern] if pattern else None
+
+    @staticmethod
+    def _digest(content: bytes) -> str:
+        return hashlib.sha256(content).hexdigest()
+
+    @staticmethod
+    def _content_id(content: Dict) -> str:
+        return GoldenImage._digest(json.dumps(content, sort_keys=True, separators=(",", ":")).encode())
+
+    @staticmethod
+    @StepProfiler.step
+    def export(directory: str = ".") -> Optional[str]:
+        """Write this host's hardening delta as a bundle in `directory`; return its path"""
+        objects: Dict[str, bytes] = {}
+        files = {}
+        for path in GoldenImage._files():
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+                mode = os.stat(path).st_mode & 0o777
+            except OSError as e:
+                print_colored(f"Error reading {path}: {e}", Colors.FAIL)
+                return None
+            digest = GoldenImage._digest(data)
+            objects[digest] = data
+            files[path] = {"sha256": digest, "mode": mode}
+
+        units = [unit for unit in GoldenImage.UNITS
+                 if run_command(f"systemctl is-enabled --quiet {unit}")[0] == 0]
+        content = {
+            "files": files,
+            "packages": {name: PackageState.version(name) for name in GoldenImage.PACKAGES
+                         if PackageState.is_installed(name)},
+            "units": units,
+            "schedules": [job for job, timer in GoldenImage.SCHEDULES.items()
+                          if os.path.exists(os.path.join(FleetSchedule.UNIT_DIR, timer))],
+        }
+        image_id = GoldenImage._content_id(content)
+        manifest = {
+            "id": image_id,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "host": socket.gethostname(),
+            "content": content,
+        }
+
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"vps-image-{image_id[:12]}.tar.gz")
+        tmp_path = f"{path}.tmp"
+        with tarfile.open(tmp_path, "w:gz") as tar:
+            members = [("manifest.json", json.dumps(manifest, indent=2, sort_keys=True).encode())]
+            members += [(f"objects/{digest}", data) for digest, data in sorted(objects.items())]
+            for name, data in members:
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                info.mode = 0o600
+                tar.addfile(info, io.BytesIO(data))
+        os.replace(tmp_path, path)
+
+        print_colored(f"Exported {len(files)} files ({len(objects)} objects), {len(content['packages'])} packages "
+                      f"and {len(units)} units as {path}", Colors.GREEN)
+        return path
+
+    @staticmethod
+    def read(path: str) -> Tuple[Dict, Dict[str, bytes]]:
+        """Load a bundle and verify it end to end; raises ValueError on any mismatch"""
+        objects: Dict[str, bytes] = {}
+        manifest = None
+        with tarfile.open(path, "r:*") as tar:
+            for member in tar.getmembers():
+                if not member.isfile() or not (member.name == "manifest.json" or member.name.startswith("objects/")):
+                    raise ValueError(f"unexpected bundle entry {member.name}")
+                data = tar.extractfile(member).read()
+                if member.name == "manifest.json":
+                    manifest = json.loads(data)
+                else:
+                    objects[member.name[len("objects/"):]] = data
+        if manifest is None:
+            raise ValueError("bundle has no manifest")
+        GoldenImage.check(manifest)
+        if GoldenImage._content_id(manifest["content"]) != manifest["id"]:
+            raise ValueError("manifest does not match its id")
+        for digest, data in objects.items():
+            if GoldenImage._digest(data) != digest:
+                raise ValueError(f"object {digest[:12]} is corrupt")
+        referenced = {entry["sha256"] for entry in manifest["content"]["files"].values()}
+        missing = referenced - objects.keys()
+        if missing:
+            raise ValueError(f"{len(missing)} object(s) missing from the bundle")
+        if objects.keys() - referenced:
+            raise ValueError(f"{len(objects.keys() - referenced)} object(s) not listed in the manifest")
+        return manifest, objects
+
+    @staticmethod
+    def check(manifest: Dict) -> None:
+        """
+        Accept only what export could have produced; raises ValueError otherwise
+
+        A matching id only shows the bundle is consistent with itself, not
+        who made it, and import runs as root. So every file must fall under
+        FILES as a plain absolute path, and packages, units and schedules
+        must be ones this tool manages.
+        """
+        for keys, expected, what in ((manifest, GoldenImage.MANIFEST_KEYS, "manifest"),
+                                     (manifest.get("content") if isinstance(manifest, dict) else None,
+                                      GoldenImage.CONTENT_KEYS, "content")):
+            if not isinstance(keys, dict):
+                raise ValueError(f"{what} is not an object")
+            if set(keys) != expected:
+                raise ValueError(f"unexpected {what} keys: {', '.join(sorted(set(keys) ^ expected))}")
+        content = manifest["content"]
+        if not (isinstance(content["files"], dict) and isinstance(content["packages"], dict)
+                and isinstance(content["units"], list) and isinstance(content["schedules"], list)
+                and all(isinstance(entry, dict) for entry in content["files"].values())
+                and all(isinstance(name, str) for name in content["units"] + content["schedules"])):
+            raise ValueError("manifest content is malformed")
+
+        for path, entry in content["files"].items():
+            if not os.path.isabs(path) or os.path.normpath(path) != path or ".." in path.split("/"):
+                raise ValueError(f"file path {path!r} is not a plain absolute path")
+            if GoldenImage._pattern(path) is None:
+                raise ValueError(f"file {path} is not one this tool manages")
+            if (set(entry) != {"sha256", "mode"} or not GoldenImage.DIGEST.fullmatch(str(entry["sha256"]))
+                    or not isinstance(entry["mode"], int) or not 0 <= entry["mode"] <= 0o777):
+                raise ValueError(f"file entry for {path} is malformed")
+
+        unknown = ((set(content["packages"]) - set(GoldenImage.PACKAGES))
+                   | (set(content["units"]) - set(GoldenImage.UNITS))
+                   | (set(content["schedules"]) - set(GoldenImage.SCHEDULES)))
+        if unknown:
+            raise ValueError(f"unmanaged packages, units or schedules: {', '.join(sorted(unknown))}")
+        if not all(isinstance(version, str) for version in content["packages"].values()):
+            raise ValueError("package versions are malformed")
+
+    @staticmethod
+    def _redirected(path: str) -> bool:
+        """Whether a symlink anywhere on the path would send a write elsewhere"""
+        return os.path.realpath(path) != path
+
+    @staticmethod
+    @StepProfiler.step
+    def import_bundle(path: str) -> bool:
+        """Apply a bundle: packages first, then files grouped per service, units and schedules"""
+        try:
+            manifest, objects = GoldenImage.read(path)
+        except (OSError, ValueError, KeyError, tarfile.TarError) as e:
+            print_colored(f"Refusing {path}: {e}", Colors.FAIL)
+            return False
+        content = manifest["content"]
+        print_colored(f"Image {manifest['id'][:12]} from {manifest['host']} ({manifest['created']}) verified",
+                      Colors.BLUE)
+
+        code, err = AptIndex.install(list(content["packages"]))
+        if code != 0:
+            print_colored(f"Error installing packages: {err}", Colors.FAIL)
+            return False
+
+        redirected = [file_path for file_path in content["files"] if GoldenImage._redirected(file_path)]
+        if redirected:
+            print_colored(f"Refusing {path}: symlinks redirect {', '.join(redirected)}", Colors.FAIL)
+            return False
+
+        # One ConfigManager.apply per service and mode, so each service is
+        # validated and reloaded once however many of its files changed.
+        # Contents stay bytes: compiled YARA rules are not text
+        groups: Dict[Tuple[Optional[str], int], Dict[str, bytes]] = {}
+        for file_path, entry in content["files"].items():
+            data = objects[entry["sha256"]]
+            if file_path == ClamdTuner.CONF:
+                # The source host's threads, scan sizes and reload strategy may not
+                # fit this one; size them here so clamd starts once, with this host's
+                data = ClamdTuner.render(data.decode(), ClamdTuner.profile()).encode()
+            key = (GoldenImage._service(file_path), entry["mode"])
+            groups.setdefault(key, {})[file_path] = data
+
+        for files in groups.values():
+            for file_path in files:
+                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+        # Unit files and drop-ins first, so systemd knows them before any service is started
+        units_changed = False
+        for (service, mode), files in groups.items():
+            if service is None:
+                for file_path, data in files.items():
+                    changed = ConfigManager.write(file_path, data, mode)
+                    units_changed |= changed and file_path.startswith(FleetSchedule.UNIT_DIR)
+        if units_changed:
+            run_command("systemctl daemon-reload")
+
+        ok = True
+        # The imported banaction adds to the block sets; they must exist before fail2ban reloads
+        if Fail2BanManager.ACTION_PATH in content["files"]:
+            ok &= Fail2BanManager.install_ban_persistence()
+        for (service, mode), files in sorted((key, files) for key, files in groups.items() if key[0] is not None):
+            if ConfigManager.apply(service, files, mode, validate=GoldenImage.VALIDATE.get(service)) is None:
+                ok = False
+
+        if content["units"]:
+            code, _, err = run_command(f"systemctl enable --now {' '.join(content['units'])}")
+            if code != 0:
+                print_colored(f"Error enabling units: {err}", Colors.FAIL)
+                ok = False
+
+        # Host-specific schedules are derived here rather than copied
+        if "updates" in content["schedules"]:
+            ok &= UpdatePipeline.schedule()
+        if "scan" in content["schedules"]:
+            ok &= MalwareScanner.schedule_scan()
+
+        color = Colors.GREEN if ok else Colors.WARNING
+        print_colored(f"Imported {len(content['files'])} files and {len(content['units'])} units"
+                      f"{'' if ok else ' with errors'}", color)
+        return ok
@@ -0,0 +1,261 @@
+"""File integrity monitoring with an incremental Merkle index
+
+Every directory under the monitored roots has one row in a SQLite index
+holding its entries (type, size, times, mode, owner, content hash) and a
+digest over those entries and its subdirectories' digests. A check
+re-stats the tree but only re-hashes files whose size, mtime, ctime or
+inode moved, so a mostly unchanged tree costs a metadata walk rather
+than a read of every byte. A quick check goes further: a directory whose
+times are unchanged is not listed again, and when its subdirectories'
+digests are unchanged as well its stored digest is kept as it is.
+"""
+
+import os
+import stat
+import json
+import time
+import sqlite3
+import hashlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from .common import STATE_DIR, Colors, print_colored
+from .profiler import StepProfiler
+
+# (kind, size, mtime_ns, ctime_ns, mode, uid, gid, inode, digest)
+Entry = List
+KIND, SIZE, MTIME, CTIME, MODE, UID, GID, INODE, DIGEST = range(9)
+
+class IntegrityMonitor:
+    """Record a baseline of monitored trees and report what changed since"""
+
+    DB_PATH = os.path.join(STATE_DIR, "integrity.sqlite3")
+    ROOTS = ["/etc", "/usr/bin", "/usr/sbin", "/usr/local/bin", "/var/www"]
+    HASH_WORKERS = min(8, os.cpu_count() or 1)
+    CHUNK = 1024 * 1024
+
+    def __init__(self, roots: Optional[List[str]] = None, db_path: Optional[str] = None, quick: bool = False):
+        """
+        With `quick`, files in a directory whose mtime and ctime are unchanged
+        are not even stat'ed. That catches every add, remove and rename but
+        misses in-place writes, so the default re-stats every file and
+        relies on ctime, which can't be set back from user space.
+        """
+        self.roots = [os.path.abspath(root) for root in (roots or IntegrityMonitor.ROOTS)]
+        self.quick = quick
+        path = db_path or IntegrityMonitor.DB_PATH
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.execute("CREATE TABLE IF NOT EXISTS dirs "
+                        "(path BLOB PRIMARY KEY, mtime_ns INTEGER, ctime_ns INTEGER, digest TEXT, entries TEXT)")
+        self.changes: Dict[str, List[Tuple[str, List[str]]]] = {"added": [], "removed": [], "modified": []}
+        self.stats = {"dirs": 0, "files": 0, "hashed": 0, "hashed_bytes": 0}
+
+    @staticmethod
+    def _hash_file(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb", buffering=0) as f:
+            while True:
+                chunk = f.read(IntegrityMonitor.CHUNK)
+                if not chunk:
+                    break
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _entry(st: os.stat_result) -> Entry:
+        if stat.S_ISREG(st.st_mode):
+            kind = "f"
+        elif stat.S_ISDIR(st.st_mode):
+            kind = "d"
+        elif stat.S_ISLNK(st.st_mode):
+            kind = "l"
+        else:
+            kind = "o"
+        return [kind, st.st_size, st.st_mtime_ns, st.st_ctime_ns, stat.S_IMODE(st.st_mode),
+                st.st_uid, st.st_gid, st.st_ino, None]
+
+    @staticmethod
+    def _differences(old: Entry, new: Entry) -> List[str]:
+        what = []
+        if old[KIND] != new[KIND]:
+            return ["type"]
+        if old[DIGEST] != new[DIGEST]:
+            what.append("content")
+        if old[MODE] != new[MODE]:
+            what.append("mode")
+        if (old[UID], old[GID]) != (new[UID], new[GID]):
+            what.append("owner")
+        return what
+
+    def _load(self, path: str) -> Optional[Tuple[int, int, str, Dict[str, Entry]]]:
+        row = self.db.execute("SELECT mtime_ns, ctime_ns, digest, entries FROM dirs WHERE path = ?",
+                              (os.fsencode(path),)).fetchone()
+        if row is None:
+            return None
+        return row[0], row[1], row[2], json.loads(row[3])
+
+    def _forget(self, path: str, report: bool) -> None:
+        """Drop a vanished directory and everything indexed below it"""
+        key = os.fsencode(path)
+        rows = self.db.execute("SELECT path, entries FROM dirs WHERE path = ? OR (path >= ? AND path < ?)",
+                               (key, key + b"/", key + b"0")).fetchall()
+        if report:
+            for directory, entries in rows:
+                directory = os.fsdecode(directory)
+                for name, entry in json.loads(entries).items():
+                    if entry[KIND] != "d":
+                        self.changes["removed"].append((os.path.join(directory, name), []))
+        self.db.execute("DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)", (key, key + b"/", key + b"0"))
+
+    def _scan(self, path: str, device: int, pool: ThreadPoolExecutor, report: bool) -> str:
+        """Index one directory, recursing first so hashing overlaps the walk; return its digest"""
+        st = os.lstat(path)
+        stored = self._load(path)
+        old_entries = stored[3] if stored else {}
+        dir_unchanged = stored is not None and (stored[0], stored[1]) == (st.st_mtime_ns, st.st_ctime_ns)
+        self.stats["dirs"] += 1
+
+        entries: Dict[str, Entry] = {}
+        pending: Dict[str, Future] = {}
+        if self.quick and dir_unchanged:
+            # Copies: the subdirectory digests are filled in below
+            entries = {name: list(entry) for name, entry in old_entries.items()}
+        else:
+            with os.scandir(path) as it:
+                for dirent in it:
+                    try:
+                        entry = IntegrityMonitor._entry(dirent.stat(follow_symlinks=False))
+                    except FileNotFoundError:
+                        continue
+                    old = old_entries.get(dirent.name)
+                    if entry[KIND] == "f":
+                        if old and old[KIND] == "f" and old[SIZE:INODE + 1] == entry[SIZE:INODE + 1]:
+                            entry[DIGEST] = old[DIGEST]
+                        else:
+                            pending[dirent.name] = pool.submit(IntegrityMonitor._hash_file, dirent.path)
+                            self.stats["hashed_bytes"] += entry[SIZE]
+                    elif entry[KIND] == "l":
+                        entry[DIGEST] = os.readlink(dirent.path)
+                    entries[dirent.name] = entry
+
+        for name, entry in sorted(entries.items()):
+            if entry[KIND] != "d":
+                continue
+            child = os.path.join(path, name)
+            try:
+                child_st = os.lstat(child)
+            except FileNotFoundError:
+                del entries[name]
+                continue
+            # Stay on the root's filesystem: /proc-like mounts and network shares aren't ours
+            if child_st.st_dev != device:
+                entry[DIGEST] = "mount"
+                continue
+            entry[DIGEST] = self._scan(child, device, pool, report)
+
+        for name, future in pending.items():
+            try:
+                entries[name][DIGEST] = future.result()
+                self.stats["hashed"] += 1
+            except OSError:
+                # Vanished or unreadable since it was listed
+                entries[name][DIGEST] = "unreadable"
+        self.stats["files"] += sum(1 for entry in entries.values() if entry[KIND] != "d")
+
+        # Directory times don't move when something deeper changes, so the
+        # subdirectories above were still visited; but when they all came
+        # back with their stored digests, this level is unchanged too and
+        # its stored digest stands without rebuilding or rewriting the row
+        if (self.quick and dir_unchanged and entries.keys() == old_entries.keys()
+                and all(entries[name][DIGEST] == old_entries[name][DIGEST] for name in entries)):
+            return stored[2]
+
+        if stored is not None:
+            for name in old_entries.keys() - entries.keys():
+                if old_entries[name][KIND] == "d":
+                    self._forget(os.path.join(path, name), report)
+                elif report:
+                    self.changes["removed"].append((os.path.join(path, name), []))
+            for name in old_entries.keys() & entries.keys():
+                # A directory replaced by a file (or the other way round)
+                if old_entries[name][KIND] == "d" and entries[name][KIND] != "d":
+                    self._forget(os.path.join(path, name), report)
+                elif report and old_entries[name][KIND] != "d" and entries[name][KIND] == "d":
+                    self.changes["removed"].append((os.path.join(path, name), []))
+        if report:
+            for name, entry in entries.items():
+                if entry[KIND] == "d":
+                    continue
+                old = old_entries.get(name)
+                if old is None:
+                    self.changes["added"].append((os.path.join(path, name), []))
+                else:
+                    what = IntegrityMonitor._differences(old, entry)
+                    if what:
+                        self.changes["modified"].append((os.path.join(path, name), what))
+
+        # Digest covers what we verify (not times or inodes), so a touched
+        # but otherwise identical file leaves the tree digest unchanged
+        digest = hashlib.sha256()
+        for name in sorted(entries):
+            entry = entries[name]
+            digest.update(os.fsencode(name) + b"\0" + repr(
+                (entry[KIND], entry[MODE], entry[UID], entry[GID], entry[DIGEST])).encode() + b"\n")
+        hexdigest = digest.hexdigest()
+
+        if stored is None or stored[2] != hexdigest or not dir_unchanged:
+            self.db.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?, ?)",
+                            (os.fsencode(path), st.st_mtime_ns, st.st_ctime_ns, hexdigest, json.dumps(entries)))
+        return hexdigest
+
+    def _run(self, update: bool, report: bool) -> Dict:
+        start = time.perf_counter()
+        digests = {}
+        with ThreadPoolExecutor(max_workers=IntegrityMonitor.HASH_WORKERS, thread_name_prefix="integrity") as pool:
+            for root in self.roots:
+                if not os.path.isdir(root):
+                    if report and self._load(root) is not None:
+                        self._forget(root, report)
+                    continue
+                # A root seen for the first time is a new baseline, not a pile of additions
+                known = self._load(root) is not None
+                digests[root] = self._scan(root, os.lstat(root).st_dev, pool, report and known)
+        if update:
+            self.db.commit()
+        else:
+            self.db.rollback()
+
+        for kind in self.changes:
+            self.changes[kind].sort()
+        return {
+            "roots": digests,
+            "changes": self.changes,
+            "stats": dict(self.stats, duration_s=round(time.perf_counter() - start, 3)),
+        }
+
+    @StepProfiler.step
+    def baseline(self) -> Dict:
+        """Index the roots from scratch and store the result as the new baseline"""
+        self.db.execute("DELETE FROM dirs")
+        return self._run(update=True, report=False)
+
+    def check(self, update: bool = False) -> Dict:
+        """Compare the roots against the baseline; with `update`, accept the changes"""
+        return self._run(update=update, report=True)
+
+    def close(self) -> None:
+        self.db.close()
+
+    @staticmethod
+    def print_report(report: Dict) -> None:
+        colors = {"added": Colors.WARNING, "removed": Colors.FAIL, "modified": Colors.FAIL}
+        for kind in ("added", "removed", "modified"):
+            for path, what in report["changes"][kind]:
+                detail = f" ({', '.join(what)})" if what else ""
+                print_colored(f"{kind:<9} {path}{detail}", colors[kind])
+        total = sum(len(items) for items in report["changes"].values())
+        stats = report["stats"]
+        print_colored(f"\n{total} change(s); {stats['files']} files in {stats['dirs']} directories, "
+                      f"{stats['hashed']} hashed ({stats['hashed_bytes'] / 1024 ** 2:.1f} MB) "
+                      f"in {stats['duration_s']:.2f}s", Colors.GREEN if total == 0 else Colors.WARNING, bold=True)
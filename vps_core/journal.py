@@ -0,0 +1,131 @@
+"""Checkpointed provisioning journal with resume-from-failure
+
+The Python counterpart of secure_debian11.sh's already_run/log_step: every
+completed step is recorded together with a hash of its inputs, so a re-run
+skips straight to the first step that failed or whose inputs changed.
+"""
+
+import os
+import json
+import time
+import hashlib
+import importlib
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .common import STATE_DIR, Colors, atomic_write, print_colored
+
+# (name, module, class, method): the unattended provisioning order
+PROVISION_STEPS: List[Tuple[str, str, str, str]] = [
+    ("update-system", "updates", "SystemUpdater", "update_system"),
+    ("setup-ufw", "firewall", "FirewallManager", "setup_ufw"),
+    ("install-fail2ban", "fail2ban", "Fail2BanManager", "install_fail2ban"),
+    ("create-swap", "swap", "SwapManager", "create_swap"),
+    ("install-clamav", "malware", "MalwareScanner", "install_clamav"),
+    ("cleanup", "cleaner", "SystemCleaner", "cleanup_system"),
+]
+
+class ProvisioningJournal:
+    """Durable record of completed provisioning steps"""
+
+    PATH = os.path.join(STATE_DIR, "journal.json")
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or ProvisioningJournal.PATH
+        try:
+            with open(self.path) as f:
+                self.entries: Dict[str, Dict[str, Any]] = json.load(f).get("steps", {})
+        except (OSError, ValueError):
+            self.entries = {}
+
+    @staticmethod
+    def inputs_hash(func: Callable, kwargs: Dict[str, Any]) -> str:
+        """Hash a step's arguments together with its implementation"""
+        func = getattr(func, "__wrapped__", func)
+        digest = hashlib.sha256()
+        digest.update(func.__qualname__.encode())
+        # Bytecode and constants change whenever the step's code or embedded config does
+        digest.update(func.__code__.co_code)
+        digest.update(repr(func.__code__.co_consts).encode())
+        digest.update(json.dumps(kwargs, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def is_current(self, name: str, inputs_hash: str) -> bool:
+        entry = self.entries.get(name)
+        return bool(entry) and entry["status"] == "done" and entry["inputs_hash"] == inputs_hash
+
+    def record(self, name: str, inputs_hash: str, status: str, duration: float) -> None:
+        """Record a step outcome and commit the journal before returning"""
+        self.entries[name] = {
+            "status": status,
+            "inputs_hash": inputs_hash,
+            "finished_at": datetime.now().isoformat(timespec="seconds"),
+            "duration_s": round(duration, 3),
+        }
+        self._commit()
+
+    def reset(self) -> None:
+        self.entries = {}
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _commit(self) -> None:
+        # Durable write-and-rename so a crash mid-write never leaves a torn journal
+        atomic_write(self.path, json.dumps({"version": 1, "steps": self.entries}, indent=2, sort_keys=True), 0o600)
+
+    def show(self) -> None:
+        """Print the recorded state of every provisioning step"""
+        for name, *_ in PROVISION_STEPS:
+            entry = self.entries.get(name)
+            if entry is None:
+                print_colored(f"{name:<18} pending", Colors.BLUE)
+                continue
+            color = Colors.GREEN if entry["status"] == "done" else Colors.FAIL
+            print_colored(f"{name:<18} {entry['status']:<7} {entry['finished_at']}  "
+                          f"{entry['duration_s']:.1f}s  {entry['inputs_hash'][:12]}", color)
+
+def step_arguments(name: str, swap_gb: Optional[int] = None) -> Dict[str, Any]:
+    """Arguments a provisioning step is called with"""
+    if name == "create-swap":
+        from .swap import SwapManager
+
+        return {"size_gb": swap_gb or SwapManager.get_recommended_swap_size()}
+    return {}
+
+def _resolve(name: str, module: str, cls: str, method: str, swap_gb: Optional[int]) -> Tuple[Callable, Dict[str, Any], str]:
+    func = getattr(getattr(importlib.import_module(f"{__package__}.{module}"), cls), method)
+    kwargs = step_arguments(name, swap_gb)
+    return func, kwargs, ProvisioningJournal.inputs_hash(func, kwargs)
+
+def pending_steps(journal: ProvisioningJournal, force: bool = False, swap_gb: Optional[int] = None) -> List[str]:
+    """Names of the provisioning steps a run would execute"""
+    if force:
+        return [name for name, *_ in PROVISION_STEPS]
+    for index, (name, module, cls, method) in enumerate(PROVISION_STEPS):
+        # Once one step has to run, everything after it runs too: later steps
+        # may depend on state the re-run step changes
+        if not journal.is_current(name, _resolve(name, module, cls, method, swap_gb)[2]):
+            return [step[0] for step in PROVISION_STEPS[index:]]
+    return []
+
+def provision(journal: ProvisioningJournal, force: bool = False, swap_gb: Optional[int] = None) -> bool:
+    """Run the provisioning steps in order, resuming at the first failed or changed one"""
+    to_run = pending_steps(journal, force, swap_gb)
+    for name, module, cls, method in PROVISION_STEPS:
+        if name not in to_run:
+            print_colored(f"Skipping {name} (completed, inputs unchanged)", Colors.BLUE)
+            continue
+        func, kwargs, inputs_hash = _resolve(name, module, cls, method, swap_gb)
+
+        start = time.perf_counter()
+        ok = False
+        try:
+            ok = bool(func(**kwargs))
+        finally:
+            journal.record(name, inputs_hash, "done" if ok else "failed", time.perf_counter() - start)
+        if not ok:
+            print_colored(f"Provisioning stopped at {name}; re-run to resume from here", Colors.FAIL)
+            return False
+
+    print_colored("Provisioning completed successfully!", Colors.GREEN)
+    return True
@@ -0,0 +1,357 @@
+"""Interactive flows shared by secure_optimize_vps.py and ezworkframebackup.py"""
+
+import os
+import subprocess
+from typing import Callable
+
+from .apt import AptIndex
+from .authlog import SshAuthLog
+from .common import Colors, clear_screen, print_banner, print_colored, require_root, run_command
+from .config import ConfigManager
+from .fail2ban import Fail2BanManager
+from .firewall import FirewallManager
+from .malware import MalwareScanner
+from .packages import PackageState
+from .users import UserManager
+
+def prompt(message: str) -> str:
+    """Reads a line of input after a colored prompt."""
+    return input(f"{Colors.BLUE}{message}{Colors.END}")
+
+def run_step(command: str, description: str = "") -> bool:
+    """Runs a shell command on the terminal with a progress message."""
+    print_colored(f"{description}...", Colors.BLUE)
+    code, _, err = run_command(command, shell=True, capture=False)
+    if code != 0:
+        print_colored(f"Error: command exited with status {code} {err}".rstrip(), Colors.FAIL)
+        return False
+    print_colored("Done.", Colors.GREEN)
+    return True
+
+def system_update():
+    """Updates the system and enables automatic updates."""
+    print_colored("Updating system...", Colors.BLUE)
+    AptIndex.ensure_fresh()
+    run_step("sudo apt upgrade -y", "Updating system packages")
+
+    print_colored("Checking for unattended-upgrades...", Colors.BLUE)
+    try:
+        # Check if unattended-upgrades is installed
+        if PackageState.is_installed("unattended-upgrades"):
+            print_colored("unattended-upgrades is already installed.", Colors.GREEN)
+        else:
+            AptIndex.ensure_fresh()
+            run_step("sudo apt install unattended-upgrades -y", "Installing unattended-upgrades")
+    except Exception as e:
+        print_colored(f"Error checking unattended-upgrades: {e}", Colors.FAIL)
+
+    # Check if configuration for unattended-upgrades is already in place
+    config_path = "/etc/apt/apt.conf.d/50unattended-upgrades"
+    try:
+        if os.path.exists(config_path):
+            print_colored("Automatic updates are already configured.", Colors.GREEN)
+        else:
+            with open(config_path, "a") as file:
+                file.write("""
+                Unattended-Upgrade::Mail "root@localhost";
+                Unattended-Upgrade::Automatic-Reboot "true";
+                """)
+            print_colored("Automatic updates configured.", Colors.GREEN)
+    except Exception as e:
+        print_colored(f"Error configuring automatic updates: {e}", Colors.FAIL)
+
+    print_colored("System update process completed.", Colors.GREEN)
+
+
+def system_cleanup():
+    """Cleans up unused packages and files."""
+    run_step("sudo apt autoremove -y && sudo apt autoclean -y", "Cleaning up the system")
+
+def create_user():
+    """Creates a new user with SSH key and password strength checking."""
+    username = prompt("Enter the username for the new user: ")
+    ssh_key = prompt("Enter SSH public key (or leave blank for no SSH key): ")
+    UserManager.create_user(username, ssh_key=ssh_key or None)
+
+def manage_users(): 
+    """Provides options to list, delete, or disable users."""
+    print_colored("User Management Options:", Colors.WARNING)
+    print("1. List Users")
+    print("2. Delete User")
+    print("3. Disable User")
+    choice = prompt("Enter your choice: ")
+
+    try:
+        with open('/etc/passwd', 'r') as passwd_file:
+            # Filter users with UID >= 1000 and exclude "nobody" and "root"
+            users = [line.split(':')[0] for line in passwd_file if int(line.split(':')[2]) >= 1000 and line.split(':')[0] not in ['nobody', 'root']]
+    except Exception as e:
+        print_colored(f"Error reading user list: {e}", Colors.FAIL)
+        return
+
+    if choice == '1':
+        print_colored("Listing users...", Colors.BLUE)
+        if users:
+            for user in users:
+                print(user)
+        else:
+            print_colored("No users found other than root.", Colors.WARNING)
+        print_colored("Done.", Colors.GREEN)
+    elif choice == '2':
+        if users:
+            username = prompt("Enter username to delete: ").strip()
+            if username in users:
+                run_step(f"sudo deluser --remove-home {username}", f"Deleting user {username}")
+            else:
+                print_colored("Invalid username. Operation aborted.", Colors.WARNING)
+        else:
+            print_colored("No users available to delete.", Colors.WARNING)
+    elif choice == '3':
+        if users:
+            username = prompt("Enter username to disable: ").strip()
+            if username in users:
+                run_step(f"sudo usermod -L {username}", f"Disabling user {username}")
+            else:
+                print_colored("Invalid username. Operation aborted.", Colors.WARNING)
+        else:
+            print_colored("No users available to disable.", Colors.WARNING)
+    else:
+        print_colored("Invalid choice. Returning to menu.", Colors.FAIL)
+
+
+def configure_firewall():
+    """Sets up and configures UFW with port and IP management."""
+    print_colored("Configuring UFW (Uncomplicated Firewall)...", Colors.BLUE)
+    if not PackageState.is_installed("ufw"):
+        AptIndex.ensure_fresh()
+        run_step("sudo apt install ufw -y", "Installing UFW")
+
+    # Set default firewall rules
+    print_colored("Setting default firewall rules...", Colors.BLUE)
+    run_step("sudo ufw default deny incoming", "Setting default policy to deny incoming traffic")
+    run_step("sudo ufw default allow outgoing", "Setting default policy to allow outgoing traffic")
+
+    while True:
+        # Fetch the latest allowed rules
+        allowed_rules = FirewallManager.allowed_rules()
+        allowed_ports = [rule[1] for rule in allowed_rules]
+        print_colored(f"Currently allowed ports: {', '.join(sorted(set(allowed_ports)))}", Colors.WARNING)
+
+        print_colored("1. Allow new ports", Colors.BLUE)
+        print_colored("2. Disable existing ports", Colors.BLUE)
+        print_colored("3. Return to Menu", Colors.BLUE)
+        action = prompt("Choose an action (1/2/3): ").strip()
+
+        if action == '3':
+            print_colored("Returning to the menu...", Colors.GREEN)
+            break
+        elif action == '1':
+            # Prompt for ports to allow
+            ports = prompt("Enter the ports to allow (comma-separated, or leave blank to skip): ").strip()
+
+            if not ports:
+                print_colored("No ports provided. Skipping.", Colors.WARNING)
+                continue
+
+            ports_to_allow = ports.split(',')
+            valid_ports = []
+
+            for port in ports_to_allow:
+                if port in allowed_ports:
+                    print_colored(f"Port {port} is already allowed.", Colors.WARNING)
+                elif port.isdigit():
+                    valid_ports.append(port)
+                else:
+                    print_colored(f"Invalid port: {port}. Skipping.", Colors.FAIL)
+
+            if valid_ports:
+                for port in valid_ports:
+                    FirewallManager.manage_port(int(port))
+                print_colored(f"Allowed ports: {', '.join(valid_ports)}", Colors.GREEN)
+            else:
+                print_colored("No new ports were added.", Colors.WARNING)
+        elif action == '2':
+            # Prompt for ports to disable
+            ports = prompt("Enter the ports to disable (comma-separated, or leave blank to skip): ").strip()
+
+            if not ports:
+                print_colored("No ports provided. Skipping.", Colors.WARNING)
+                continue
+
+            ports_to_disable = ports.split(',')
+            valid_ports = []
+
+            for port in ports_to_disable:
+                match_found = False
+                # Fetch updated rules dynamically for each port
+                allowed_rules = FirewallManager.allowed_rules()
+                for rule_number, allowed_port in list(allowed_rules):
+                    if port == allowed_port:
+                        # Delete both IPv4 and IPv6 rules for the port
+                        ipv4_code, _, ipv4_err = run_command(f"ufw --force delete {rule_number}")
+                        ipv6_code, _, ipv6_err = run_command(f"ufw --force delete {rule_number}")
+
+                        if ipv4_code == 0 or ipv6_code == 0:
+                            print_colored(f"Disabling port {port}", Colors.BLUE)
+                            match_found = True
+                            valid_ports.append(port)
+                            break
+                        else:
+                            print_colored(f"Failed to delete port {port}: {ipv4_err or ipv6_err}", Colors.FAIL)
+
+                if not match_found:
+                    print_colored(f"Port {port} is not currently allowed. Skipping.", Colors.WARNING)
+
+            if valid_ports:
+                print_colored(f"Disabled ports: {', '.join(valid_ports)}", Colors.GREEN)
+            else:
+                print_colored("No ports were disabled.", Colors.WARNING)
+        else:
+            print_colored("Invalid choice. Please choose 1, 2, or 3.", Colors.FAIL)
+
+    # Enable UFW if not already enabled
+    if not FirewallManager.rule_stats()["enabled"]:
+        run_step("sudo ufw enable", "Enabling UFW")
+    else:
+        print_colored("UFW is already enabled.", Colors.GREEN)
+
+    print_colored("Firewall configuration completed.", Colors.GREEN)
+
+
+def setup_fail2ban(): 
+    """Installs and configures Fail2Ban with email alerts."""
+    print_colored("Checking if Fail2Ban is already installed...", Colors.BLUE)
+    is_installed = PackageState.is_installed("fail2ban")
+
+    if is_installed:
+        print_colored("Fail2Ban is already installed.", Colors.WARNING)
+        is_active = os.system("systemctl is-active --quiet fail2ban") == 0
+
+        if is_active:
+            print_colored("Fail2Ban is already active and running.", Colors.GREEN)
+            return
+        else:
+            print_colored("Fail2Ban is installed but not active. Restarting service...", Colors.WARNING)
+            run_step("sudo systemctl restart fail2ban", "Restarting Fail2Ban")
+            return
+    else:
+        print_colored("Fail2Ban is not installed. Proceeding with installation...", Colors.WARNING)
+
+    AptIndex.ensure_fresh()
+    run_step("sudo apt install fail2ban nftables -y", "Installing Fail2Ban")
+
+    config = f"""
+    [DEFAULT]
+    destemail = root@localhost
+    sendername = Fail2Ban
+    action = %(action_mwl)s
+    banaction = {Fail2BanManager.ACTION_NAME}
+    banaction_allports = {Fail2BanManager.ACTION_NAME}
+
+    [sshd]
+    enabled = true
+    backend = systemd
+    journalmatch = {SshAuthLog.journal_match()}
+    """
+    print_colored("Configuring Fail2Ban...", Colors.BLUE)
+    try:
+        Fail2BanManager.install_ban_persistence()
+        ConfigManager.apply("fail2ban", {"/etc/fail2ban/jail.local": config,
+                                         Fail2BanManager.ACTION_PATH: Fail2BanManager.action_config()})
+    except Exception as e:
+        print_colored(f"Error writing configuration file: {e}", Colors.FAIL)
+        return
+
+    print_colored("Fail2Ban setup complete.", Colors.GREEN)
+
+def schedule_malware_scan():
+    """Schedules the nightly malware scan at this host's slot in the fleet."""
+    MalwareScanner.schedule_scan()
+
+
+def configure_swap(): 
+    """Configures a swap file dynamically."""
+    print_colored("Checking current swap status...", Colors.BLUE)
+    
+    # Check if swap is already enabled
+    swap_status = subprocess.getoutput("swapon --show")
+    if swap_status:
+        print_colored("Swap is already enabled. Current swap configuration:", Colors.WARNING)
+        print(swap_status)
+        modify = prompt("Do you want to modify the existing swap file? (yes/no): ").strip().lower()
+        if modify != 'yes':
+            print_colored("Swap configuration remains unchanged.", Colors.GREEN)
+            return
+        else:
+            print_colored("Disabling and removing current swap file...", Colors.WARNING)
+            run_step("sudo swapoff /swapfile", "Disabling current swap")
+            run_step("sudo rm -f /swapfile", "Removing current swap file")
+
+    # Get total RAM in MB
+    total_ram = int(subprocess.getoutput("free -m | awk '/^Mem:/{print $2}'"))
+    
+    # Set default swap size or ask user for a custom size
+    default_swap_size = max(6 * 1024, total_ram)
+    print_colored(f"Default swap size is {default_swap_size}MB (6GB or total RAM, whichever is larger).", Colors.WARNING)
+    swap_size = prompt(f"Enter swap size in MB (default: {default_swap_size}): ").strip()
+    
+    try:
+        swap_size = int(swap_size) if swap_size else default_swap_size
+    except ValueError:
+        print_colored("Invalid input. Using default swap size.", Colors.FAIL)
+        swap_size = default_swap_size
+
+    # Create and enable swap file
+    print_colored(f"Configuring a swap file of size {swap_size}MB...", Colors.BLUE)
+    run_step(f"sudo fallocate -l {swap_size}M /swapfile", "Creating swap file")
+    run_step("sudo chmod 600 /swapfile && sudo mkswap /swapfile && sudo swapon /swapfile", "Activating swap file")
+
+    # Add swap entry to /etc/fstab if not already present
+    with open("/etc/fstab", "r") as fstab:
+        if "/swapfile none swap sw 0 0" not in fstab.read():
+            with open("/etc/fstab", "a") as fstab_write:
+                fstab_write.write("/swapfile none swap sw 0 0\n")
+            print_colored("Swap file entry added to /etc/fstab.", Colors.GREEN)
+        else:
+            print_colored("Swap file entry already exists in /etc/fstab.", Colors.WARNING)
+    
+    print_colored(f"Swap file of size {swap_size}MB configured and activated.", Colors.GREEN)
+
+
+def menu(banner_art: str, install_malware_protection: Callable[[], None]) -> None:
+    """Displays the interactive main menu."""
+    require_root()
+    while True:
+        clear_screen()
+        print_banner(banner_art, title=None)
+        print_colored("Main Menu", Colors.WARNING)
+        print("1. Update System")
+        print("2. Clean Up System")
+        print("3. Manage Users")
+        print("4. Configure Firewall")
+        print("5. Install Fail2Ban")
+        print("6. Configure Swap File")
+        print("7. Install Malware Protection")
+        print("8. Exit")
+        choice = prompt("Enter your choice: ")
+
+        if choice == '1':
+            system_update()
+        elif choice == '2':
+            system_cleanup()
+        elif choice == '3':
+            manage_users()
+        elif choice == '4':
+            configure_firewall()
+        elif choice == '5':
+            setup_fail2ban()
+        elif choice == '6':
+            configure_swap()
+        elif choice == '7':
+            install_malware_protection()
+        elif choice == '8':
+            print_colored("Exiting the script. Goodbye!", Colors.GREEN)
+            break
+        else:
+            print_colored("Invalid choice. Please try again.", Colors.FAIL)
+        prompt("Press Enter to return to the menu...")
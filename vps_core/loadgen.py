@@ -0,0 +1,56 @@
+"""TCP connection-storm generator for testing the SSH rate-limit profile
+
+Run inside a network namespace by FirewallManager.test_rate_limit(), so the
+connection attempts arrive on the host's input hook from a distinct
+source address, exactly like an external flood would:
+
+    python3 -m vps_core.loadgen HOST PORT ATTEMPTS RATE
+
+Prints one JSON object: attempts made, connections completed, attempts
+that never completed (dropped by the meter) and the duration.
+"""
+
+import sys
+import json
+import time
+import socket
+import selectors
+
+def flood(host: str, port: int, attempts: int, rate: float, settle: float = 0.5) -> dict:
+    """Open `attempts` non-blocking connections at `rate` per second and count completions"""
+    sockets = []
+    interval = 1.0 / rate
+    start = time.perf_counter()
+    for i in range(attempts):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        sock.connect_ex((host, port))
+        sockets.append(sock)
+        delay = start + (i + 1) * interval - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    duration = time.perf_counter() - start
+
+    # The kernel retransmits a dropped SYN after 1s, so in a flood longer
+    # than that the early attempts are retried while it runs, and one the
+    # meter admits on the retry counts as connected, as it would for a real
+    # client. The settle stays under 1s so the last second's drops are not
+    # retried before we look
+    time.sleep(settle)
+    connected = 0
+    # select.select() can't take descriptors past FD_SETSIZE (1024)
+    with selectors.DefaultSelector() as selector:
+        for sock in sockets:
+            selector.register(sock, selectors.EVENT_WRITE)
+        for key, _ in selector.select(timeout=0):
+            if key.fileobj.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0:
+                connected += 1
+    for sock in sockets:
+        sock.close()
+
+    return {"attempts": attempts, "connected": connected, "dropped": attempts - connected,
+            "duration_s": round(duration, 3)}
+
+if __name__ == "__main__":
+    host, port, attempts, rate = sys.argv[1], int(sys.argv[2]), int(sys.argv[3]), float(sys.argv[4])
+    print(json.dumps(flood(host, port, attempts, rate)))
@@ -0,0 +1,271 @@
+"""ClamAV installation, signature updates and scan statistics"""
+
+import os
+import re
+import math
+from typing import Dict, List, Optional
+
+from .allowlist import HashAllowlist
+from .apt import AptIndex
+from .clamd import ClamdTuner
+from .common import Colors, print_colored, run_command
+from .config import ConfigManager
+from .fleet import FleetSchedule
+from .profiler import StepProfiler
+from .quarantine import QuarantineVault
+from .scan import ClamAVEngine, ScanPipeline, YaraEngine
+
+class MalwareScanner:
+    """Handle ClamAV installation and configuration"""
+    
+    @staticmethod
+    @StepProfiler.step
+    def install_clamav() -> bool:
+        """Install and configure ClamAV"""
+        print_colored("Installing ClamAV...", Colors.BLUE)
+        
+        # Stop existing services if they're running
+        services = ["clamav-freshclam", "clamav-daemon"]
+        for service in services:
+            run_command(f"systemctl stop {service}")
+        
+        # Install ClamAV and related packages
+        packages = ["clamav", "clamav-daemon", "clamav-base"]
+        code, err = AptIndex.install(packages)
+        if code != 0:
+            print_colored(f"Error installing {', '.join(packages)}: {err}", Colors.FAIL)
+            return False
+
+        # Create necessary directories with proper permissions
+        directories = [
+            "/var/log/clamav",
+            "/var/lib/clamav",
+            "/etc/clamav"
+        ]
+        
+        for directory in directories:
+            try:
+                os.makedirs(directory, mode=0o755, exist_ok=True)
+            except Exception as e:
+                print_colored(f"Error creating directory {directory}: {e}", Colors.FAIL)
+                return False
+
+        # Create and configure freshclam.conf
+        freshclam_conf = """DatabaseOwner clamav
+UpdateLogFile /var/log/clamav/freshclam.log
+LogVerbose false
+LogSyslog false
+LogFacility LOG_LOCAL6
+LogFileMaxSize 2M
+LogRotate true
+LogTime true
+Foreground false
+Debug false
+MaxAttempts 5
+DatabaseDirectory /var/lib/clamav
+DNSDatabaseInfo current.cvd.clamav.net
+ConnectTimeout 30
+ReceiveTimeout 30
+TestDatabases yes
+ScriptedUpdates yes
+CompressLocalDatabase no
+Bytecode true
+NotifyClamd /etc/clamav/clamd.conf
+# Check for new database 24 times a day
+Checks 24
+DatabaseMirror db.local.clamav.net
+DatabaseMirror database.clamav.net"""
+
+        # Write freshclam configuration
+        try:
+            ConfigManager.write('/etc/clamav/freshclam.conf', freshclam_conf)
+        except Exception as e:
+            print_colored(f"Error writing freshclam configuration: {e}", Colors.FAIL)
+            return False
+
+        # Create log files with proper permissions
+        log_files = [
+            "/var/log/clamav/freshclam.log",
+            "/var/log/clamav/clamav.log"
+        ]
+        
+        for log_file in log_files:
+            try:
+                with open(log_file, 'w') as f:
+                    pass  # Create empty file
+                os.chmod(log_file, 0o640)
+            except Exception as e:
+                print_colored(f"Error creating log file {log_file}: {e}", Colors.FAIL)
+                return False
+
+        # Set proper ownership for all ClamAV files
+        for directory in directories + ["/var/log/clamav/freshclam.log", "/var/log/clamav/clamav.log"]:
+            run_command(f"chown -R clamav:clamav {directory}")
+
+        # Stop freshclam service before updating
+        run_command("systemctl stop clamav-freshclam")
+        
+        # Initial update of virus databases
+        print_colored("Updating virus databases (this may take a while)...", Colors.BLUE)
+        code, out, err = run_command("freshclam --verbose")
+        if code != 0:
+            print_colored(f"Error updating virus databases: {err}", Colors.FAIL)
+            print_colored("This is not critical - the service will retry later.", Colors.WARNING)
+
+        # Size clamd to this host before it first loads the signatures
+        ClamdTuner.apply()
+
+        # Start services
+        for service in services:
+            run_command(f"systemctl start {service}")
+            run_command(f"systemctl enable {service}")
+
+        if not MalwareScanner.schedule_scan():
+            return False
+
+        print_colored("ClamAV installed and configured successfully!", Colors.GREEN)
+        return True
+
+    @staticmethod
+    @StepProfiler.step
+    def update_clamav() -> bool:
+        """Update ClamAV virus definitions"""
+        print_colored("Updating ClamAV definitions...", Colors.BLUE)
+        
+        code, _, err = run_command("freshclam")
+        if code != 0:
+            print_colored(f"Error updating virus definitions: {err}", Colors.FAIL)
+            return False
+        
+        print_colored("ClamAV definitions updated successfully!", Colors.GREEN)
+        return True
+
+    DATABASE_DIR = "/var/lib/clamav"
+    # Hosts start their nightly scan somewhere in [SCAN_EARLIEST, +SCAN_SPREAD minutes)
+    SCAN_EARLIEST = (0, 30)
+    SCAN_SPREAD = 360
+    SCAN_MINUTES = 60
+    SCAN_LOGS = [ScanPipeline.LOG_FILE, "/var/log/clamav/daily_scan.log", "/var/log/clamav_scan.log"]
+    SCAN_ROOTS = ["/"]
+    ENGINES = {"clamav": ClamAVEngine, "yara": YaraEngine}
+
+    @staticmethod
+    @StepProfiler.step
+    def scan(roots: Optional[List[str]] = None, use_allowlist: bool = True,
+             engines: Optional[List[str]] = None, quarantine: bool = False,
+             limits: Optional[Dict[str, int]] = None) -> Dict:
+        """
+        Scan the roots with ClamAV and, when rules and yara-python are present,
+        YARA, skipping files whose content is on the known-good allowlist.
+        With `quarantine`, detected files are moved into the vault. `limits`
+        overrides the per-file budgets in scan.LIMITS.
+        """
+        roots = roots or MalwareScanner.SCAN_ROOTS
+        if engines is None:
+            engines = ["clamav"] + (["yara"] if YaraEngine.available() else [])
+        elif "yara" in engines and not YaraEngine.available():
+            print_colored(f"YARA needs yara-python and rules in {YaraEngine.RULES_DIR}", Colors.FAIL)
+            engines = [engine for engine in engines if engine != "yara"]
+        
+        allowlist = HashAllowlist.load() if use_allowlist else None
+        vault = QuarantineVault() if quarantine else None
+        pipeline = ScanPipeline([MalwareScanner.ENGINES[name](limits=limits) for name in engines], allowlist,
+                                vault=vault, limits=limits)
+        print_colored(f"Scanning {', '.join(roots)}...", Colors.BLUE)
+        try:
+            report = pipeline.run(roots)
+        finally:
+            if allowlist is not None:
+                allowlist.close()
+        
+        stats = report["stats"]
+        print_colored(f"{stats['files']} files, {stats['allowlisted']} known-good skipped, "
+                      f"{stats['scanned']} scanned in {stats['duration_s']:.1f}s", Colors.BLUE)
+        if report["skipped"]:
+            print_colored(f"{stats['skipped']} file(s) skipped at a scan limit, listed in {ScanPipeline.LOG_FILE}",
+                          Colors.WARNING)
+        for path, engine, signature in report["hits"]:
+            print_colored(f"{path}: {signature} ({engine})", Colors.FAIL)
+        for path, result in report["quarantined"].items():
+            if "id" in result:
+                print_colored(f"Quarantined {path} as {result['id']}", Colors.WARNING)
+            else:
+                print_colored(f"Could not quarantine {path}: {result['error']}", Colors.FAIL)
+        if not report["hits"]:
+            print_colored("No threats found.", Colors.GREEN)
+        return report
+
+    @staticmethod
+    def scan_minutes() -> int:
+        """Expected length of a full scan: the last one plus a margin, in 15-minute steps"""
+        summary = MalwareScanner.last_scan_summary()
+        if not summary or not summary["seconds"]:
+            return MalwareScanner.SCAN_MINUTES
+        return max(15, math.ceil(summary["seconds"] * 1.25 / 60 / 15) * 15)
+
+    @staticmethod
+    def schedule_scan() -> bool:
+        """Install the nightly scan timer at this host's slot, replacing any 02:00 cron scan"""
+        duration = MalwareScanner.scan_minutes()
+        offset, warning = FleetSchedule.offset("scan", MalwareScanner.SCAN_SPREAD, duration)
+        if warning:
+            print_colored(warning, Colors.WARNING)
+        start = FleetSchedule.start("scan", MalwareScanner.SCAN_EARLIEST, MalwareScanner.SCAN_SPREAD, duration)
+
+        changed = FleetSchedule.write_timer("vps-manager-scan", "malware scan", "scan",
+                                            f"*-*-* {start:%H:%M}:00", nice="19", io_class="idle")
+        if not FleetSchedule.enable(["vps-manager-scan"], changed):
+            return False
+        FleetSchedule.remove_cron("clamscan -r /")
+        print_colored(f"Malware scan scheduled daily at {start:%H:%M} (slot of {duration} min)", Colors.GREEN)
+        return True
+
+    @staticmethod
+    def signature_info() -> Optional[Dict[str, float]]:
+        """Version and build time of the daily signature DB, read from its header"""
+        for name in ("daily.cld", "daily.cvd"):
+            path = os.path.join(MalwareScanner.DATABASE_DIR, name)
+            try:
+                with open(path, "rb") as f:
+                    header = f.read(512).decode("ascii", "replace")
+            except OSError:
+                continue
+            
+            # ClamAV-VDB:<date>:<version>:<sigs>:<flevel>:<md5>:<dsig>:<builder>:<stime>
+            fields = header.split(":")
+            info = {"version": 0.0, "build_time": os.path.getmtime(path)}
+            if len(fields) > 2 and fields[2].isdigit():
+                info["version"] = float(fields[2])
+            if len(fields) > 8 and fields[8].strip().split()[0].isdigit():
+                info["build_time"] = float(fields[8].strip().split()[0])
+            return info
+        
+        return None
+
+    @staticmethod
+    def last_scan_summary() -> Optional[Dict[str, float]]:
+        """Parse the summary block of the most recent clamscan log"""
+        logs = [path for path in MalwareScanner.SCAN_LOGS if os.path.exists(path)]
+        if not logs:
+            return None
+        path = max(logs, key=os.path.getmtime)
+        
+        # The summary is always at the end, so only read the tail of the log
+        with open(path, "rb") as f:
+            f.seek(max(0, os.path.getsize(path) - 4096))
+            tail = f.read().decode("utf-8", "replace")
+        if "SCAN SUMMARY" not in tail:
+            return None
+        summary = tail.rsplit("SCAN SUMMARY", 1)[1]
+        
+        def field(pattern: str) -> float:
+            match = re.search(pattern, summary)
+            return float(match.group(1)) if match else 0.0
+        
+        return {
+            "files": field(r"Scanned files: (\d+)"),
+            "infected": field(r"Infected files: (\d+)"),
+            "megabytes": field(r"Data scanned: ([\d.]+) MB"),
+            "seconds": field(r"Time: ([\d.]+) sec"),
+            "finished": os.path.getmtime(path),
+        }
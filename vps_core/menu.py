@@ -0,0 +1,116 @@
+"""Interactive main menu"""
+
+import sys
+
+from .common import Colors, clear_screen, print_banner, print_colored
+from .cleaner import SystemCleaner
+from .fail2ban import Fail2BanManager
+from .firewall import FirewallManager
+from .malware import MalwareScanner
+from .swap import SwapManager
+from .updates import SystemUpdater
+from .users import UserManager
+
+def main_menu():
+    """Display and handle the main menu"""
+    while True:
+        clear_screen()
+        print_banner()
+        
+        print_colored("Main Menu:", Colors.BLUE, bold=True)
+        print("""
+1. System Update and Configuration
+   - Update system
+   - Configure automatic updates
+2. System Cleanup
+   - Remove unused packages
+   - Clean package cache
+3. User Management
+   - Create new user
+   - List users
+   - Delete user
+   - Disable user
+4. Firewall Configuration
+   - Setup UFW
+   - Manage ports
+5. Fail2Ban Configuration
+   - Install and configure Fail2Ban
+6. Swap Management
+   - Create/modify swap file
+7. Malware Protection
+   - Install/update ClamAV
+8. Exit
+""")
+        
+        choice = input("Enter your choice (1-8): ")
+        
+        if choice == "1":
+            sub_choice = input("1. Update system\n2. Configure automatic updates\nEnter choice: ")
+            if sub_choice == "1":
+                SystemUpdater.update_system()
+            elif sub_choice == "2":
+                SystemUpdater.configure_automatic_updates()
+        
+        elif choice == "2":
+            SystemCleaner.cleanup_system()
+        
+        elif choice == "3":
+            sub_choice = input("""
+1. Create new user
+2. List users
+3. Delete user
+4. Disable user
+Enter choice: """)
+            
+            if sub_choice == "1":
+                username = input("Enter username: ")
+                use_ssh = input("Set up SSH key? (y/n): ").lower() == 'y'
+                UserManager.create_user(username, use_ssh)
+            elif sub_choice == "2":
+                users = UserManager.list_users()
+                print_colored("\nNon-system users:", Colors.GREEN)
+                for user in users:
+                    print(f"- {user}")
+            elif sub_choice == "3":
+                username = input("Enter username to delete: ")
+                remove_home = input("Remove home directory? (y/n): ").lower() == 'y'
+                UserManager.delete_user(username, remove_home)
+            elif sub_choice == "4":
+                username = input("Enter username to disable: ")
+                UserManager.disable_user(username)
+        
+        elif choice == "4":
+            sub_choice = input("1. Setup UFW\n2. Manage ports\nEnter choice: ")
+            if sub_choice == "1":
+                FirewallManager.setup_ufw()
+            elif sub_choice == "2":
+                port = int(input("Enter port number: "))
+                protocol = input("Enter protocol (tcp/udp): ")
+                action = input("Allow or deny? (a/d): ").lower()
+                FirewallManager.manage_port(port, protocol, action == 'a')
+        
+        elif choice == "5":
+            Fail2BanManager.install_fail2ban()
+        
+        elif choice == "6":
+            size = SwapManager.get_recommended_swap_size()
+            custom_size = input(f"Recommended swap size is {size}GB. Use custom size? (y/n): ")
+            if custom_size.lower() == 'y':
+                size = int(input("Enter swap size in GB: "))
+            SwapManager.create_swap(size)
+        
+        elif choice == "7":
+            sub_choice = input("1. Install ClamAV\n2. Update virus definitions\nEnter choice: ")
+            if sub_choice == "1":
+                MalwareScanner.install_clamav()
+            elif sub_choice == "2":
+                MalwareScanner.update_clamav()
+        
+        elif choice == "8":
+            print_colored("Goodbye!", Colors.GREEN)
+            sys.exit(0)
+        
+        else:
+            print_colored("Invalid choice!", Colors.FAIL)
+        
+        input("\nPress Enter to continue...")
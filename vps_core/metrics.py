@@ -0,0 +1,168 @@
+"""Prometheus/OpenMetrics exporter for security-tool health and throughput"""
+
+import os
+import json
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from .authlog import SshAuthLog
+from .common import STATE_DIR, Colors, atomic_write, print_colored
+from .fail2ban import Fail2BanManager
+from .firewall import FirewallManager
+from .malware import MalwareScanner
+from .swap import SwapManager
+
+class MetricsExporter:
+    """Collect health and throughput samples and serve them to Prometheus"""
+    
+    TEXTFILE_PATH = "/var/lib/prometheus/node-exporter/vps_manager.prom"
+    STATE_FILE = os.path.join(STATE_DIR, "metrics_state.json")
+    DEFAULT_LISTEN = "127.0.0.1:9120"
+    PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+    
+    # Previous swap counters, used to turn them into per-second rates
+    _previous: Dict[str, float] = {}
+
+    @staticmethod
+    def _escape(value: str) -> str:
+        return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    @staticmethod
+    def collect() -> List[Tuple[str, str, str, Dict[str, str], float]]:
+        """Sample every subsystem; each sample is (name, type, help, labels, value)"""
+        now = time.time()
+        samples = []
+        
+        def add(name: str, kind: str, help_text: str, value: float, **labels: str) -> None:
+            samples.append((f"vps_{name}", kind, help_text, labels, value))
+        
+        def fail2ban() -> None:
+            for jail, stats in Fail2BanManager.ban_stats().items():
+                add("fail2ban_active_bans", "gauge", "Addresses currently banned", stats["active"], jail=jail)
+                add("fail2ban_bans_total", "counter", "Bans recorded in the fail2ban database", stats["total"], jail=jail)
+                add("fail2ban_bans_per_second", "gauge", "Ban rate over the last 5 minutes", stats["rate"], jail=jail)
+        
+        def clamav() -> None:
+            info = MalwareScanner.signature_info()
+            if info:
+                add("clamav_signature_version", "gauge", "Daily signature DB version", info["version"])
+                add("clamav_signature_age_seconds", "gauge", "Age of the daily signature DB", now - info["build_time"])
+            scan = MalwareScanner.last_scan_summary()
+            if scan:
+                add("clamav_last_scan_age_seconds", "gauge", "Time since the last scan finished", now - scan["finished"])
+                add("clamav_last_scan_files", "gauge", "Files scanned by the last scan", scan["files"])
+                add("clamav_last_scan_infected_files", "gauge", "Infected files found by the last scan", scan["infected"])
+                if scan["seconds"]:
+                    add("clamav_scan_files_per_second", "gauge", "Last scan throughput in files", scan["files"] / scan["seconds"])
+                    add("clamav_scan_megabytes_per_second", "gauge", "Last scan throughput in MB", scan["megabytes"] / scan["seconds"])
+        
+        def swap() -> None:
+            stats = SwapManager.swap_stats()
+            add("swap_total_bytes", "gauge", "Configured swap", stats["total_bytes"])
+            add("swap_used_bytes", "gauge", "Swap in use", stats["used_bytes"])
+            for direction in ("in", "out"):
+                pages = stats[f"pages_{direction}"]
+                add(f"swap_{direction}_bytes_total", "counter", f"Bytes swapped {direction}", pages * MetricsExporter.PAGE_SIZE)
+                previous = MetricsExporter._previous
+                if "time" in previous and now > previous["time"]:
+                    rate = (pages - previous[f"pages_{direction}"]) * MetricsExporter.PAGE_SIZE / (now - previous["time"])
+                    add(f"swap_{direction}_bytes_per_second", "gauge", f"Swap-{direction} rate since the last sample", max(0.0, rate))
+            MetricsExporter._previous = {"time": now, "pages_in": stats["pages_in"], "pages_out": stats["pages_out"]}
+        
+        def firewall() -> None:
+            stats = FirewallManager.rule_stats()
+            add("ufw_enabled", "gauge", "Whether UFW is enabled", 1 if stats["enabled"] else 0)
+            for family, count in stats["rules"].items():
+                add("ufw_rules", "gauge", "UFW user rules", count, family=family)
+        
+        def sshd() -> None:
+            for event, count in SshAuthLog.ingest().items():
+                add("sshd_auth_events_total", "counter", "sshd authentication events read from the journal", count, event=event)
+        
+        collectors = [("fail2ban", fail2ban), ("clamav", clamav), ("swap", swap), ("ufw", firewall), ("sshd", sshd)]
+        for name, collector in collectors:
+            start = time.perf_counter()
+            try:
+                collector()
+                up = 1
+            except Exception as e:
+                logging.warning(f"Metrics collector {name} failed: {e}")
+                up = 0
+            add("collector_up", "gauge", "Whether the collector sampled successfully", up, collector=name)
+            add("collector_duration_seconds", "gauge", "Time spent sampling", time.perf_counter() - start, collector=name)
+        
+        return samples
+
+    @staticmethod
+    def render(samples: List[Tuple[str, str, str, Dict[str, str], float]]) -> str:
+        """Render samples in the Prometheus text exposition format"""
+        lines = []
+        described = set()
+        for name, kind, help_text, labels, value in sorted(samples, key=lambda s: s[0]):
+            if name not in described:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                described.add(name)
+            label_str = ",".join(f'{key}="{MetricsExporter._escape(str(val))}"' for key, val in sorted(labels.items()))
+            lines.append(f"{name}{{{label_str}}} {value:g}" if label_str else f"{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def write_textfile(path: Optional[str] = None) -> str:
+        """Write one sample for node_exporter's textfile collector, atomically"""
+        path = path or MetricsExporter.TEXTFILE_PATH
+        
+        # Keep swap counters across cron invocations so rates survive restarts
+        try:
+            with open(MetricsExporter.STATE_FILE) as f:
+                MetricsExporter._previous = json.load(f)
+        except (OSError, ValueError):
+            pass
+        
+        content = MetricsExporter.render(MetricsExporter.collect())
+        
+        # node_exporter must never see a half-written file; durability doesn't matter here
+        atomic_write(path, content, durable=False)
+        
+        try:
+            os.makedirs(os.path.dirname(MetricsExporter.STATE_FILE), exist_ok=True)
+            with open(MetricsExporter.STATE_FILE, "w") as f:
+                json.dump(MetricsExporter._previous, f)
+        except OSError as e:
+            logging.warning(f"Could not persist metrics state: {e}")
+        
+        return path
+
+    @staticmethod
+    def serve(listen: Optional[str] = None) -> None:
+        """Serve /metrics over HTTP, sampling on every scrape"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        
+        host, port = (listen or MetricsExporter.DEFAULT_LISTEN).rsplit(":", 1)
+        lock = threading.Lock()
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                # Serialise scrapes so swap rates are computed between consecutive samples
+                with lock:
+                    body = MetricsExporter.render(MetricsExporter.collect()).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+        
+        server = ThreadingHTTPServer((host.strip("[]"), int(port)), Handler)
+        print_colored(f"Serving metrics on http://{host}:{port}/metrics", Colors.GREEN)
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
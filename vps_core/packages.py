@@ -0,0 +1,84 @@
+"""Native dpkg status parser
+
+Answers installed/version/held queries from /var/lib/dpkg/status directly
+instead of spawning `dpkg -l` or `dpkg-query`, which format the whole
+package database on every call.
+"""
+
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+class PackageState:
+    """Indexed view of the dpkg status database, re-read only when it changes"""
+
+    STATUS_FILE = "/var/lib/dpkg/status"
+
+    _index: Dict[str, Dict[str, str]] = {}
+    _stamp: Optional[Tuple[int, int]] = None
+
+    @staticmethod
+    def _parse(data: str) -> Dict[str, Dict[str, str]]:
+        """Pull the fields we need out of each stanza, skipping everything else"""
+        index: Dict[str, Dict[str, str]] = {}
+        for stanza in data.split("\n\n"):
+            fields = {}
+            for line in stanza.split("\n"):
+                # Continuation lines (descriptions, conffiles) start with a space
+                if line[:1] in ("P", "S", "V", "A"):
+                    key, _, value = line.partition(": ")
+                    if key in ("Package", "Status", "Version", "Architecture"):
+                        fields[key] = value
+            name = fields.get("Package")
+            if not name:
+                continue
+            # Status is "<want> <flag> <state>", e.g. "hold ok installed"
+            status = fields.get("Status", "unknown ok not-installed").split()
+            want, state = status[0], status[-1]
+            entry = {
+                "want": want,
+                "state": state,
+                "version": fields.get("Version", ""),
+                "arch": fields.get("Architecture", ""),
+            }
+            # Multi-arch packages appear once per architecture; index both ways
+            index[f"{name}:{entry['arch']}"] = entry
+            if name not in index or entry["state"] == "installed":
+                index[name] = entry
+        return index
+
+    @staticmethod
+    def index() -> Dict[str, Dict[str, str]]:
+        """Return the package index, re-parsing only if the status file changed"""
+        st = os.stat(PackageState.STATUS_FILE)
+        stamp = (st.st_mtime_ns, st.st_size)
+        if stamp != PackageState._stamp:
+            with open(PackageState.STATUS_FILE, encoding="utf-8", errors="replace") as f:
+                PackageState._index = PackageState._parse(f.read())
+            PackageState._stamp = stamp
+        return PackageState._index
+
+    @staticmethod
+    def is_installed(package: str) -> bool:
+        entry = PackageState.index().get(package)
+        return entry is not None and entry["state"] == "installed"
+
+    @staticmethod
+    def version(package: str) -> Optional[str]:
+        """Installed version, or None when the package is not installed"""
+        return PackageState.index()[package]["version"] if PackageState.is_installed(package) else None
+
+    @staticmethod
+    def is_held(package: str) -> bool:
+        entry = PackageState.index().get(package)
+        return entry is not None and entry["want"] == "hold"
+
+    @staticmethod
+    def installed_matching(prefix: str) -> List[str]:
+        """Installed package names starting with a prefix (e.g. every clamav* package)"""
+        return sorted(name for name, entry in PackageState.index().items()
+                      if ":" not in name and name.startswith(prefix) and entry["state"] == "installed")
+
+    @staticmethod
+    def missing(packages: Iterable[str]) -> List[str]:
+        """The subset of packages that still needs installing"""
+        return [package for package in packages if not PackageState.is_installed(package)]
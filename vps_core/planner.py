@@ -0,0 +1,170 @@
+"""Dry-run plans with cost estimates from past runs
+
+Every run leaves a profile (see StepProfiler) recording each step's wall
+time, bytes written, network traffic and the commands it ran, including
+the systemctl restarts and reloads. The planner reads those profiles
+back, prefers runs from hosts of the same class, and turns them into an
+estimate per step: how long it takes, how much it writes and downloads,
+and which services it restarts for how long. Nothing is executed.
+"""
+
+import os
+import re
+import glob
+import json
+import statistics
+from typing import Dict, List, Optional, Tuple
+
+from .common import Colors, print_colored
+from .journal import PROVISION_STEPS, ProvisioningJournal
+from .profiler import StepProfiler
+
+MB = 1024 ** 2
+
+class OperationPlanner:
+    """Estimate what a set of steps will cost from recorded run history"""
+
+    HISTORY_RUNS = 50
+    SERVICE_COMMAND = re.compile(r"^systemctl (restart|reload|start|stop) (\S+?)(?:\.service)?$")
+    REBOOT_COMMAND = re.compile(r"^shutdown -r")
+    # Downtime assumed for a reboot when no boot time is known
+    REBOOT_S = 60.0
+
+    def __init__(self, profile_dir: Optional[str] = None):
+        self.profile_dir = profile_dir or StepProfiler.PROFILE_DIR
+        # step name -> samples: {"wall_s", "bytes_written", "net_bytes", "actions": {service: (action, wall_s)}}
+        self.samples: Dict[str, List[Dict]] = {}
+        here = StepProfiler.host_class()
+        self.host_class = (here["cpus"], here["memory_gb"])
+        self._load()
+
+    def _same_class(self, host: Dict) -> bool:
+        return (host.get("cpus"), host.get("memory_gb")) == self.host_class
+
+    def _load(self) -> None:
+        paths = sorted(glob.glob(os.path.join(self.profile_dir, "run-*.json")))[-self.HISTORY_RUNS:]
+        alike: Dict[str, List[Dict]] = {}
+        other: Dict[str, List[Dict]] = {}
+        for path in paths:
+            try:
+                with open(path) as f:
+                    profile = json.load(f)
+            except (OSError, ValueError):
+                continue
+            target = alike if self._same_class(profile.get("host", {})) else other
+            for step in profile.get("steps", []):
+                self._collect(step, target)
+        # Runs on a host like this one are the better predictor; others only fill gaps
+        self.samples = {name: alike.get(name) or other[name] for name in set(alike) | set(other)}
+
+    def _collect(self, node: Dict, samples: Dict[str, List[Dict]]) -> None:
+        if node["kind"] != "step":
+            return
+        actions: Dict[str, Tuple[str, float]] = {}
+        self._actions(node, actions)
+        samples.setdefault(node["name"], []).append({
+            "wall_s": node["wall_s"],
+            "bytes_written": node["bytes_written"],
+            "net_bytes": node.get("net_bytes", 0),
+            "failed": bool(node["exit_code"]),
+            "actions": actions,
+        })
+        for child in node["children"]:
+            self._collect(child, samples)
+
+    def _actions(self, node: Dict, actions: Dict[str, Tuple[str, float]]) -> None:
+        """Service actions anywhere under a step, keeping the most disruptive per service"""
+        for child in node["children"]:
+            if child["kind"] == "step":
+                self._actions(child, actions)
+                continue
+            match = self.SERVICE_COMMAND.match(child["name"])
+            if match:
+                action, service = match.groups()
+                previous = actions.get(service)
+                if previous is None or (previous[0] == "reload" and action != "reload"):
+                    actions[service] = (action, child["wall_s"])
+            elif self.REBOOT_COMMAND.match(child["name"]):
+                actions["(reboot)"] = ("reboot", self.REBOOT_S)
+
+    def estimate(self, step: str) -> Dict:
+        """Median cost of a step over its recorded runs, and the services it touched"""
+        samples = [sample for sample in self.samples.get(step, []) if not sample["failed"]] or self.samples.get(step, [])
+        if not samples:
+            return {"step": step, "runs": 0}
+
+        services: Dict[str, Dict] = {}
+        for sample in samples:
+            for service, (action, wall) in sample["actions"].items():
+                entry = services.setdefault(service, {"action": action, "runs": 0, "durations": []})
+                entry["runs"] += 1
+                entry["durations"].append(wall)
+                if entry["action"] == "reload" and action != "reload":
+                    entry["action"] = action
+        for entry in services.values():
+            # A reload keeps serving and a start finds the service down already;
+            # a restart or stop is down for as long as systemctl waits
+            durations = entry.pop("durations")
+            entry["downtime_s"] = 0.0 if entry["action"] in ("reload", "start") else statistics.median(durations)
+
+        walls = sorted(sample["wall_s"] for sample in samples)
+        return {
+            "step": step,
+            "runs": len(samples),
+            "duration_s": statistics.median(walls),
+            "duration_max_s": walls[-1],
+            "bytes_written": int(statistics.median(sample["bytes_written"] for sample in samples)),
+            "net_bytes": int(statistics.median(sample["net_bytes"] for sample in samples)),
+            "services": services,
+            "downtime_s": sum(entry["downtime_s"] for entry in services.values()),
+        }
+
+    def plan(self, steps: List[str]) -> Dict:
+        """Estimates for each step in order, plus totals"""
+        journal = ProvisioningJournal()
+        durations = {f"{cls}.{method}": journal.entries[name]["duration_s"]
+                     for name, _, cls, method in PROVISION_STEPS if name in journal.entries}
+        estimates = []
+        for step in steps:
+            estimate = self.estimate(step)
+            # The journal keeps the last duration of provisioning steps even without profiles
+            if not estimate["runs"] and step in durations:
+                estimate.update(runs=1, duration_s=durations[step], duration_max_s=durations[step],
+                                bytes_written=0, net_bytes=0, services={}, downtime_s=0.0)
+            estimates.append(estimate)
+        known = [estimate for estimate in estimates if estimate["runs"]]
+        return {
+            "steps": estimates,
+            "total": {
+                "duration_s": sum(estimate["duration_s"] for estimate in known),
+                "bytes_written": sum(estimate["bytes_written"] for estimate in known),
+                "net_bytes": sum(estimate["net_bytes"] for estimate in known),
+                "downtime_s": sum(estimate["downtime_s"] for estimate in known),
+                "unknown_steps": [estimate["step"] for estimate in estimates if not estimate["runs"]],
+            },
+        }
+
+    @staticmethod
+    def print_plan(plan: Dict) -> None:
+        print_colored(f"{'step':<40} {'time':>9} {'written':>10} {'network':>10}  restarts", Colors.HEADER, bold=True)
+        for estimate in plan["steps"]:
+            if not estimate["runs"]:
+                print_colored(f"{estimate['step']:<40} {'?':>9} {'?':>10} {'?':>10}  no recorded runs", Colors.WARNING)
+                continue
+            services = ", ".join(
+                f"{service} ({entry['action']}" + (f" {entry['downtime_s']:.1f}s" if entry["downtime_s"] else "")
+                + (f", {entry['runs']}/{estimate['runs']} runs" if entry["runs"] < estimate["runs"] else "") + ")"
+                for service, entry in sorted(estimate["services"].items())
+            ) or "-"
+            color = Colors.WARNING if estimate["downtime_s"] else Colors.BLUE
+            print_colored(f"{estimate['step']:<40} {estimate['duration_s']:>8.1f}s "
+                          f"{estimate['bytes_written'] / MB:>8.1f}MB {estimate['net_bytes'] / MB:>8.1f}MB  {services}", color)
+
+        total = plan["total"]
+        print_colored(f"\nEstimated {total['duration_s']:.0f}s, {total['bytes_written'] / MB:.0f} MB written, "
+                      f"{total['net_bytes'] / MB:.0f} MB network, {total['downtime_s']:.1f}s of service downtime",
+                      Colors.GREEN, bold=True)
+        if total["unknown_steps"]:
+            print_colored(f"No history for {', '.join(total['unknown_steps'])}; their cost is not included",
+                          Colors.WARNING)
+        print_colored("Nothing was executed.", Colors.BLUE)
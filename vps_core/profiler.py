@@ -0,0 +1,236 @@
+"""Per-step timing and resource accounting for manager operations"""
+
+import os
+import sys
+import json
+import time
+import socket
+import logging
+import functools
+import contextlib
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from .common import LOG_DIR, Colors, print_colored
+
+class StepProfiler:
+    """Time steps and the commands they run, and save the run profile"""
+    
+    PROFILE_DIR = os.path.join(LOG_DIR, "profiles")
+    # Runs kept in PROFILE_DIR; the daily timers each add one. The planner
+    # reads the newest OperationPlanner.HISTORY_RUNS of them
+    KEEP_PROFILES = 200
+    
+    # The main thread's running steps; pool threads keep their own in _local
+    # and otherwise account to the main thread's innermost step
+    _stack: List[Dict] = []
+    _steps: List[Dict] = []
+    _local = threading.local()
+    # Guards appends to children/_steps and the roll-up sums across threads
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _new_node(name: str, kind: str) -> Dict:
+        return {
+            "name": name,
+            "kind": kind,
+            "wall_s": 0.0,
+            "child_cpu_s": 0.0,
+            "self_cpu_s": 0.0,
+            "peak_rss_kb": 0,
+            "bytes_written": 0,
+            "net_bytes": 0,
+            "exit_code": None,
+            "children": [],
+        }
+
+    @staticmethod
+    def _net_bytes() -> int:
+        """Bytes received plus sent on every interface but loopback, host-wide"""
+        total = 0
+        try:
+            with open("/proc/net/dev") as f:
+                for line in f.readlines()[2:]:
+                    interface, _, counters = line.partition(":")
+                    if interface.strip() != "lo":
+                        fields = counters.split()
+                        total += int(fields[0]) + int(fields[8])
+        except (OSError, ValueError, IndexError):
+            pass
+        return total
+
+    @staticmethod
+    def _own_stack() -> List[Dict]:
+        if threading.current_thread() is threading.main_thread():
+            return StepProfiler._stack
+        if not hasattr(StepProfiler._local, "stack"):
+            StepProfiler._local.stack = []
+        return StepProfiler._local.stack
+
+    @staticmethod
+    def _current() -> Optional[Dict]:
+        """This thread's innermost running step, else the main thread's"""
+        stack = StepProfiler._own_stack()
+        if stack:
+            return stack[-1]
+        return StepProfiler._stack[-1] if StepProfiler._stack else None
+
+    @staticmethod
+    def step(func):
+        """Decorator recording a manager method as a profiled step"""
+        name = func.__qualname__
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            node = StepProfiler._new_node(name, "step")
+            parent = StepProfiler._current()
+            with StepProfiler._lock:
+                (parent["children"] if parent else StepProfiler._steps).append(node)
+            stack = StepProfiler._own_stack()
+            stack.append(node)
+            
+            start = time.perf_counter()
+            cpu_start = time.process_time()
+            net_start = StepProfiler._net_bytes()
+            # A step "fails" when it returns False or raises
+            failed = True
+            try:
+                result = func(*args, **kwargs)
+                failed = result is False
+                return result
+            finally:
+                stack.pop()
+                node["wall_s"] = time.perf_counter() - start
+                node["self_cpu_s"] = time.process_time() - cpu_start
+                # Measured around the whole step, so children are already included
+                node["net_bytes"] = StepProfiler._net_bytes() - net_start
+                node["exit_code"] = 1 if failed else 0
+                if parent:
+                    with StepProfiler._lock:
+                        StepProfiler._roll_up(parent, node)
+                logging.info(
+                    f"Step {name} finished in {node['wall_s']:.2f}s "
+                    f"(cpu {node['child_cpu_s'] + node['self_cpu_s']:.2f}s, "
+                    f"peak rss {node['peak_rss_kb']} KB, written {node['bytes_written']} B, "
+                    f"exit {node['exit_code']})"
+                )
+        
+        return wrapper
+
+    @staticmethod
+    def _roll_up(parent: Dict, child: Dict) -> None:
+        """Fold a finished child's resource usage into its parent step"""
+        parent["child_cpu_s"] += child["child_cpu_s"]
+        parent["bytes_written"] += child["bytes_written"]
+        parent["peak_rss_kb"] = max(parent["peak_rss_kb"], child["peak_rss_kb"])
+
+    @staticmethod
+    def record_command(command: str, wall: float, usage: Optional[Any], exit_code: int) -> None:
+        """Attach a finished command to the innermost running step"""
+        parent = StepProfiler._current()
+        if parent is None:
+            return
+        
+        node = StepProfiler._new_node(command, "command")
+        node["wall_s"] = wall
+        node["exit_code"] = exit_code
+        if usage is not None:
+            node["child_cpu_s"] = usage.ru_utime + usage.ru_stime
+            node["peak_rss_kb"] = usage.ru_maxrss
+            # ru_oublock is filled from block-layer write accounting in 512-byte units
+            node["bytes_written"] = usage.ru_oublock * 512
+        
+        with StepProfiler._lock:
+            parent["children"].append(node)
+            StepProfiler._roll_up(parent, node)
+
+    @staticmethod
+    def host_class() -> Dict:
+        """Describe the machine so profiles can be grouped by host class"""
+        import psutil
+        
+        return {
+            "hostname": socket.gethostname(),
+            "kernel": os.uname().release,
+            "cpus": os.cpu_count(),
+            "memory_gb": round(psutil.virtual_memory().total / (1024 ** 3), 1),
+        }
+
+    @staticmethod
+    def _folded(node: Dict, prefix: str, lines: List[str]) -> None:
+        """Emit collapsed-stack lines (flamegraph.pl input) in microseconds"""
+        frame = node["name"].replace(";", ",").replace(" ", "_")
+        path = f"{prefix};{frame}" if prefix else frame
+        own = node["wall_s"] - sum(child["wall_s"] for child in node["children"])
+        if own > 0:
+            lines.append(f"{path} {int(own * 1_000_000)}")
+        for child in node["children"]:
+            StepProfiler._folded(child, path, lines)
+
+    @staticmethod
+    def print_summary() -> None:
+        """Print a flame-style bar summary of where the run spent its time"""
+        total = sum(step["wall_s"] for step in StepProfiler._steps) or 1.0
+        print_colored("\nRun profile (wall time share):", Colors.HEADER, bold=True)
+        
+        def show(node: Dict, depth: int) -> None:
+            share = node["wall_s"] / total
+            bar = "#" * max(1, int(share * 40))
+            color = Colors.FAIL if node["exit_code"] else Colors.BLUE
+            print_colored(f"{'  ' * depth}{bar:<40} {share:6.1%} {node['wall_s']:8.2f}s  {node['name']}", color)
+            for child in sorted(node["children"], key=lambda c: c["wall_s"], reverse=True):
+                show(child, depth + 1)
+        
+        for step in sorted(StepProfiler._steps, key=lambda s: s["wall_s"], reverse=True):
+            show(step, 0)
+
+    @staticmethod
+    def _prune(directory: str, keep: int) -> None:
+        """Delete all but the newest `keep` run profiles and their .folded files"""
+        runs = sorted(name for name in os.listdir(directory) if name.startswith("run-") and name.endswith(".json"))
+        for name in runs[:-keep]:
+            for path in (name, f"{os.path.splitext(name)[0]}.folded"):
+                try:
+                    os.remove(os.path.join(directory, path))
+                except FileNotFoundError:
+                    pass
+
+    @staticmethod
+    def write_profile(path: Optional[str] = None) -> Optional[str]:
+        """Write the run profile as JSON plus a .folded flame graph input file"""
+        if not StepProfiler._steps:
+            return None
+        
+        profile = {
+            "version": 1,
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "host": StepProfiler.host_class(),
+            "total_wall_s": sum(step["wall_s"] for step in StepProfiler._steps),
+            "steps": StepProfiler._steps,
+        }
+        lines: List[str] = []
+        for step in StepProfiler._steps:
+            StepProfiler._folded(step, "", lines)
+        
+        # Runs at exit, also for unprivileged commands (e.g. reclaim --dry-run)
+        # that can't write the log directory; a lost profile is not an error
+        try:
+            if path is None:
+                os.makedirs(StepProfiler.PROFILE_DIR, exist_ok=True)
+                stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+                path = os.path.join(StepProfiler.PROFILE_DIR, f"run-{stamp}.json")
+                StepProfiler._prune(StepProfiler.PROFILE_DIR, StepProfiler.KEEP_PROFILES - 1)
+            with open(path, "w") as f:
+                json.dump(profile, f, indent=2)
+            with open(os.path.splitext(path)[0] + ".folded", "w") as f:
+                f.write("\n".join(lines) + "\n")
+        except OSError as e:
+            logging.warning(f"Could not save the run profile: {e}")
+            return None
+        
+        # Runs after the command's own output, which may be JSON meant for a pipe
+        with contextlib.redirect_stdout(sys.stderr):
+            StepProfiler.print_summary()
+            print_colored(f"Run profile saved to {path}", Colors.GREEN)
+        return path
@@ -0,0 +1,182 @@
+"""Quarantine vault for scan detections
+
+Detected files are moved into a root-only vault next to a JSON record of
+where they came from (path, owner, mode, times, hash, detections), so
+they can be restored exactly or purged later. The record is written,
+marked pending, before the file is moved, so an interrupted move is
+still listed and can be restored. A rename is used when the
+file lives on the vault's filesystem; otherwise the file is streamed into
+the vault, hashed on the way, synced, and only then unlinked.
+"""
+
+import os
+import json
+import time
+import socket
+import hashlib
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from .common import STATE_DIR, Colors, atomic_write, print_colored
+
+class QuarantineVault:
+    """Move detected files aside with enough metadata to put them back"""
+
+    VAULT_DIR = os.path.join(STATE_DIR, "quarantine")
+    CHUNK = 1024 * 1024
+    WORKERS = 4
+
+    def __init__(self, vault_dir: Optional[str] = None):
+        self.vault_dir = vault_dir or QuarantineVault.VAULT_DIR
+        os.makedirs(self.vault_dir, mode=0o700, exist_ok=True)
+        self.device = os.stat(self.vault_dir).st_dev
+
+    def _blob(self, item_id: str) -> str:
+        return os.path.join(self.vault_dir, f"{item_id}.bin")
+
+    def _record(self, item_id: str) -> str:
+        return os.path.join(self.vault_dir, f"{item_id}.json")
+
+    @staticmethod
+    def _hash(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb", buffering=0) as f:
+            while True:
+                chunk = f.read(QuarantineVault.CHUNK)
+                if not chunk:
+                    break
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _copy(source: str, target: str) -> str:
+        """Stream a file to a new path, fsync it and return the hash of what was written"""
+        digest = hashlib.sha256()
+        fd = os.open(target, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        try:
+            with open(source, "rb", buffering=0) as src, os.fdopen(fd, "wb", closefd=False) as dst:
+                while True:
+                    chunk = src.read(QuarantineVault.CHUNK)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    dst.write(chunk)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        return digest.hexdigest()
+
+    def _move(self, source: str, target: str, source_device: int) -> Tuple[str, str]:
+        """Move a file, by rename when it stays on one filesystem; return (method, sha256)"""
+        target_device = os.stat(os.path.dirname(target)).st_dev
+        if source_device == target_device:
+            os.rename(source, target)
+            return "rename", QuarantineVault._hash(target)
+        try:
+            sha256 = QuarantineVault._copy(source, target)
+        except BaseException:
+            if os.path.exists(target):
+                os.remove(target)
+            raise
+        os.remove(source)
+        return "copy", sha256
+
+    def quarantine(self, path: str, detections: List[Tuple[str, str]]) -> str:
+        """Move one file into the vault; detections are (engine, signature) pairs"""
+        st = os.lstat(path)
+        item_id = f"{time.time_ns()}-{hashlib.sha256(path.encode(errors='surrogateescape')).hexdigest()[:12]}"
+        blob = self._blob(item_id)
+        record = {
+            "id": item_id,
+            "host": socket.gethostname(),
+            "path": path,
+            "size": st.st_size,
+            "mode": st.st_mode & 0o7777,
+            "uid": st.st_uid,
+            "gid": st.st_gid,
+            "mtime_ns": st.st_mtime_ns,
+            "sha256": None,
+            "method": None,
+            "status": "pending",
+            "detections": [list(detection) for detection in detections],
+            "quarantined_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        # The record goes first, so a crash mid-move leaves a listed,
+        # restorable item rather than a blob nobody knows the origin of
+        atomic_write(self._record(item_id), json.dumps(record, indent=2), 0o600)
+        try:
+            record["method"], record["sha256"] = self._move(path, blob, st.st_dev)
+        except BaseException:
+            os.remove(self._record(item_id))
+            raise
+        # Nothing in the vault is readable or executable by anyone but root
+        os.chmod(blob, 0o000)
+        record["status"] = "quarantined"
+        atomic_write(self._record(item_id), json.dumps(record, indent=2), 0o600)
+        return item_id
+
+    def annotate(self, item_id: str, detections: List[Tuple[str, str]]) -> None:
+        """Replace an item's detections, e.g. once every engine has reported"""
+        record = self.get(item_id)
+        record["detections"] = [list(detection) for detection in detections]
+        atomic_write(self._record(item_id), json.dumps(record, indent=2), 0o600)
+
+    def get(self, item_id: str) -> Dict:
+        with open(self._record(item_id)) as f:
+            return json.load(f)
+
+    def items(self) -> List[Dict]:
+        records = []
+        for name in sorted(os.listdir(self.vault_dir)):
+            if name.endswith(".json"):
+                try:
+                    records.append(self.get(name[:-len(".json")]))
+                except (OSError, ValueError):
+                    continue
+        return records
+
+    def restore(self, item_id: str, force: bool = False) -> bool:
+        """Put a file back where it was found, with its original owner, mode and mtime"""
+        record = self.get(item_id)
+        path = record["path"]
+        blob = self._blob(item_id)
+        if record.get("status") == "pending" and os.path.lexists(path):
+            # Interrupted before the source was removed: the file never left
+            # its place, and a blob, if any, is an incomplete copy
+            for leftover in (blob, self._record(item_id)):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+            print_colored(f"{path} was never moved into the vault; dropped its record", Colors.WARNING)
+            return True
+        if os.path.lexists(path) and not force:
+            print_colored(f"{path} exists; not overwriting it without --force", Colors.FAIL)
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        os.chmod(blob, 0o600)
+        if os.path.lexists(path):
+            os.remove(path)
+        _, sha256 = self._move(blob, path, os.stat(blob).st_dev)
+        if record["sha256"] is not None and sha256 != record["sha256"]:
+            print_colored(f"Warning: {path} restored but its hash differs from the quarantined copy", Colors.WARNING)
+        os.chown(path, record["uid"], record["gid"])
+        os.chmod(path, record["mode"])
+        os.utime(path, ns=(record["mtime_ns"], record["mtime_ns"]))
+        os.remove(self._record(item_id))
+        print_colored(f"Restored {path}", Colors.GREEN)
+        return True
+
+    def purge(self, item_ids: Optional[List[str]] = None, older_than_days: Optional[float] = None) -> int:
+        """Delete vault items by id and/or age; return how many were deleted"""
+        cutoff = time.time() - older_than_days * 86400 if older_than_days is not None else None
+        purged = 0
+        for record in self.items():
+            if item_ids is not None and record["id"] not in item_ids:
+                continue
+            if cutoff is not None and datetime.fromisoformat(record["quarantined_at"]).timestamp() > cutoff:
+                continue
+            for path in (self._blob(record["id"]), self._record(record["id"])):
+                if os.path.exists(path):
+                    os.remove(path)
+            purged += 1
+        return purged
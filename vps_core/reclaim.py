@@ -0,0 +1,251 @@
+"""Disk reclaim beyond apt's caches
+
+Disk pressure on a long-lived VPS mostly comes from archived journals,
+kernels nobody boots any more, rotated logs that were never compressed,
+core dumps and stale container images. One walk over the directories
+these live in (never the whole disk) builds a size index per category,
+a directory per task on a thread pool; reclaimable bytes are worked out
+from the index under a policy, and only then is anything deleted.
+"""
+
+import os
+import re
+import gzip
+import json
+import stat
+import time
+import shutil
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from .common import Colors, print_colored, run_command
+from .packages import PackageState
+from .profiler import StepProfiler
+from .update_pipeline import UpdatePipeline
+
+# (path, bytes on disk, mtime, tag); the tag is the kernel release for "kernels"
+Candidate = Tuple[str, int, float, str]
+
+MB = 1024 ** 2
+
+class DiskReclaimer:
+    """Index reclaimable files by category and reclaim them under a policy"""
+
+    ROOTS = ["/var/log", "/var/crash", "/var/lib/systemd/coredump", "/boot", "/lib/modules", "/var/cache/apt/archives"]
+    CATEGORIES = ["journal", "kernels", "rotated_logs", "core_dumps", "apt_cache", "containers"]
+    WORKERS = min(8, (os.cpu_count() or 1) * 2)
+    POLICY = {
+        "journal_keep_mb": 200,         # archived journals are vacuumed down to this total
+        "kernels_keep": 1,              # newest kernels kept besides the running one
+        "log_min_age_days": 1,          # rotated logs younger than this are left for logrotate
+        "core_max_age_days": 3,
+        "container_max_age_hours": 168, # unused images and build cache older than this
+    }
+    # Text logs shrink by about this much under gzip
+    COMPRESSED_RATIO = 0.1
+    # logrotate's delaycompress leaves ".1" uncompressed on purpose; only older generations count
+    ROTATED = re.compile(r"(\.([2-9]|\d{2,})|[.-]\d{8}(\d{2})?)$")
+    COMPRESSED = (".gz", ".xz", ".zst", ".bz2", ".lz4")
+    DOCKER_SIZE = re.compile(r"([\d.]+)\s*([kMGT]?B)")
+    DOCKER_UNITS = {"B": 1, "kB": 1000, "MB": 1000 ** 2, "GB": 1000 ** 3, "TB": 1000 ** 4}
+
+    def __init__(self, policy: Optional[Dict[str, int]] = None):
+        self.policy = dict(DiskReclaimer.POLICY, **(policy or {}))
+        self.index: Dict[str, List[Candidate]] = {category: [] for category in DiskReclaimer.CATEGORIES}
+        self.journal_bytes = 0
+        self.container_bytes = 0
+        self.stats = {"dirs": 0, "files": 0, "errors": 0}
+
+    @staticmethod
+    def _classify(path: str, name: str) -> Optional[Tuple[str, str]]:
+        if path.startswith("/var/log/journal/"):
+            # Only archived (rotated) journal files; the active one is in use
+            return ("journal", "archived") if "@" in name else ("journal", "active")
+        if path.startswith("/var/log/"):
+            if not name.endswith(DiskReclaimer.COMPRESSED) and DiskReclaimer.ROTATED.search(name):
+                return "rotated_logs", ""
+            return None
+        if path.startswith(("/var/crash/", "/var/lib/systemd/coredump/")):
+            return "core_dumps", ""
+        if path.startswith("/lib/modules/"):
+            return "kernels", path.split("/")[3]
+        if path.startswith("/boot/"):
+            match = re.match(r"(?:vmlinuz|initrd\.img|System\.map|config)-(.+)$", name)
+            return ("kernels", match.group(1)) if match else None
+        if path.startswith("/var/cache/apt/archives/") and name.endswith(".deb"):
+            return "apt_cache", ""
+        return None
+
+    def _scan_dir(self, path: str) -> Tuple[List[Tuple[str, Candidate]], List[str], int]:
+        """List one directory: (classified files, subdirectories, errors)"""
+        files, subdirs = [], []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        st = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    if stat.S_ISDIR(st.st_mode):
+                        subdirs.append(entry.path)
+                    elif stat.S_ISREG(st.st_mode):
+                        category = DiskReclaimer._classify(entry.path, entry.name)
+                        if category:
+                            files.append((category[0], (entry.path, st.st_blocks * 512, st.st_mtime, category[1])))
+        except OSError:
+            return [], [], 1
+        return files, subdirs, 0
+
+    def _docker_reclaimable(self) -> int:
+        """Upper bound of what unused images and build cache hold, from `docker system df`"""
+        if not shutil.which("docker"):
+            return 0
+        code, out, _ = run_command("docker system df --format '{{json .}}'", shell=True, timeout=60)
+        if code != 0:
+            return 0
+        total = 0
+        for line in out.splitlines():
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue
+            if row.get("Type") in ("Images", "Build Cache"):
+                match = DiskReclaimer.DOCKER_SIZE.match(row.get("Reclaimable", ""))
+                if match:
+                    total += int(float(match.group(1)) * DiskReclaimer.DOCKER_UNITS[match.group(2)])
+        return total
+
+    def build_index(self) -> None:
+        """Walk every root once, a directory per task, and file what's found by category"""
+        with ThreadPoolExecutor(max_workers=DiskReclaimer.WORKERS, thread_name_prefix="reclaim") as pool:
+            docker: Future = pool.submit(self._docker_reclaimable)
+            pending = [pool.submit(self._scan_dir, root) for root in DiskReclaimer.ROOTS if os.path.isdir(root)]
+            while pending:
+                future = pending.pop()
+                files, subdirs, errors = future.result()
+                self.stats["dirs"] += 1
+                self.stats["files"] += len(files)
+                self.stats["errors"] += errors
+                for category, candidate in files:
+                    if category == "journal":
+                        self.journal_bytes += candidate[1]
+                        if candidate[3] != "archived":
+                            continue
+                    self.index[category].append(candidate)
+                pending.extend(pool.submit(self._scan_dir, subdir) for subdir in subdirs)
+            self.container_bytes = docker.result()
+
+    def _kept_kernels(self) -> List[str]:
+        releases = {candidate[3] for candidate in self.index["kernels"]}
+        newest = sorted(releases, key=UpdatePipeline._version_key, reverse=True)[:self.policy["kernels_keep"]]
+        return sorted(set(newest) | {os.uname().release})
+
+    def plan(self) -> Dict[str, Dict]:
+        """What each category would free under the policy: {category: {bytes, items, action}}"""
+        now = time.time()
+        plan = {}
+
+        archived = sorted(self.index["journal"], key=lambda candidate: candidate[2])
+        excess = max(0, self.journal_bytes - self.policy["journal_keep_mb"] * MB)
+        freed, items = 0, 0
+        for candidate in archived:
+            if freed >= excess:
+                break
+            freed += candidate[1]
+            items += 1
+        plan["journal"] = {"bytes": freed, "items": items,
+                           "action": f"journalctl --vacuum-size={self.policy['journal_keep_mb']}M"}
+
+        kept = self._kept_kernels()
+        old = [candidate for candidate in self.index["kernels"] if candidate[3] not in kept]
+        releases = sorted({candidate[3] for candidate in old}, key=UpdatePipeline._version_key)
+        plan["kernels"] = {"bytes": sum(candidate[1] for candidate in old), "items": len(releases),
+                           "action": f"purge {', '.join(releases) or 'nothing'} (keeping {', '.join(kept)})",
+                           "releases": releases}
+
+        cutoff = now - self.policy["log_min_age_days"] * 86400
+        logs = [candidate for candidate in self.index["rotated_logs"] if candidate[2] < cutoff]
+        plan["rotated_logs"] = {"bytes": int(sum(candidate[1] for candidate in logs) * (1 - DiskReclaimer.COMPRESSED_RATIO)),
+                                "items": len(logs), "action": "gzip", "paths": [candidate[0] for candidate in logs]}
+
+        cutoff = now - self.policy["core_max_age_days"] * 86400
+        cores = [candidate for candidate in self.index["core_dumps"] if candidate[2] < cutoff]
+        plan["core_dumps"] = {"bytes": sum(candidate[1] for candidate in cores), "items": len(cores),
+                              "action": "delete", "paths": [candidate[0] for candidate in cores]}
+
+        plan["apt_cache"] = {"bytes": sum(candidate[1] for candidate in self.index["apt_cache"]),
+                             "items": len(self.index["apt_cache"]), "action": "apt-get clean"}
+
+        plan["containers"] = {"bytes": self.container_bytes, "items": 0,
+                              "action": f"docker image/builder prune, unused for {self.policy['container_max_age_hours']}h"}
+        return plan
+
+    @staticmethod
+    def _compress(path: str) -> int:
+        """gzip a log next to itself, keeping owner, mode and mtime; return the bytes freed"""
+        st = os.stat(path)
+        target = f"{path}.gz"
+        tmp_path = f"{target}.tmp"
+        with open(path, "rb") as src, gzip.open(tmp_path, "wb") as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        os.chown(tmp_path, st.st_uid, st.st_gid)
+        os.chmod(tmp_path, stat.S_IMODE(st.st_mode))
+        os.utime(tmp_path, ns=(st.st_atime_ns, st.st_mtime_ns))
+        os.replace(tmp_path, target)
+        os.remove(path)
+        return st.st_blocks * 512 - os.stat(target).st_blocks * 512
+
+    def _reclaim(self, category: str, entry: Dict) -> bool:
+        if category == "journal":
+            return run_command(f"journalctl --vacuum-size={self.policy['journal_keep_mb']}M")[0] == 0
+        if category == "kernels":
+            packages = [package for release in entry["releases"]
+                        for package in PackageState.installed_matching("linux-") if package.endswith(f"-{release}")]
+            return not packages or run_command(f"apt-get purge -y {' '.join(packages)}", timeout=1800)[0] == 0
+        if category == "rotated_logs":
+            with ThreadPoolExecutor(max_workers=DiskReclaimer.WORKERS, thread_name_prefix="reclaim") as pool:
+                results = list(pool.map(self._try, [DiskReclaimer._compress] * len(entry["paths"]), entry["paths"]))
+            return all(results)
+        if category == "core_dumps":
+            return all([self._try(os.remove, path) for path in entry["paths"]])
+        if category == "apt_cache":
+            return run_command("apt-get clean")[0] == 0
+        if category == "containers":
+            until = f"until={self.policy['container_max_age_hours']}h"
+            return all([run_command(f"docker {kind} prune -af --filter {until}", timeout=1800)[0] == 0
+                        for kind in ("image", "builder")])
+        return False
+
+    @staticmethod
+    def _try(action, path: str) -> bool:
+        try:
+            action(path)
+            return True
+        except OSError as e:
+            print_colored(f"Could not reclaim {path}: {e}", Colors.WARNING)
+            return False
+
+    @StepProfiler.step
+    def reclaim(self, categories: Optional[List[str]] = None, dry_run: bool = False) -> Dict[str, Dict]:
+        """Index, report and (unless `dry_run`) reclaim the chosen categories; return the plan"""
+        start = time.perf_counter()
+        self.build_index()
+        plan = {category: entry for category, entry in self.plan().items()
+                if categories is None or category in categories}
+        for category, entry in plan.items():
+            color = Colors.WARNING if entry["bytes"] else Colors.GREEN
+            print_colored(f"  {category:<13} {entry['bytes'] / MB:>10.1f} MB  {entry['action']}", color)
+        total = sum(entry["bytes"] for entry in plan.values())
+        print_colored(f"{total / MB:.1f} MB reclaimable ({self.stats['files']} candidates in "
+                      f"{self.stats['dirs']} directories, indexed in {time.perf_counter() - start:.2f}s)",
+                      Colors.BLUE, bold=True)
+        if dry_run:
+            return plan
+
+        for category, entry in plan.items():
+            if not entry["bytes"]:
+                continue
+            entry["ok"] = self._reclaim(category, entry)
+            if not entry["ok"]:
+                print_colored(f"Reclaiming {category} did not fully succeed", Colors.FAIL)
+        return plan
@@ -0,0 +1,486 @@
+"""On-demand malware scan pipeline
+
+One filesystem walk feeds every stage: files are batched, batches whose
+contents match the known-good allowlist are thinned out on a thread
+pool, and what is left is handed to every scan engine. Engines own their
+own concurrency; clamd gets many small batches in parallel, clamscan
+(which loads the whole signature DB per process) gets a single spooled
+file list, and YARA matches batches in a process pool. Hits are
+collected as batches finish and, when a vault is given, quarantined on
+their own pool while the walk continues.
+
+Every file is scanned under size, archive depth and time budgets so one
+huge upload or archive bomb can't exhaust memory or stall the scan.
+Files that hit a budget are not failures: they are recorded as skipped,
+with the limit they hit, in the report and the scan log for follow-up.
+"""
+
+import os
+import glob
+import stat
+import time
+import hashlib
+import importlib.util
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+
+from .allowlist import HashAllowlist
+from .clamd import ClamdTuner
+from .common import LOG_DIR, STATE_DIR, Colors, atomic_write, print_colored, run_command
+from .quarantine import QuarantineVault
+
+# (path, engine, signature)
+Hit = Tuple[str, str, str]
+# (path, engine or "pipeline", limit that was hit)
+Skip = Tuple[str, str, str]
+
+MB = 1024 ** 2
+
+# Per-file budgets; the names follow clamd.conf so a skip reads the same
+# whichever component enforced it
+LIMITS = {
+    "MaxFileSize": 200 * MB,    # larger files are not scanned at all
+    "MaxScanSize": 400 * MB,    # data extracted from one file, archives included
+    "MaxRecursion": 16,         # archive nesting depth
+    "MaxFiles": 10000,          # members extracted from one archive
+    "MaxScanTime": 120,         # seconds spent on one file
+}
+
+class ClamAVEngine:
+    """Scan files with clamd when it is running, otherwise with one clamscan run"""
+
+    name = "clamav"
+    # Reported instead of a detection when a budget cut a file's scan short,
+    # followed by ".<limit>" on ClamAV 0.101 and later
+    LIMIT_SIGNATURE = "Heuristics.Limits.Exceeded"
+
+    def __init__(self, workers: Optional[int] = None, limits: Optional[Dict[str, int]] = None):
+        self.use_daemon = run_command("systemctl is-active --quiet clamav-daemon")[0] == 0
+        self.skipped: List[Skip] = []
+        if self.use_daemon:
+            # --fdpass lets clamd read files it has no permission to open itself.
+            # clamd takes its budgets from clamd.conf (see ClamdTuner)
+            self.command = "clamdscan --fdpass --no-summary --infected"
+            ClamAVEngine._warn_daemon_limits(limits or {})
+            self.pool = ThreadPoolExecutor(max_workers=workers or min(4, os.cpu_count() or 1),
+                                           thread_name_prefix="clamd")
+            self.futures: List[Future] = []
+        else:
+            limits = dict(LIMITS, **(limits or {}))
+            self.command = (
+                "clamscan --no-summary --infected --alert-exceeds-max=yes "
+                f"--max-filesize={limits['MaxFileSize'] // MB}M --max-scansize={limits['MaxScanSize'] // MB}M "
+                f"--max-recursion={limits['MaxRecursion']} --max-files={limits['MaxFiles']} "
+                f"--max-scantime={limits['MaxScanTime'] * 1000}"
+            )
+            self.spool = tempfile.NamedTemporaryFile("w", prefix="vps_scan-", suffix=".list", delete=False)
+
+    @staticmethod
+    def _warn_daemon_limits(limits: Dict[str, int]) -> None:
+        """Say which requested budgets clamd won't apply, and whether it reports cut-short files"""
+        # MaxFileSize is also enforced by the pipeline, before any engine
+        ignored = sorted(key for key in limits if key != "MaxFileSize")
+        if ignored:
+            current = ", ".join(f"{key} {ClamdTuner.configured(key) or 'default'}" for key in ignored)
+            print_colored(f"clamd is running and uses clamd.conf's budgets ({current}); "
+                          f"the requested {', '.join(ignored)} only apply to YARA", Colors.WARNING)
+        if (ClamdTuner.configured("AlertExceedsMax") or "no").lower() != "yes":
+            print_colored("clamd.conf lacks AlertExceedsMax: files clamd cuts short at a limit pass as clean "
+                          "instead of being recorded as skipped (run `clamd apply`)", Colors.WARNING)
+
+    def _scan(self, list_path: str) -> Tuple[List[Hit], List[Skip]]:
+        code, out, err = run_command(f"{self.command} --file-list={list_path}")
+        hits, skipped = [], []
+        for line in out.splitlines():
+            if line.endswith(" FOUND"):
+                path, _, signature = line[:-len(" FOUND")].rpartition(": ")
+                if signature.startswith(self.LIMIT_SIGNATURE):
+                    skipped.append((path, self.name, signature[len(self.LIMIT_SIGNATURE):].lstrip(".") or "limit"))
+                else:
+                    hits.append((path, self.name, signature))
+            elif line.endswith(" ERROR") and line.startswith("/"):
+                # clamdscan: "/path: lstat() failed: No such file or directory. ERROR"
+                skipped.append((line.partition(": ")[0], self.name, "error"))
+        for line in err.splitlines():
+            # clamscan: "WARNING: /path: Can't access file"
+            if line.startswith("WARNING: /"):
+                skipped.append((line[len("WARNING: "):].rpartition(": ")[0], self.name, "error"))
+        # 0 clean, 1 found something, 2 an error, which on a live filesystem is
+        # usually one file vanishing or unreadable mid-scan; only an error with
+        # no per-file results means the scan itself failed
+        if code not in (0, 1) and not hits and not skipped:
+            raise RuntimeError(f"{self.command.split()[0]} exited with {code}: {err.strip()}")
+        return hits, skipped
+
+    def _results(self, results: List[Tuple[List[Hit], List[Skip]]]) -> List[Hit]:
+        hits = []
+        for batch_hits, skipped in results:
+            hits.extend(batch_hits)
+            self.skipped.extend(skipped)
+        return hits
+
+    def _scan_batch(self, paths: List[str]) -> Tuple[List[Hit], List[Skip]]:
+        fd, list_path = tempfile.mkstemp(prefix="vps_scan-", suffix=".list")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write("\n".join(paths) + "\n")
+            return self._scan(list_path)
+        finally:
+            os.unlink(list_path)
+
+    def add(self, paths: List[str]) -> None:
+        if self.use_daemon:
+            self.futures.append(self.pool.submit(self._scan_batch, paths))
+        else:
+            self.spool.write("\n".join(paths) + "\n")
+
+    def collect(self) -> List[Hit]:
+        """Hits from batches that have already finished, without waiting"""
+        if not self.use_daemon:
+            return []
+        done = [future for future in self.futures if future.done()]
+        self.futures = [future for future in self.futures if not future.done()]
+        return self._results([future.result() for future in done])
+
+    def finish(self) -> List[Hit]:
+        if self.use_daemon:
+            try:
+                return self._results([future.result() for future in self.futures])
+            finally:
+                self.pool.shutdown()
+        self.spool.close()
+        try:
+            return self._results([self._scan(self.spool.name)])
+        finally:
+            os.unlink(self.spool.name)
+
+# Compiled rules for the current YARA worker process, loaded once by its initializer
+_yara_rules = None
+
+def _yara_init(compiled_path: str) -> None:
+    global _yara_rules
+    import yara
+
+    _yara_rules = yara.load(compiled_path)
+
+def _yara_match(paths: List[str], timeout: int) -> Tuple[List[Hit], List[Skip], int]:
+    import yara
+
+    hits, skipped, errors = [], [], 0
+    for path in paths:
+        try:
+            for match in _yara_rules.match(path, timeout=timeout):
+                hits.append((path, "yara", f"{match.namespace}.{match.rule}"))
+        except yara.TimeoutError:
+            skipped.append((path, "yara", "MaxScanTime"))
+        except Exception:
+            # yara.Error for unreadable files
+            errors += 1
+    return hits, skipped, errors
+
+class YaraEngine:
+    """Match our own YARA rules in worker processes, compiling them once per rule change"""
+
+    name = "yara"
+    RULES_DIR = "/etc/vps_manager/yara"
+    CACHE_DIR = os.path.join(STATE_DIR, "yara")
+
+    def __init__(self, workers: Optional[int] = None, limits: Optional[Dict[str, int]] = None):
+        # yara maps the file rather than reading it in, so only time needs a budget
+        self.timeout = dict(LIMITS, **(limits or {}))["MaxScanTime"]
+        compiled = YaraEngine.compiled_rules()
+        # Rule matching is CPU-bound and holds the GIL, so use processes
+        self.pool = ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1,
+                                        initializer=_yara_init, initargs=(compiled,))
+        self.futures: List[Future] = []
+        self.skipped: List[Skip] = []
+        self.errors = 0
+
+    @staticmethod
+    def rule_files() -> List[str]:
+        return sorted(glob.glob(os.path.join(YaraEngine.RULES_DIR, "**", "*.yar"), recursive=True)
+                      + glob.glob(os.path.join(YaraEngine.RULES_DIR, "**", "*.yara"), recursive=True))
+
+    @staticmethod
+    def available() -> bool:
+        return importlib.util.find_spec("yara") is not None and bool(YaraEngine.rule_files())
+
+    @staticmethod
+    def source_hash() -> str:
+        """Hash of every rule file and the yara version that would compile them"""
+        import yara
+
+        digest = hashlib.sha256(yara.__version__.encode())
+        for path in YaraEngine.rule_files():
+            digest.update(os.path.relpath(path, YaraEngine.RULES_DIR).encode() + b"\0")
+            with open(path, "rb") as f:
+                digest.update(f.read())
+        return digest.hexdigest()
+
+    @staticmethod
+    def compiled_rules() -> str:
+        """Path of the compiled rules for the current sources, compiling only on a cache miss"""
+        import yara
+
+        path = os.path.join(YaraEngine.CACHE_DIR, f"{YaraEngine.source_hash()}.yarc")
+        if not os.path.exists(path):
+            # One namespace per file so rule names only need to be unique within a file
+            rules = yara.compile(filepaths={
+                os.path.splitext(os.path.relpath(rule, YaraEngine.RULES_DIR))[0].replace(os.sep, "."): rule
+                for rule in YaraEngine.rule_files()
+            })
+            os.makedirs(YaraEngine.CACHE_DIR, exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            rules.save(tmp_path)
+            os.replace(tmp_path, path)
+            # Older compilations are never loaded again
+            for stale in glob.glob(os.path.join(YaraEngine.CACHE_DIR, "*.yarc")):
+                if stale != path:
+                    os.remove(stale)
+        return path
+
+    def add(self, paths: List[str]) -> None:
+        self.futures.append(self.pool.submit(_yara_match, paths, self.timeout))
+
+    def _results(self, futures: List[Future]) -> List[Hit]:
+        hits = []
+        for future in futures:
+            batch_hits, skipped, errors = future.result()
+            hits.extend(batch_hits)
+            self.skipped.extend(skipped)
+            self.errors += errors
+        return hits
+
+    def collect(self) -> List[Hit]:
+        """Hits from batches that have already finished, without waiting"""
+        done = [future for future in self.futures if future.done()]
+        self.futures = [future for future in self.futures if not future.done()]
+        return self._results(done)
+
+    def finish(self) -> List[Hit]:
+        try:
+            return self._results(self.futures)
+        finally:
+            self.pool.shutdown()
+
+class ScanPipeline:
+    """Walk once, drop known-good files, fan the rest out to the engines"""
+
+    # The vault holds the very files scans find; scanning it would quarantine them again
+    EXCLUDE = ("/proc", "/sys", "/dev", "/run", QuarantineVault.VAULT_DIR)
+    BATCH_SIZE = 256
+    # Cap on the bytes behind one batch, so large files spread across clamd workers
+    BATCH_BYTES = 256 * MB
+    LOG_FILE = os.path.join(LOG_DIR, "scan.log")
+    # Every run appends; once the log passes this size the oldest runs are dropped
+    LOG_MAX_BYTES = 8 * MB
+
+    def __init__(self, engines: List, allowlist: Optional[HashAllowlist] = None, workers: Optional[int] = None,
+                 vault: Optional[QuarantineVault] = None, limits: Optional[Dict[str, int]] = None):
+        self.engines = engines
+        self.allowlist = allowlist
+        self.vault = vault
+        self.exclude = self.EXCLUDE + ((vault.vault_dir,) if vault else ())
+        self.limits = dict(LIMITS, **(limits or {}))
+        self.hits: List[Hit] = []
+        self.skipped: List[Skip] = []
+        # path -> quarantine future, so a file hit by two engines is moved once
+        self.quarantined: Dict[str, Future] = {}
+        self.quarantine_pool: Optional[ThreadPoolExecutor] = None
+        self.workers = workers or min(8, os.cpu_count() or 1)
+        self.lock = threading.Lock()
+        self.stats = {"files": 0, "allowlisted": 0, "scanned": 0, "scanned_bytes": 0, "skipped": 0, "errors": 0}
+
+    def _count(self, key: str, amount: int = 1) -> None:
+        # Updated from both the walk and the allowlist workers
+        with self.lock:
+            self.stats[key] += amount
+
+    def walk(self, roots: List[str]) -> Iterator[Tuple[str, int]]:
+        """Yield (path, size) for every regular file under the roots, without following symlinks"""
+        stack = [os.path.abspath(root) for root in reversed(roots)]
+        while stack:
+            path = stack.pop()
+            if path in self.exclude or path.startswith(tuple(ex + "/" for ex in self.exclude)):
+                continue
+            try:
+                st = os.lstat(path)
+            except OSError:
+                self._count("errors")
+                continue
+            if stat.S_ISREG(st.st_mode):
+                yield path, st.st_size
+            elif stat.S_ISDIR(st.st_mode):
+                try:
+                    with os.scandir(path) as it:
+                        entries = sorted(it, key=lambda entry: entry.name, reverse=True)
+                except OSError:
+                    self._count("errors")
+                    continue
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        try:
+                            yield entry.path, entry.stat(follow_symlinks=False).st_size
+                        except OSError:
+                            self._count("errors")
+
+    def _filter(self, batch: List[Tuple[str, int]]) -> List[Tuple[str, int]]:
+        """Drop files whose content is on the allowlist"""
+        if not self.allowlist:
+            return batch
+        unknown, known, errors = [], 0, 0
+        for path, size in batch:
+            try:
+                if self.allowlist.is_known(path):
+                    known += 1
+                    continue
+            except OSError:
+                errors += 1
+                continue
+            unknown.append((path, size))
+        self._count("allowlisted", known)
+        self._count("errors", errors)
+        return unknown
+
+    def _dispatch(self, batch: List[Tuple[str, int]]) -> None:
+        if not batch:
+            return
+        self.stats["scanned"] += len(batch)
+        self.stats["scanned_bytes"] += sum(size for _, size in batch)
+        paths = [path for path, _ in batch]
+        for engine in self.engines:
+            engine.add(paths)
+            self._harvest(engine.collect())
+
+    def _harvest(self, hits: List[Hit]) -> None:
+        """Record hits and start quarantining them while the scan carries on"""
+        self.hits.extend(hits)
+        if self.vault is None:
+            return
+        for path, engine, signature in hits:
+            if path not in self.quarantined:
+                self.quarantined[path] = self.quarantine_pool.submit(self.vault.quarantine, path, [(engine, signature)])
+
+    def run(self, roots: List[str]) -> Dict:
+        """Scan the roots and return the hits and pipeline statistics"""
+        start = time.perf_counter()
+        in_flight: Deque[Future] = deque()
+        batch: List[Tuple[str, int]] = []
+        batch_bytes = 0
+
+        if self.vault is not None:
+            self.quarantine_pool = ThreadPoolExecutor(max_workers=QuarantineVault.WORKERS,
+                                                      thread_name_prefix="quarantine")
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="allowlist") as pool:
+            def submit(files: List[Tuple[str, int]]) -> None:
+                in_flight.append(pool.submit(self._filter, files))
+                # Keep the walk only a few batches ahead of the hashing
+                while in_flight and (in_flight[0].done() or len(in_flight) > self.workers * 4):
+                    self._dispatch(in_flight.popleft().result())
+
+            for path, size in self.walk(roots):
+                self.stats["files"] += 1
+                # Oversized files are skipped before the allowlist would read them end to end
+                if size > self.limits["MaxFileSize"]:
+                    self.skipped.append((path, "pipeline", "MaxFileSize"))
+                    continue
+                batch.append((path, size))
+                batch_bytes += size
+                if len(batch) >= self.BATCH_SIZE or batch_bytes >= self.BATCH_BYTES:
+                    submit(batch)
+                    batch, batch_bytes = [], 0
+            if batch:
+                submit(batch)
+            while in_flight:
+                self._dispatch(in_flight.popleft().result())
+
+        for engine in self.engines:
+            self._harvest(engine.finish())
+        hits = sorted(self.hits)
+        for engine in self.engines:
+            self.skipped.extend(engine.skipped)
+        skipped = sorted(set(self.skipped))
+        self.stats["skipped"] = len({path for path, _, _ in skipped})
+        self.stats["errors"] += sum(getattr(engine, "errors", 0) for engine in self.engines)
+        quarantined = self._settle_quarantine(hits)
+        report = {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "roots": roots,
+            "engines": [engine.name for engine in self.engines],
+            "hits": hits,
+            "skipped": skipped,
+            "quarantined": quarantined,
+            "stats": dict(self.stats, duration_s=round(time.perf_counter() - start, 3)),
+        }
+        self._log(report)
+        return report
+
+    def _settle_quarantine(self, hits: List[Hit]) -> Dict[str, Dict[str, str]]:
+        """Wait for the quarantine moves and record every engine's detections on each item"""
+        if self.vault is None:
+            return {}
+        detections: Dict[str, List[Tuple[str, str]]] = {}
+        for path, engine, signature in hits:
+            detections.setdefault(path, []).append((engine, signature))
+        results = {}
+        try:
+            for path, future in self.quarantined.items():
+                try:
+                    item_id = future.result()
+                except OSError as e:
+                    results[path] = {"error": str(e)}
+                    continue
+                if len(detections[path]) > 1:
+                    self.vault.annotate(item_id, detections[path])
+                results[path] = {"id": item_id}
+        finally:
+            self.quarantine_pool.shutdown()
+        return results
+
+    def _log(self, report: Dict) -> None:
+        """Append the hits and a clamscan-style summary, which MalwareScanner.last_scan_summary reads"""
+        stats = report["stats"]
+        lines = [f"{path}: {signature} FOUND ({engine})" for path, engine, signature in report["hits"]]
+        lines += [f"{path}: quarantined as {result['id']}" if "id" in result else f"{path}: quarantine failed: {result['error']}"
+                  for path, result in report["quarantined"].items()]
+        lines += [f"{path}: skipped, {limit} exceeded ({engine})" for path, engine, limit in report["skipped"]]
+        lines += [
+            "",
+            "----------- SCAN SUMMARY -----------",
+            f"Engines: {', '.join(report['engines'])}",
+            f"Scanned files: {stats['files']}",
+            f"Allowlisted files: {stats['allowlisted']}",
+            f"Skipped files: {stats['skipped']}",
+            f"Infected files: {len({path for path, _, _ in report['hits']})}",
+            f"Data scanned: {stats['scanned_bytes'] / 1024 ** 2:.2f} MB",
+            f"Time: {stats['duration_s']:.3f} sec",
+            f"Start Date: {report['timestamp']}",
+            "",
+        ]
+        try:
+            os.makedirs(os.path.dirname(self.LOG_FILE), exist_ok=True)
+            with open(self.LOG_FILE, "a") as f:
+                f.write("\n".join(lines))
+            if os.path.getsize(self.LOG_FILE) > self.LOG_MAX_BYTES:
+                self._trim_log()
+        except OSError:
+            pass
+
+    def _trim_log(self) -> None:
+        """Keep the newest runs that fit in half of LOG_MAX_BYTES, cutting only between runs"""
+        with open(self.LOG_FILE, "rb") as f:
+            f.seek(-(self.LOG_MAX_BYTES // 2), os.SEEK_END)
+            tail = f.read()
+        # A run ends with its summary's "Start Date:" line
+        end = tail.find(b"\nStart Date: ")
+        if end < 0:
+            return
+        cut = tail.find(b"\n", end + 1)
+        atomic_write(self.LOG_FILE, tail[cut + 1:] if cut >= 0 else b"", durable=False)
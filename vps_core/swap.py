@@ -0,0 +1,79 @@
+"""Swap file management"""
+
+import os
+from typing import Dict
+
+from .common import Colors, print_colored, run_command
+from .profiler import StepProfiler
+
+class SwapManager:
+    """Handle swap file management"""
+    
+    @staticmethod
+    def get_recommended_swap_size() -> int:
+        """Calculate recommended swap size in GB"""
+        import psutil
+        
+        total_ram = psutil.virtual_memory().total / (1024 ** 3)  # Convert to GB
+        return max(6, int(total_ram))
+
+    @staticmethod
+    @StepProfiler.step
+    def create_swap(size_gb: int) -> bool:
+        """Create and enable a swap file"""
+        swap_file = "/swapfile"
+        
+        # Remove existing swap if present
+        if os.path.exists(swap_file):
+            code, _, err = run_command("swapoff -a")
+            if code != 0:
+                print_colored(f"Error disabling existing swap: {err}", Colors.FAIL)
+                return False
+        
+        # Create new swap file
+        commands = [
+            f"fallocate -l {size_gb}G {swap_file}",
+            f"chmod 600 {swap_file}",
+            f"mkswap {swap_file}",
+            f"swapon {swap_file}"
+        ]
+        
+        for cmd in commands:
+            code, _, err = run_command(cmd)
+            if code != 0:
+                print_colored(f"Error creating swap: {err}", Colors.FAIL)
+                return False
+        
+        # Add to fstab if not already present
+        fstab_entry = f"{swap_file} none swap sw 0 0"
+        with open('/etc/fstab', 'r') as f:
+            if not any(fstab_entry in line for line in f):
+                with open('/etc/fstab', 'a') as f:
+                    f.write(f"\n{fstab_entry}\n")
+        
+        print_colored(f"Swap file created and enabled ({size_gb}GB)!", Colors.GREEN)
+        return True
+
+    @staticmethod
+    def swap_stats() -> Dict[str, int]:
+        """Swap size/usage and cumulative pages swapped in and out, read from /proc"""
+        stats = {}
+        
+        with open("/proc/meminfo") as f:
+            for line in f:
+                key, value = line.split(":", 1)
+                if key in ("SwapTotal", "SwapFree"):
+                    stats[key] = int(value.split()[0]) * 1024
+        
+        with open("/proc/vmstat") as f:
+            for line in f:
+                key, value = line.split()
+                if key in ("pswpin", "pswpout"):
+                    stats[key] = int(value)
+        
+        return {
+            "total_bytes": stats.get("SwapTotal", 0),
+            "used_bytes": stats.get("SwapTotal", 0) - stats.get("SwapFree", 0),
+            "pages_in": stats.get("pswpin", 0),
+            "pages_out": stats.get("pswpout", 0),
+        }
@@ -0,0 +1,230 @@
+"""Staged unattended upgrades
+
+Splits automatic updates into a download stage that runs whenever the host
+is quiet and a short install stage inside a per-host maintenance window.
+After installing, only the services still mapping replaced libraries are
+restarted, and the host reboots only when a newer kernel is installed.
+Windows are spread across the fleet by FleetSchedule, so hosts no longer
+all reboot at 02:00 together.
+"""
+
+import os
+import re
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+
+from .common import Colors, print_colored, run_command
+from .fleet import FleetSchedule
+from .profiler import StepProfiler
+
+class UpdatePipeline:
+    """Prefetch, install in a maintenance window, then restart what changed"""
+
+    # Each host's window starts somewhere in [WINDOW_EARLIEST, +WINDOW_SPREAD)
+    WINDOW_EARLIEST = (1, 0)
+    WINDOW_SPREAD = 240
+    WINDOW_MINUTES = 30
+    # Prefetch attempts in the hours leading up to the window
+    PREFETCH_HOURS = 4
+    # Skip prefetching while the 1-minute load per CPU is above this
+    MAX_LOAD = 0.5
+
+    # Restarting these would end sessions or wedge the host; they are
+    # reported instead and picked up by the next reboot
+    NEVER_RESTART = {"dbus.service", "systemd-logind.service"}
+    NEVER_RESTART_PREFIXES = ("getty@", "serial-getty@", "user@", "systemd-journald")
+
+    @staticmethod
+    def window_start() -> datetime:
+        """Start of today's maintenance window for this host"""
+        return FleetSchedule.start("updates", UpdatePipeline.WINDOW_EARLIEST, UpdatePipeline.WINDOW_SPREAD,
+                                   UpdatePipeline.WINDOW_MINUTES)
+
+    @staticmethod
+    def in_window(now: Optional[datetime] = None) -> bool:
+        now = now or datetime.now()
+        start = UpdatePipeline.window_start()
+        return start <= now < start + timedelta(minutes=UpdatePipeline.WINDOW_MINUTES)
+
+    @staticmethod
+    @StepProfiler.step
+    def prefetch(max_load: Optional[float] = None) -> bool:
+        """Download pending upgrades without installing them, if the host is quiet"""
+        max_load = UpdatePipeline.MAX_LOAD if max_load is None else max_load
+        load = os.getloadavg()[0] / (os.cpu_count() or 1)
+        if load > max_load:
+            print_colored(f"Load {load:.2f} per CPU is above {max_load}, deferring prefetch", Colors.WARNING)
+            return True
+
+        print_colored("Downloading pending upgrades...", Colors.BLUE)
+        code, _, err = run_command("unattended-upgrade --download-only")
+        if code != 0:
+            print_colored(f"Error prefetching upgrades: {err}", Colors.FAIL)
+            logging.error(f"Upgrade prefetch failed: {err}")
+            return False
+        logging.info("Upgrade prefetch completed")
+        return True
+
+    @staticmethod
+    def stale_processes() -> Dict[int, Set[str]]:
+        """Processes still mapping executables or libraries that were replaced on disk"""
+        stale: Dict[int, Set[str]] = {}
+        for pid in filter(str.isdigit, os.listdir("/proc")):
+            try:
+                with open(f"/proc/{pid}/maps") as f:
+                    lines = f.readlines()
+            except OSError:
+                # Exited, or a kernel thread
+                continue
+            for line in lines:
+                # address perms offset dev inode pathname
+                fields = line.split(None, 5)
+                if len(fields) < 6 or "x" not in fields[1] or not fields[5].endswith(" (deleted)\n"):
+                    continue
+                path = fields[5][:-len(" (deleted)\n")]
+                # Only files dpkg replaces; memfds and scratch files are expected to be deleted
+                if path.startswith(("/usr/", "/lib", "/bin/", "/sbin/", "/opt/")):
+                    stale.setdefault(int(pid), set()).add(path)
+        return stale
+
+    @staticmethod
+    def _unit_of(pid: int) -> Optional[str]:
+        """The systemd unit a process belongs to, from its cgroup path"""
+        try:
+            with open(f"/proc/{pid}/cgroup") as f:
+                paths = [line.rstrip("\n").split(":", 2)[2] for line in f]
+        except (OSError, IndexError):
+            return None
+        for path in paths:
+            for part in reversed(path.split("/")):
+                if part.endswith((".service", ".scope")):
+                    return part
+        return None
+
+    @staticmethod
+    def services_to_restart() -> Dict[str, Set[str]]:
+        """Map each affected unit to the replaced files its processes still use"""
+        units: Dict[str, Set[str]] = {}
+        for pid, paths in UpdatePipeline.stale_processes().items():
+            unit = "init" if pid == 1 else UpdatePipeline._unit_of(pid)
+            if unit:
+                units.setdefault(unit, set()).update(paths)
+        return units
+
+    @staticmethod
+    def _restartable(unit: str) -> bool:
+        return (unit.endswith(".service") and unit not in UpdatePipeline.NEVER_RESTART
+                and not unit.startswith(UpdatePipeline.NEVER_RESTART_PREFIXES))
+
+    @staticmethod
+    def restart_services(dry_run: bool = False) -> List[str]:
+        """Restart the services using replaced libraries; return those that failed"""
+        failed = []
+        for unit, paths in sorted(UpdatePipeline.services_to_restart().items()):
+            if unit == "init":
+                command = "systemctl daemon-reexec"
+            elif UpdatePipeline._restartable(unit):
+                command = f"systemctl restart {unit}"
+            else:
+                print_colored(f"{unit} uses {len(paths)} replaced file(s); not restarting it", Colors.WARNING)
+                continue
+
+            print_colored(f"{'Would run' if dry_run else 'Running'}: {command} ({', '.join(sorted(paths))})",
+                          Colors.BLUE)
+            if dry_run:
+                continue
+            code, _, err = run_command(command)
+            if code != 0:
+                print_colored(f"Error restarting {unit}: {err}", Colors.FAIL)
+                logging.error(f"Restart of {unit} after upgrade failed: {err}")
+                failed.append(unit)
+        return failed
+
+    @staticmethod
+    def _version_key(release: str) -> List:
+        # "6.1.0-21-amd64" sorts after "6.1.0-9-amd64"
+        return [(0, int(part)) if part.isdigit() else (1, part) for part in re.split(r"[.\-+~]", release)]
+
+    @staticmethod
+    def newest_kernel() -> Optional[str]:
+        try:
+            names = os.listdir("/boot")
+        except OSError:
+            return None
+        releases = [name[len("vmlinuz-"):] for name in names if name.startswith("vmlinuz-")]
+        return max(releases, key=UpdatePipeline._version_key) if releases else None
+
+    @staticmethod
+    def reboot_required() -> bool:
+        """True only when a newer kernel than the running one is installed"""
+        newest = UpdatePipeline.newest_kernel()
+        # A running kernel /boot doesn't have (a provider's or a custom build)
+        # is not a reason to reboot into an older one
+        running = os.uname().release
+        return newest is not None and UpdatePipeline._version_key(newest) > UpdatePipeline._version_key(running)
+
+    @staticmethod
+    @StepProfiler.step
+    def install(force: bool = False) -> bool:
+        """Install the prefetched upgrades, restart affected services, reboot on a new kernel"""
+        if not force and not UpdatePipeline.in_window():
+            start = UpdatePipeline.window_start()
+            print_colored(f"Outside this host's maintenance window ({start:%H:%M}, "
+                          f"{UpdatePipeline.WINDOW_MINUTES} min), not installing", Colors.WARNING)
+            return True
+
+        print_colored("Installing upgrades...", Colors.BLUE)
+        code, _, err = run_command("unattended-upgrade")
+        if code != 0:
+            print_colored(f"Error installing upgrades: {err}", Colors.FAIL)
+            logging.error(f"Upgrade install failed: {err}")
+            return False
+
+        failed = UpdatePipeline.restart_services()
+        if UpdatePipeline.reboot_required():
+            print_colored(f"Kernel {UpdatePipeline.newest_kernel()} installed, rebooting in 1 minute", Colors.WARNING)
+            logging.info("Rebooting for kernel upgrade")
+            run_command("shutdown -r +1 vps-manager: rebooting into upgraded kernel")
+
+        logging.info("Upgrade install completed")
+        return not failed
+
+    @staticmethod
+    def schedule() -> bool:
+        """Install the prefetch and install timers at this host's window"""
+        start = UpdatePipeline.window_start()
+        prefetch_hours = ",".join(f"{(start.hour - h) % 24:02d}" for h in range(UpdatePipeline.PREFETCH_HOURS, 0, -1))
+        stages = {
+            "prefetch": {"calendar": f"*-*-* {prefetch_hours}:{start.minute:02d}:00", "nice": "19", "io_class": "idle"},
+            "install": {"calendar": f"*-*-* {start:%H:%M}:00", "nice": "0", "io_class": "best-effort"},
+        }
+
+        changed = False
+        for stage, values in stages.items():
+            changed |= FleetSchedule.write_timer(f"vps-manager-{stage}", f"update pipeline: {stage}",
+                                                 f"updates {stage}", **values)
+        if not FleetSchedule.enable(["vps-manager-prefetch", "vps-manager-install"], changed):
+            return False
+
+        print_colored(f"Update window: {start:%H:%M} for {UpdatePipeline.WINDOW_MINUTES} minutes, "
+                      f"prefetch at {prefetch_hours}:{start.minute:02d}", Colors.GREEN)
+        return True
+
+    @staticmethod
+    def status() -> None:
+        """Print the window, pending restarts and whether a reboot is due"""
+        start = UpdatePipeline.window_start()
+        print_colored(f"Maintenance window: {start:%H:%M}-"
+                      f"{start + timedelta(minutes=UpdatePipeline.WINDOW_MINUTES):%H:%M}", Colors.BLUE)
+        units = UpdatePipeline.services_to_restart()
+        if units:
+            for unit, paths in sorted(units.items()):
+                print_colored(f"  {unit}: {len(paths)} replaced file(s)", Colors.WARNING)
+        else:
+            print_colored("No services are using replaced libraries", Colors.GREEN)
+        if UpdatePipeline.reboot_required():
+            print_colored(f"Reboot required: running {os.uname().release}, "
+                          f"installed {UpdatePipeline.newest_kernel()}", Colors.WARNING)
+        else:
+            print_colored("Running the newest installed kernel", Colors.GREEN)
@@ -0,0 +1,81 @@
+"""System package updates and unattended-upgrades configuration"""
+
+import logging
+
+from .apt import AptIndex
+from .common import Colors, print_colored, run_command
+from .config import ConfigManager
+from .profiler import StepProfiler
+from .update_pipeline import UpdatePipeline
+
+class SystemUpdater:
+    """Handle system updates and automatic update configuration"""
+    
+    # Our own drop-in, read after Debian's 50unattended-upgrades, so the
+    # settings can be rewritten in place instead of appended on every call.
+    # apt's daily timer and unattended-upgrades' own reboot are switched off:
+    # UpdatePipeline downloads, installs and reboots on a per-host schedule
+    UNATTENDED_CONF = '/etc/apt/apt.conf.d/51vps-manager-unattended-upgrades'
+    UNATTENDED_TEMPLATE = """Unattended-Upgrade::Mail "$email";
+Unattended-Upgrade::MailReport "on-change";
+Unattended-Upgrade::Automatic-Reboot "false";
+APT::Periodic::Download-Upgradeable-Packages "0";
+APT::Periodic::Unattended-Upgrade "0";
+"""
+    
+    @staticmethod
+    @StepProfiler.step
+    def update_system() -> bool:
+        """Update system packages"""
+        print_colored("Updating system packages...", Colors.BLUE)
+        
+        code, err = AptIndex.ensure_fresh()
+        if code != 0:
+            print_colored(f"Error executing apt update: {err}", Colors.FAIL)
+            logging.error(f"System update failed: {err}")
+            return False
+        
+        commands = [
+            "apt upgrade -y",
+            "apt dist-upgrade -y"
+        ]
+        
+        for cmd in commands:
+            code, out, err = run_command(cmd, shell=True)
+            if code != 0:
+                print_colored(f"Error executing {cmd}: {err}", Colors.FAIL)
+                logging.error(f"System update failed: {err}")
+                return False
+        
+        print_colored("System update completed successfully!", Colors.GREEN)
+        logging.info("System update completed")
+        return True
+
+    @staticmethod
+    @StepProfiler.step
+    def configure_automatic_updates() -> bool:
+        """Configure unattended-upgrades"""
+        print_colored("Configuring automatic updates...", Colors.BLUE)
+        
+        # Install unattended-upgrades
+        code, err = AptIndex.install(["unattended-upgrades"])
+        if code != 0:
+            print_colored(f"Error installing unattended-upgrades: {err}", Colors.FAIL)
+            return False
+            
+        # Configure email notifications
+        email = input("Enter email address for update notifications: ")
+        
+        config = ConfigManager.render(SystemUpdater.UNATTENDED_TEMPLATE, email=email)
+        
+        try:
+            ConfigManager.apply("unattended-upgrades", {SystemUpdater.UNATTENDED_CONF: config})
+        except Exception as e:
+            print_colored(f"Error configuring unattended-upgrades: {e}", Colors.FAIL)
+            return False
+        
+        if not UpdatePipeline.schedule():
+            return False
+            
+        print_colored("Automatic updates configured successfully!", Colors.GREEN)
+        return True
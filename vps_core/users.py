@@ -0,0 +1,93 @@
+"""User account management"""
+
+import os
+import pwd
+import grp
+import subprocess
+from typing import List, Optional
+
+from .common import Colors, print_colored, run_command
+from .profiler import StepProfiler
+
+class UserManager:
+    """Handle user management operations"""
+    
+    @staticmethod
+    @StepProfiler.step
+    def create_user(username: str, use_ssh_key: bool = False, ssh_key: Optional[str] = None) -> bool:
+        """Create a new user and optionally set up SSH key (prompted for unless given)"""
+        try:
+            # Create user
+            code, _, err = run_command(f"useradd -m -s /bin/bash {username}")
+            if code != 0:
+                print_colored(f"Error creating user: {err}", Colors.FAIL)
+                return False
+                
+            # Set password
+            password = input("Enter password for new user: ")
+            process = subprocess.Popen(['passwd', username], stdin=subprocess.PIPE)
+            process.communicate(input=f"{password}\n{password}\n".encode())
+            
+            # Add to sudo group
+            if input("Add user to sudo group? (y/n): ").lower() == 'y':
+                code, _, err = run_command(f"usermod -aG sudo {username}")
+                if code != 0:
+                    print_colored(f"Error adding user to sudo group: {err}", Colors.FAIL)
+            
+            # Set up SSH key
+            if use_ssh_key or ssh_key:
+                ssh_key = ssh_key or input("Enter public SSH key: ")
+                ssh_dir = f"/home/{username}/.ssh"
+                os.makedirs(ssh_dir, mode=0o700, exist_ok=True)
+                with open(f"{ssh_dir}/authorized_keys", 'w') as f:
+                    f.write(ssh_key)
+                os.chown(ssh_dir, pwd.getpwnam(username).pw_uid, grp.getgrnam(username).gr_gid)
+                os.chmod(f"{ssh_dir}/authorized_keys", 0o600)
+            
+            print_colored(f"User {username} created successfully!", Colors.GREEN)
+            return True
+            
+        except Exception as e:
+            print_colored(f"Error creating user: {e}", Colors.FAIL)
+            return False
+
+    @staticmethod
+    @StepProfiler.step
+    def list_users() -> List[str]:
+        """List all non-system users"""
+        users = []
+        min_uid = 1000  # Standard minimum UID for regular users
+        
+        with open('/etc/passwd', 'r') as f:
+            for line in f:
+                fields = line.strip().split(':')
+                if int(fields[2]) >= min_uid and fields[6] != '/usr/sbin/nologin':
+                    users.append(fields[0])
+        
+        return users
+
+    @staticmethod
+    @StepProfiler.step
+    def delete_user(username: str, remove_home: bool = True) -> bool:
+        """Delete a user and optionally their home directory"""
+        cmd = f"userdel {'--remove' if remove_home else ''} {username}"
+        code, _, err = run_command(cmd)
+        
+        if code != 0:
+            print_colored(f"Error deleting user: {err}", Colors.FAIL)
+            return False
+            
+        print_colored(f"User {username} deleted successfully!", Colors.GREEN)
+        return True
+
+    @staticmethod
+    @StepProfiler.step
+    def disable_user(username: str) -> bool:
+        """Disable a user account"""
+        code, _, err = run_command(f"usermod -L {username}")
+        if code != 0:
+            print_colored(f"Error disabling user: {err}", Colors.FAIL)
+            return False
+            
+        print_colored(f"User {username} disabled successfully!", Colors.GREEN)
+        return True